@@ -0,0 +1 @@
+"""Offline benchmarks for the ingest and retrieval hot paths."""
@@ -0,0 +1,92 @@
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from langchain.schema import Document
+
+from benchmarks.synthetic import profile_texts
+from src.components.anonymizer import Anonymizer, PlaceholderAllocator
+
+
+def legacy_anonymize(texts: List[str]) -> Dict[str, str]:
+    # Previous implementation: five sub() passes per page with callbacks redefined per document
+    known: Dict[str, str] = {}
+    counters = {"FirstName_": 1, "BIRTHDATE_": 1, "BIRTHPLACE_": 1}
+    passes = [
+        (re.compile(r"\b([A-ZÄÖÜ][\wäöüß-]+)\s([A-ZÄÖÜ])\.(?!\w)"), "FirstName_", lambda m: f"{m.group(1)} {m.group(2)}.", ""),
+        (re.compile(r"\b(?:Name)\s*:\s*([A-ZÄÖÜ][\wäöüß-]+)\s+([A-ZÄÖÜ][\wäöüß-]+|[A-ZÄÖÜ])\.?\b"), "FirstName_",
+         lambda m: f"{m.group(1)} {m.group(2)}", "Name: "),
+        (re.compile(r"\b([A-ZÄÖÜ][\wäöüß-]+)\s([A-ZÄÖÜ])\.(?=\s*,)"), "FirstName_", lambda m: f"{m.group(1)} {m.group(2)}.", ""),
+        (re.compile(r"\b(?:Geburtsdatum[:]?\s*|Birth\s*date[:]?\s*)?((?:[0-3]?\d[\.\-/][01]?\d[\.\-/](?:19|20)\d\d)|(?:(?:19|20)\d\d-[01]?\d-[0-3]?\d))\b"),
+         "BIRTHDATE_", lambda m: m.group(1), ""),
+        (re.compile(r"\b(?:Geburtsort|Birth\s*place)[:]?\s*([A-ZÄÖÜ][\wäöüßÄÖÜ-]+(?:\s+[A-ZÄÖÜ][\wäöüßÄÖÜ-]+)*)"), "BIRTHPLACE_",
+         lambda m: m.group(1).strip(), None),
+    ]
+    for text in texts:
+        for pattern, prefix, value_of, label in passes:
+            def replace(m: re.Match) -> str:
+                value = value_of(m)
+                if value not in known:
+                    known[value] = f"{prefix}{counters[prefix]}"
+                    counters[prefix] += 1
+                kept = m.group(0)[:m.group(0).find(value)] if label is None else label
+                return kept + known[value]
+            text = pattern.sub(replace, text)
+    return known
+
+
+def pages(texts: List[str]) -> List[Document]:
+    return [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anonymization throughput (pages/sec) on synthetic German/English profiles")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--known", type=int, default=5000, help="Stored entities the allocator is seeded with")
+    args = parser.parse_args()
+
+    print(f"{'pages':>7} {'mode':<18} {'seconds':>8} {'pages/s':>9} {'new entities':>13}")
+    for size in args.pages:
+        texts = profile_texts(size)
+        # Entities from earlier runs, as loaded by get_entity_placeholders(); half of them recur in the corpus
+        seed_texts = profile_texts(args.known, seed=1)
+        seeded = Anonymizer()
+        seeded.anonymize(pages(seed_texts))
+        known = dict(seeded.allocator.known)
+
+        start = time.perf_counter()
+        legacy_anonymize(texts)
+        seconds = time.perf_counter() - start
+        print(f"{size:>7} {'legacy 5 passes':<18} {seconds:>8.3f} {size / seconds:>9.0f} {'':>13}")
+
+        start = time.perf_counter()
+        anonymizer = Anonymizer(PlaceholderAllocator(dict(known)))
+        anonymizer.anonymize(pages(texts))
+        seconds = time.perf_counter() - start
+        reference = {original for _, original, _, _ in anonymizer.allocator.pending}
+        print(f"{size:>7} {'single pass':<18} {seconds:>8.3f} {size / seconds:>9.0f} {len(reference):>13}")
+
+        for workers in args.workers:
+            docs = pages(texts)
+            start = time.perf_counter()
+            anonymizer = Anonymizer(PlaceholderAllocator(dict(known)))
+            anonymizer.anonymize_parallel(docs, workers)
+            seconds = time.perf_counter() - start
+
+            pending = anonymizer.allocator.pending
+            placeholders = [placeholder for _, _, placeholder, _ in pending]
+            # Same entities as in-process, and no placeholder handed out twice across workers
+            consistent = {original for _, original, _, _ in pending} == reference and len(set(placeholders)) == len(placeholders)
+            label = f"{workers} processes"
+            print(f"{size:>7} {label:<18} {seconds:>8.3f} {size / seconds:>9.0f} {len(pending):>13}"
+                  f"{'' if consistent else '  INCONSISTENT'}")
+
+
+if __name__ == "__main__":
+    main()
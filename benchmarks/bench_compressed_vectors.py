@@ -0,0 +1,74 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_faiss_index_types import clustered_vectors, recall_at_k
+from src.components.search_backends import FaissBackend
+from src.components.vector_store import VectorStore
+
+
+def run(backend: FaissBackend, queries: np.ndarray, k: int, rescore_vectors: np.ndarray = None, factor: int = 4):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        candidates = k * factor if rescore_vectors is not None else k
+        scores, ids = backend.search(query[None, :], candidates)
+        hits = [(int(i), float(s)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+        if rescore_vectors is not None:
+            # ids == positions here, same path as VectorStore.retrieve_many
+            hits = VectorStore._rescore(rescore_vectors, query, hits, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([i for i, _ in hits[:k]] + [-1] * (k - len(hits[:k])))
+    return np.array(results), np.percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressed FAISS indexes: bytes per vector and recall cost vs. flat float32")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[24, 48, 96])
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    header = f"{'vectors':>8} {'index':<20} {'bytes/vec':>9} {'index MB':>9} {'recall@' + str(args.k):>10} {'p50 ms':>8}"
+    print(header)
+    for size in args.sizes:
+        vectors = clustered_vectors(size, args.dim, rng)
+        queries = clustered_vectors(args.queries, args.dim, rng)
+        ids = np.arange(size, dtype=np.int64)
+        # Re-scoring reads float16 vectors (EMBEDDING_STORAGE_DTYPE=float16), the compact stored format
+        stored_fp16 = vectors.astype(np.float16)
+
+        flat = FaissBackend("flat")
+        flat.build(vectors, ids)
+        exact, p50 = run(flat, queries, args.k)
+        print(f"{size:>8} {'flat':<20} {flat.bytes_per_vector:>9.0f} {flat.bytes_per_vector * size / 2**20:>9.1f} {1.0:>10.3f} {p50:>8.3f}")
+
+        variants = [("fp16", {}), ("sq8", {})] + [("pq", {"pq_m": m}) for m in args.pq_m]
+        for index_type, params in variants:
+            backend = FaissBackend(index_type, **params)
+            backend.build(vectors, ids)
+            label = index_type + (f" M={backend._pq_m(args.dim)}" if index_type == "pq" else "")
+            mb = backend.bytes_per_vector * size / 2**20
+
+            approx, p50 = run(backend, queries, args.k)
+            print(f"{size:>8} {label:<20} {backend.bytes_per_vector:>9.0f} {mb:>9.1f} {recall_at_k(exact, approx):>10.3f} {p50:>8.3f}")
+
+            rescored, p50 = run(backend, queries, args.k, stored_fp16, args.rescore_factor)
+            label += f" +rescore x{args.rescore_factor}"
+            print(f"{size:>8} {label:<20} {backend.bytes_per_vector:>9.0f} {mb:>9.1f} {recall_at_k(exact, rescored):>10.3f} {p50:>8.3f}")
+
+        print(f"{'':>8} (re-scoring reads {stored_fp16.itemsize * args.dim} bytes/vector of memory-mapped float16 per candidate)")
+
+
+if __name__ == "__main__":
+    main()
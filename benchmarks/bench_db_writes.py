@@ -0,0 +1,108 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from psycopg2 import Binary
+from psycopg2.extras import Json, execute_values
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import profile_texts
+from database import get_db_connection, insert_extracted_entity, insert_extracted_entities
+
+# Scratch tables, dropped after the run; needs a reachable Postgres (DB_* / PG* env vars)
+EMBEDDINGS_TABLE = "bench_document_embeddings"
+ENTITIES_TABLE = "extracted_entities"
+
+
+def create_scratch_table(cur) -> None:
+    cur.execute(f"DROP TABLE IF EXISTS {EMBEDDINGS_TABLE};")
+    cur.execute(f"""
+        CREATE TABLE {EMBEDDINGS_TABLE} (
+            id SERIAL PRIMARY KEY,
+            doc_index INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            metadata JSONB,
+            embedding BYTEA NOT NULL,
+            source_file TEXT
+        );
+    """)
+
+
+def rows_per_statement(texts, vectors) -> float:
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            create_scratch_table(cur)
+            start = time.perf_counter()
+            for i, (text, vec) in enumerate(zip(texts, vectors)):
+                cur.execute(
+                    f"INSERT INTO {EMBEDDINGS_TABLE} (doc_index, content, metadata, embedding, source_file) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    (i, text, Json({"chunk_id": i}), Binary(vec.tobytes()), f"{i}.pdf")
+                )
+        elapsed = time.perf_counter() - start
+    return len(texts) / elapsed
+
+
+def rows_execute_values(texts, vectors, page_size: int) -> float:
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            create_scratch_table(cur)
+            start = time.perf_counter()
+            execute_values(
+                cur,
+                f"INSERT INTO {EMBEDDINGS_TABLE} (doc_index, content, metadata, embedding, source_file) VALUES %s",
+                ((i, text, Json({"chunk_id": i}), Binary(vec.tobytes()), f"{i}.pdf") for i, (text, vec) in enumerate(zip(texts, vectors))),
+                page_size=page_size
+            )
+        elapsed = time.perf_counter() - start
+    return len(texts) / elapsed
+
+
+def entities_per_connection(entities) -> float:
+    start = time.perf_counter()
+    for entity in entities:
+        insert_extracted_entity(*entity)
+    return len(entities) / (time.perf_counter() - start)
+
+
+def entities_batched(entities) -> float:
+    start = time.perf_counter()
+    insert_extracted_entities(entities)
+    return len(entities) / (time.perf_counter() - start)
+
+
+def cleanup() -> None:
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {EMBEDDINGS_TABLE};")
+            cur.execute(f"DELETE FROM {ENTITIES_TABLE} WHERE detection_method = 'benchmark';")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Postgres ingest writes: row-by-row vs. batched")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    texts = profile_texts(args.rows)
+    vectors = np.random.default_rng(0).standard_normal((args.rows, args.dim)).astype(np.float32)
+    entities = [("name", f"Person {i}.", f"BENCH_{i}", "benchmark") for i in range(args.entities)]
+
+    try:
+        print(f"document_embeddings ({args.rows} rows, dim={args.dim})")
+        print(f"  one INSERT per row:        {rows_per_statement(texts, vectors):>10.0f} rows/sec")
+        print(f"  execute_values (page={args.page_size}): {rows_execute_values(texts, vectors, args.page_size):>10.0f} rows/sec")
+        print(f"extracted_entities ({args.entities} rows)")
+        print(f"  one connection per entity: {entities_per_connection(entities):>10.0f} rows/sec")
+        print(f"  one batched transaction:   {entities_batched(entities):>10.0f} rows/sec")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
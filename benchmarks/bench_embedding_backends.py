@@ -0,0 +1,87 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from benchmarks.synthetic import profile_texts, queries
+from config.settings import settings
+from src.components.vector_store import embedding_model_kwargs
+
+
+def load(backend: str, onnx_file: str = None) -> HuggingFaceEmbeddings:
+    return HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        cache_folder=os.environ.get("HF_HOME", "/root/.cache/huggingface"),
+        model_kwargs=embedding_model_kwargs(backend, onnx_file),
+        encode_kwargs={'normalize_embeddings': True})
+
+
+def query_latencies(embeddings: HuggingFaceEmbeddings, questions: List[str]) -> List[float]:
+    embeddings.embed_query(questions[0])
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        embeddings.embed_query(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    # Exact inner-product search, same ranking as the flat FAISS index
+    return np.argsort(-(query_vectors @ doc_vectors.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backends: query latency, throughput and agreement with torch")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--onnx-file", default=None, help="Override EMBEDDING_ONNX_FILE for the onnx backends")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = profile_texts(args.docs)
+    questions = queries(texts, args.queries)
+
+    # The stored index is built with torch; every backend is compared against it
+    reference = load("torch")
+    doc_vectors = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    reference_queries = np.asarray(reference.embed_documents(questions), dtype=np.float32)
+    reference_top = top_k(doc_vectors, reference_queries, args.k)
+
+    print(f"{'backend':<10} {'p50 ms':>8} {'p99 ms':>8} {'docs/s':>8} {'min cos':>8} {'mean cos':>9} {'top' + str(args.k) + ' agree':>10}")
+    for backend in args.backends:
+        embeddings = reference if backend == "torch" else load(backend, args.onnx_file)
+
+        latencies = query_latencies(embeddings, questions)
+
+        start = time.perf_counter()
+        backend_docs = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        docs_per_sec = len(texts) / (time.perf_counter() - start)
+
+        backend_queries = np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+        cosine = np.sum(backend_queries * reference_queries, axis=1)
+        cosine = np.concatenate([cosine, np.sum(backend_docs * doc_vectors, axis=1)])
+        # Queries from this backend against the torch-built index, as in production after switching
+        backend_top = top_k(doc_vectors, backend_queries, args.k)
+        agreement = statistics.mean(
+            len(set(a) & set(b)) / args.k for a, b in zip(backend_top, reference_top)
+        )
+
+        print(
+            f"{backend:<10} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} "
+            f"{docs_per_sec:>8.0f} {cosine.min():>8.4f} {cosine.mean():>9.4f} {agreement:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
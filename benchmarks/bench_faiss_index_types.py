@@ -0,0 +1,73 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.components.search_backends import FaissBackend
+
+
+def clustered_vectors(n: int, dim: int, rng: np.random.Generator, n_clusters: int = 64) -> np.ndarray:
+    # Profiles cluster by role/skills, so a gaussian mixture is closer to real embeddings than uniform noise
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, n_clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def measure(backend: FaissBackend, vectors: np.ndarray, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    backend.build(vectors, np.arange(len(vectors), dtype=np.int64))
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = backend.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return build_seconds, np.array(results), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def recall_at_k(exact: np.ndarray, approx: np.ndarray) -> float:
+    hits = sum(len(set(e) & set(a)) for e, a in zip(exact, approx))
+    return hits / exact.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index types: recall@k vs. flat and query latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>8} {'index':<22} {'build s':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for size in args.sizes:
+        vectors = clustered_vectors(size, args.dim, rng)
+        queries = clustered_vectors(args.queries, args.dim, rng)
+
+        build, exact, p50, p99 = measure(FaissBackend("flat"), vectors, queries, args.k)
+        print(f"{size:>8} {'flat':<22} {build:>8.2f} {1.0:>10.3f} {p50:>8.3f} {p99:>8.3f}")
+
+        for ef_search in args.ef_search:
+            build, approx, p50, p99 = measure(FaissBackend("hnsw", ef_search=ef_search), vectors, queries, args.k)
+            label = f"hnsw efSearch={ef_search}"
+            print(f"{size:>8} {label:<22} {build:>8.2f} {recall_at_k(exact, approx):>10.3f} {p50:>8.3f} {p99:>8.3f}")
+
+        for nprobe in args.nprobe:
+            backend = FaissBackend("ivf", nprobe=nprobe)
+            build, approx, p50, p99 = measure(backend, vectors, queries, args.k)
+            label = f"ivf nlist={backend.index.nlist} nprobe={backend.index.nprobe}"
+            print(f"{size:>8} {label:<22} {build:>8.2f} {recall_at_k(exact, approx):>10.3f} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
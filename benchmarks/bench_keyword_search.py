@@ -0,0 +1,70 @@
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import profile_texts, queries
+from src.components.keyword_index import KeywordIndex, extract_keywords
+
+
+def linear_scan(texts: List[str], query: str, k: int) -> List[Tuple[int, float]]:
+    # Previous VectorStore._keyword_search, kept here as the baseline
+    query_keywords = extract_keywords(query)
+    matches = []
+    for i, text in enumerate(texts):
+        score = 0.0
+        content_lower = text.lower()
+        for keyword in query_keywords:
+            if keyword.lower() in content_lower:
+                score += 1.0
+        if score > 0:
+            matches.append((i, score))
+    matches.sort(key=lambda x: x[1], reverse=True)
+    return matches[:k]
+
+
+def time_queries(fn, questions: List[str]) -> List[float]:
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        fn(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword search: linear scan vs. inverted index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 200, 2000, 20000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'build ms':>10} {'scan p50 ms':>12} {'index p50 ms':>13} {'speedup':>8} {'same':>5}")
+    for size in args.sizes:
+        texts = profile_texts(size)
+        questions = queries(texts, args.queries)
+
+        start = time.perf_counter()
+        index = KeywordIndex.from_texts(texts)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        scan = time_queries(lambda q: linear_scan(texts, q, args.k), questions)
+        indexed = time_queries(lambda q: index.search(extract_keywords(q), args.k), questions)
+
+        same = all(
+            sorted(linear_scan(texts, q, args.k), key=lambda m: (-m[1], m[0]))
+            == index.search(extract_keywords(q), args.k)
+            for q in questions[:20]
+        )
+        scan_p50 = statistics.median(scan)
+        index_p50 = statistics.median(indexed)
+        print(f"{size:>8} {build_ms:>10.1f} {scan_p50:>12.3f} {index_p50:>13.3f} "
+              f"{scan_p50 / max(index_p50, 1e-9):>7.1f}x {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from benchmarks.synthetic import queries, write_profile_pdfs
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+RECORDED_SETTINGS = [
+    "SEARCH_BACKEND", "FAISS_INDEX_TYPE", "EMBEDDING_STORAGE_DTYPE", "CHUNK_SIZE", "CHUNK_OVERLAP", "TOP_K_RESULTS",
+    "INGEST_WORKERS", "ANONYMIZE_WORKERS", "EMBED_WORKERS", "EMBED_BATCH_TOKENS", "KEYWORD_SCORING"
+]
+
+
+def timed(func: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def throughput(seconds: float, items: int, unit: str) -> Dict[str, Any]:
+    return {"seconds": round(seconds, 4), "items": items, "unit": unit, "per_sec": round(items / max(seconds, 1e-9), 1)}
+
+
+def latencies(func: Callable, inputs: List[str]) -> Dict[str, Any]:
+    samples = []
+    for item in inputs:
+        _, seconds = timed(func, item)
+        samples.append(seconds * 1000)
+    return {
+        "queries": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "per_sec": round(len(samples) / max(sum(samples) / 1000, 1e-9), 1)
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def reset_database() -> None:
+    from database import get_db_connection
+
+    # Each size starts from an empty entity table, so anonymization timings are comparable
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute((ROOT / "init.sql").read_text())
+            cur.execute("DELETE FROM extracted_entities;")
+
+
+def profile_corpus(data_root: Path, size: int, pages_per_file: int, seed: int) -> Tuple[Path, float]:
+    directory = data_root / f"profiles-{size}x{pages_per_file}-seed{seed}"
+    if len(list(directory.glob("*.pdf"))) == size:
+        return directory, 0.0
+    _, seconds = timed(write_profile_pdfs, directory, size, pages_per_file, seed)
+    return directory, seconds
+
+
+def run_size(size: int, args) -> Dict[str, Any]:
+    from benchmarks.fakes import HashingEmbeddings, fake_chat_model
+    from config.settings import settings
+    from src.components.answer_cache import AnswerCache
+    from src.components.deanonymizer import Deanonymizer
+    from src.components.documents_loader import DocumentsLoader
+    from src.components.vector_store import VectorStore
+
+    def vector_store() -> VectorStore:
+        store = VectorStore(settings)
+        if args.embeddings == "fake":
+            # Skips loading the real model (see VectorStore.embeddings)
+            store._embeddings = HashingEmbeddings(args.dim)
+        return store
+
+    data_path, generate_seconds = profile_corpus(args.data_dir, size, args.pages_per_file, args.seed)
+    reset_database()
+    stages: Dict[str, Any] = {}
+
+    loader = DocumentsLoader()
+    docs, seconds = timed(loader.load_documents, data_path)
+    stages["load_documents"] = throughput(seconds, len(docs), "pages")
+    # Questions reference employee IDs, which anonymization leaves in place
+    questions = queries([doc.page_content for doc in docs if "Personalnummer: " in doc.page_content], args.queries, args.seed)
+
+    docs, seconds = timed(loader._anonymize_documents, docs)
+    stages["anonymize_documents"] = throughput(seconds, len(docs), "pages")
+
+    chunks, seconds = timed(loader.chunk_docs, docs)
+    stages["chunk_docs"] = throughput(seconds, len(chunks), "chunks")
+
+    store = vector_store()
+    _, seconds = timed(store.generate_embeddings, [chunk.page_content for chunk in chunks])
+    stages["generate_embeddings"] = throughput(seconds, len(chunks), "chunks")
+
+    # Includes a second embedding pass, as in a rebuild
+    _, seconds = timed(store.create_index, chunks)
+    stages["create_index"] = throughput(seconds, len(chunks), "chunks")
+
+    replica = vector_store()
+    _, seconds = timed(replica._load_from_postgres)
+    stages["load_from_postgres"] = throughput(seconds, replica.index_size, "chunks")
+    # Deferred after loading; built on the first keyword search otherwise
+    _, seconds = timed(replica._build_keyword_index)
+    stages["build_keyword_index"] = throughput(seconds, replica.index_size, "chunks")
+
+    stages["keyword_search"] = latencies(lambda q: replica._keyword_search(q, settings.TOP_K_RESULTS), questions)
+    stages["search"] = latencies(lambda q: replica.search(q, settings.TOP_K_RESULTS), questions)
+
+    if args.llm != "none":
+        from src.components.rag_chain import RAGChain
+
+        chain = RAGChain(
+            replica,
+            AnswerCache(max_size=0),
+            Deanonymizer(refresh_seconds=settings.DEANONYMIZATION_REFRESH_SECONDS),
+            llm=fake_chat_model() if args.llm == "fake" else None
+        )
+        stages["ask"] = latencies(chain.ask, questions)
+
+    return {
+        "files": size,
+        "pages": len(docs),
+        "chunks": len(chunks),
+        "generate_pdfs_seconds": round(generate_seconds, 3),
+        "stages": stages
+    }
+
+
+def print_results(results: List[Dict[str, Any]], baseline: Dict[int, Dict[str, Any]]) -> None:
+    print(f"{'files':>7} {'stage':<22} {'value':>12} {'unit':<10} {'vs base':>8}")
+    for result in results:
+        base_stages = baseline.get(result["files"], {}).get("stages", {})
+        for stage, values in result["stages"].items():
+            key = "p50_ms" if "p50_ms" in values else "per_sec"
+            unit = "ms p50" if key == "p50_ms" else f"{values['unit']}/s"
+            ratio = ""
+            if key in base_stages.get(stage, {}):
+                # > 1.00x is always an improvement (higher throughput or lower latency)
+                base, value = base_stages[stage][key], values[key]
+                ratio = f"{(value / base if key == 'per_sec' else base / value) if base and value else 0:.2f}x"
+            print(f"{result['files']:>7} {stage:<22} {values[key]:>12.3f} {unit:<10} {ratio:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark of the ingest and query stages on synthetic profile PDFs. "
+                    "Needs a reachable Postgres; use a scratch database, the index tables are replaced."
+    )
+    parser.add_argument("--database", required=True, help="Scratch database name (overrides DB_NAME)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="Number of profile PDFs")
+    parser.add_argument("--pages-per-file", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--embeddings", choices=["fake", "local"], default="fake",
+                        help="fake: deterministic hashing embeddings; local: the configured EMBEDDING_MODEL")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the fake embeddings")
+    parser.add_argument("--llm", choices=["fake", "openai", "none"], default="fake")
+    parser.add_argument("--data-dir", type=Path, default=Path("/tmp/rag-bench-pdfs"), help="Cache for generated PDFs")
+    parser.add_argument("--output", type=Path, help="Results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    # Before the first import of database/settings; caches off so every query is measured cold
+    os.environ["DB_NAME"] = args.database
+    os.environ["QUERY_EMBEDDING_CACHE_SIZE"] = "0"
+    os.environ["QUERY_EMBEDDING_CACHE_PERSIST"] = "false"
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+    from config.settings import settings
+
+    revision = git_revision()
+    results = [run_size(size, args) for size in args.sizes]
+    report = {
+        **revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": {"platform": platform.platform(), "cpus": os.cpu_count()},
+        "embeddings": f"fake-{args.dim}" if args.embeddings == "fake" else settings.EMBEDDING_MODEL,
+        "llm": args.llm if args.llm != "openai" else settings.CHAT_MODEL,
+        "settings": {name: str(getattr(settings, name)) for name in RECORDED_SETTINGS},
+        "results": results
+    }
+
+    baseline = {}
+    if args.compare:
+        baseline = {result["files"]: result for result in json.loads(args.compare.read_text())["results"]}
+    print_results(results, baseline)
+
+    output = args.output or RESULTS_DIR / f"{revision['commit'][:12]}{'-dirty' if revision['dirty'] else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
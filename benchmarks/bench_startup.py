@@ -0,0 +1,96 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PHASES = ["imports", "pipeline", "index", "model", "ready", "first_query"]
+# Heavy third-party packages; reported as imported before or only after the service is ready
+HEAVY_MODULES = ["faiss", "langchain", "psycopg2", "numpy", "torch", "sentence_transformers", "langchain_openai"]
+
+
+def run_child(mode: str) -> None:
+    # Runs in a fresh interpreter so import and model load costs are not cached
+    sys.path.insert(0, str(ROOT))
+    timings = {}
+    start = time.perf_counter()
+
+    stage = time.perf_counter()
+    from src.rag_pipeline import RAGPipeline
+    from config.settings import settings
+    timings["imports"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    pipeline = RAGPipeline()
+    timings["pipeline"] = time.perf_counter() - stage
+
+    timings["model"] = 0.0
+    if mode == "eager":
+        # Previous behaviour: model built in VectorStore.__init__ plus a dimension probe after loading
+        stage = time.perf_counter()
+        pipeline.vector_store.embeddings
+        timings["model"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    if not pipeline.vector_store.load_index(settings.INDEX_SNAPSHOT_PATH):
+        raise SystemExit("No stored index; build one first (python src/main.py --rebuild)")
+    timings["index"] = time.perf_counter() - stage
+
+    if mode == "eager":
+        stage = time.perf_counter()
+        pipeline.vector_store.embeddings.embed_query("dimension_check")
+        timings["model"] += time.perf_counter() - stage
+    timings["ready"] = time.perf_counter() - start
+    imported_at_ready = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    # The lazy path pays for the model here unless the background warm-up got to it first
+    stage = time.perf_counter()
+    pipeline.vector_store.retrieve("Python Entwickler mit Erfahrung in Kubernetes")
+    timings["first_query"] = time.perf_counter() - stage
+
+    print(json.dumps({**timings, "imported_at_ready": imported_at_ready}))
+
+
+def measure(mode: str, runs: int):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    result = {phase: statistics.median(sample[phase] for sample in samples) for phase in PHASES}
+    result["imported_at_ready"] = samples[-1]["imported_at_ready"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Startup time per phase: lazy embedding model loading (torch / sentence-transformers) "
+                    "vs. eager (previous) startup"
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", choices=["lazy", "eager"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    results = {mode: measure(mode, args.runs) for mode in ("eager", "lazy")}
+    print(f"{'phase':<12} {'eager s':>9} {'lazy s':>9}")
+    for phase in PHASES:
+        print(f"{phase:<12} {results['eager'][phase]:>9.3f} {results['lazy'][phase]:>9.3f}")
+    speedup = results["eager"]["ready"] / max(results["lazy"]["ready"], 1e-9)
+    print(f"\nTime to ready: {speedup:.1f}x faster with lazy model loading (median of {args.runs} runs)")
+    # Only the embedding model stack is deferred; FAISS, Postgres and LangChain are needed to load the index
+    lazy_imported = results["lazy"]["imported_at_ready"]
+    print(f"Imported before ready: {', '.join(lazy_imported) or '-'}")
+    print(f"Deferred until first use: {', '.join(name for name in HEAVY_MODULES if name not in lazy_imported) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
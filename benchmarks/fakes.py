@@ -0,0 +1,51 @@
+import hashlib
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic stand-in for the embedding model: signed feature hashing of word tokens.
+
+    Same text -> same vector in every process and run (blake2b, not hash()), and texts sharing
+    words end up close, so retrieval results stay meaningful. Vectors are L2-normalized like the
+    real model's (normalize_embeddings=True).
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, token: str) -> Tuple[int, float]:
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            bucket = self._buckets[token] = (h % self.dim, 1.0 if (h >> 32) & 1 else -1.0)
+        return bucket
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN.findall(text.lower()):
+            index, sign = self._bucket(token)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def fake_chat_model() -> FakeListChatModel:
+    # Answers in the prompt's format with a placeholder, so de-anonymization does real work
+    return FakeListChatModel(responses=[
+        "Der beste Mitarbeiter für die Anfrage ist: FirstName_1\n\n"
+        "Begründung: FirstName_1 (geboren BIRTHDATE_1 in BIRTHPLACE_1) erfüllt die geforderten Skills."
+    ])
@@ -0,0 +1,103 @@
+import random
+from pathlib import Path
+from typing import List
+
+FIRST_NAMES = ["Anna", "Lukas", "Sophie", "Jonas", "Marie", "Felix", "Emma", "Paul", "Lea", "Maximilian",
+               "Hannah", "Leon", "Mia", "Tommy", "Laura", "David", "Sarah", "Jan", "Julia", "Noah"]
+LAST_INITIALS = "ABCDEFGHIJKLMNOPRSTUVWZ"
+PLACES = ["Berlin", "Hamburg", "München", "Köln", "Frankfurt am Main", "Stuttgart", "Düsseldorf", "Leipzig",
+          "Dresden", "Wien", "Zürich", "London", "New York"]
+SKILLS = ["Python", "Java", "C#", "SAP S4HANA", "Kubernetes", "Docker", "Azure", "AWS", "PostgreSQL", "React",
+          "Angular", "TypeScript", "Terraform", "Spark", "PyTorch", "LangChain", "Scrum", "ITIL", "Go", "Rust"]
+CERTIFICATES = ["AZ900", "AZ104", "CKA2023", "PSM1", "ITIL4", "SAA-C03", "OCPJP17", "TOGAF9"]
+LANGUAGES = ["Deutsch", "Englisch", "Französisch", "Spanisch", "Italienisch", "Polnisch"]
+PROJECT_WORDS = ["Migration", "Plattform", "Datenpipeline", "Portal", "Schnittstelle", "Reporting", "Cloud",
+                 "Modernisierung", "Automatisierung", "Analyse"]
+
+
+def profile_text(i: int, rng: random.Random) -> str:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_INITIALS)}."
+    birthdate = f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1960, 2002)}"
+    place = rng.choice(PLACES)
+    employee_id = f"{4000000000 + i * 7919}"
+    skills = ", ".join(rng.sample(SKILLS, 5))
+    certificates = ", ".join(rng.sample(CERTIFICATES, 2))
+    languages = ", ".join(rng.sample(LANGUAGES, 2))
+
+    projects = []
+    for p in range(rng.randint(2, 4)):
+        ticket = f"PRJ{rng.randint(100000, 999999)}"
+        projects.append(
+            f"{rng.randint(2012, 2025)}: {rng.choice(PROJECT_WORDS)} {rng.choice(PROJECT_WORDS)} ({ticket}) "
+            f"mit {rng.choice(SKILLS)} und {rng.choice(SKILLS)}."
+        )
+
+    return (
+        f"{name}, Senior Consultant\n"
+        f"Name: {name}\n"
+        f"Geburtsdatum: {birthdate}\n"
+        f"Geburtsort: {place}\n"
+        f"Personalnummer: {employee_id}\n"
+        f"Skills: {skills}\n"
+        f"Zertifikate: {certificates}\n"
+        f"Sprachen: {languages}\n"
+        f"Projekte:\n" + "\n".join(projects) + "\n"
+    )
+
+
+def project_page(rng: random.Random, lines: int = 30) -> str:
+    projects = [
+        f"{rng.randint(2005, 2025)}: {rng.choice(PROJECT_WORDS)} {rng.choice(PROJECT_WORDS)} "
+        f"(PRJ{rng.randint(100000, 999999)}) bei Kunde {rng.choice(PLACES)}, "
+        f"Rolle {rng.choice(['Entwickler', 'Architekt', 'Projektleiter', 'Consultant'])}, "
+        f"Technologien: {', '.join(rng.sample(SKILLS, 3))}."
+        for _ in range(lines)
+    ]
+    return "Projekterfahrung (Fortsetzung):\n" + "\n".join(projects) + "\n"
+
+
+def profile_texts(n: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    return [profile_text(i, rng) for i in range(n)]
+
+
+def queries(texts: List[str], n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    result = []
+    for _ in range(n):
+        text = rng.choice(texts)
+        employee_id = text.split("Personalnummer: ")[1].split("\n")[0]
+        result.append(f"Wer hat die Personalnummer {employee_id} und kann {rng.choice(SKILLS)} mit {rng.choice(CERTIFICATES)}?")
+    return result
+
+
+def write_profile_pdfs(directory: Path, n: int, pages_per_file: int = 2, seed: int = 42) -> List[Path]:
+    """Writes n profile PDFs (profile page + project history pages) without network access."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+
+    directory.mkdir(parents=True, exist_ok=True)
+    width, height = A4
+    margin, font_size, leading = 50, 10, 13
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n):
+        path = directory / f"profile_{i:06d}.pdf"
+        pages = [profile_text(i, rng)] + [project_page(rng) for _ in range(pages_per_file - 1)]
+        pdf = canvas.Canvas(str(path), pagesize=A4)
+        for page in pages:
+            pdf.setFont("Helvetica", font_size)
+            y = height - margin
+            for line in page.splitlines():
+                for wrapped in simpleSplit(line, "Helvetica", font_size, width - 2 * margin) or [""]:
+                    if y < margin:
+                        pdf.showPage()
+                        pdf.setFont("Helvetica", font_size)
+                        y = height - margin
+                    pdf.drawString(margin, y, wrapped)
+                    y -= leading
+            pdf.showPage()
+        pdf.save()
+        paths.append(path)
+    return paths
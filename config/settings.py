@@ -10,17 +10,110 @@ class Settings:
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
     CHAT_MODEL: str = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
 
+    # Embedding runtime: "torch", "onnx" (exported model) or "onnx-int8" (dynamically quantized ONNX file);
+    # EMBEDDING_ONNX_FILE selects a specific file in the model repo, e.g. onnx/model_qint8_avx512_vnni.onnx;
+    # onnx-int8 defaults to onnx/model_quint8_avx2.onnx, which other models may not ship
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    EMBEDDING_ONNX_FILE: str = os.getenv("EMBEDDING_ONNX_FILE", "")
+    # Minimum probe cosine between the index's vectors and the current backend's before a warning is logged
+    EMBEDDING_COMPAT_THRESHOLD: float = float(os.getenv("EMBEDDING_COMPAT_THRESHOLD", "0.99"))
+
     DATA_PATH: Path = Path(os.getenv("DATA_PATH", "/app/data"))
     STORAGE_PATH: Path = Path(os.getenv("STORAGE_PATH", "/app/storage"))
 
+    # Worker processes for PDF parsing; 1 = sequential, 0 = one per CPU core
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "1"))
+
+    # Worker processes for anonymization (1 = in-process, 0 = one per CPU core), used from this many pages on.
+    # Workers draw placeholders from one shared allocator, so numbering then follows scheduling order
+    ANONYMIZE_WORKERS: int = int(os.getenv("ANONYMIZE_WORKERS", "1"))
+    ANONYMIZE_PARALLEL_MIN_PAGES: int = int(os.getenv("ANONYMIZE_PARALLEL_MIN_PAGES", "500"))
+
+    # Streaming rebuild: chunks per embed/persist batch, batches buffered between stages, and whether an
+    # interrupted rebuild continues where it stopped
+    INGEST_BATCH_CHUNKS: int = int(os.getenv("INGEST_BATCH_CHUNKS", "512"))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "2"))
+    INGEST_RESUME: bool = os.getenv("INGEST_RESUME", "true").lower() in ("1", "true", "yes")
+
+    # Ingest embedding: worker processes (1 = in-process, 0 = one per CPU core), token budget per
+    # batch (texts are length-sorted, short chunks get bigger batches) and an upper bound on batch size
+    EMBED_WORKERS: int = int(os.getenv("EMBED_WORKERS", "1"))
+    EMBED_BATCH_TOKENS: int = int(os.getenv("EMBED_BATCH_TOKENS", "8192"))
+    EMBED_MAX_BATCH_SIZE: int = int(os.getenv("EMBED_MAX_BATCH_SIZE", "128"))
+
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))
     TOP_K_RESULTS: int = int(os.getenv("TOP_K_RESULTS", "5"))
 
+    # Semantic search backend: "faiss" (in-process) or "pgvector" (top-k computed in Postgres)
+    SEARCH_BACKEND: str = os.getenv("SEARCH_BACKEND", "faiss")
+    # In-process FAISS index: "flat" (exact), "hnsw" or "ivf" (approximate), "fp16", "sq8" or "pq" (compressed)
+    FAISS_INDEX_TYPE: str = os.getenv("FAISS_INDEX_TYPE", "flat")
+    FAISS_HNSW_M: int = int(os.getenv("FAISS_HNSW_M", "32"))
+    FAISS_HNSW_EF_CONSTRUCTION: int = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+    FAISS_HNSW_EF_SEARCH: int = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+    FAISS_IVF_NLIST: int = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0 = 4 * sqrt(number of vectors)
+    FAISS_IVF_NPROBE: int = int(os.getenv("FAISS_IVF_NPROBE", "8"))
+    # Compressed FAISS types: "fp16" / "sq8" (scalar quantization) and "pq" (FAISS_PQ_M bytes per vector)
+    FAISS_PQ_M: int = int(os.getenv("FAISS_PQ_M", "48"))
+    # Re-score FAISS_RESCORE_FACTOR x more candidates exactly with the stored full-precision vectors
+    FAISS_RESCORE: bool = os.getenv("FAISS_RESCORE", "false").lower() in ("1", "true", "yes")
+    FAISS_RESCORE_FACTOR: int = int(os.getenv("FAISS_RESCORE_FACTOR", "4"))
+    # Encoding of stored embeddings (Postgres BYTEA and re-scoring vectors): "float32" or "float16"
+    EMBEDDING_STORAGE_DTYPE: str = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+    PGVECTOR_INDEX: str = os.getenv("PGVECTOR_INDEX", "hnsw")  # hnsw | ivfflat
+    PGVECTOR_HNSW_M: int = int(os.getenv("PGVECTOR_HNSW_M", "16"))
+    PGVECTOR_HNSW_EF_CONSTRUCTION: int = int(os.getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "64"))
+    PGVECTOR_HNSW_EF_SEARCH: int = int(os.getenv("PGVECTOR_HNSW_EF_SEARCH", "40"))
+    PGVECTOR_IVF_LISTS: int = int(os.getenv("PGVECTOR_IVF_LISTS", "100"))
+    PGVECTOR_IVF_PROBES: int = int(os.getenv("PGVECTOR_IVF_PROBES", "10"))
+
+    # LRU cache for query embeddings (0 disables); PERSIST keeps entries in Postgres across restarts
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+    QUERY_EMBEDDING_CACHE_PERSIST: bool = os.getenv("QUERY_EMBEDDING_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+    # Most recently used rows kept in the persistent table (0 keeps all); pruned on warm-up and while writing
+    QUERY_EMBEDDING_CACHE_MAX_ROWS: int = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ROWS", "100000"))
+
+    # Cache for complete answers (0 disables); SEMANTIC_THRESHOLD > 0 also matches similar questions
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+    ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_SEMANTIC_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0"))
+
+    # De-anonymization mapping is cached in memory and reloaded after ingestion; > 0 also reloads
+    # it periodically (for replicas that do not ingest themselves)
+    DEANONYMIZATION_REFRESH_SECONDS: float = float(os.getenv("DEANONYMIZATION_REFRESH_SECONDS", "0"))
+
+    # Keyword search: "count" (number of matched keywords) or "bm25"
+    KEYWORD_SCORING: str = os.getenv("KEYWORD_SCORING", "count")
+    BM25_K1: float = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+
+    # Rows per multi-row INSERT when persisting embeddings
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv("DB_WRITE_BATCH_SIZE", "500"))
+    # Rows per round trip when streaming embeddings out of Postgres
+    DB_FETCH_CHUNK_SIZE: int = int(os.getenv("DB_FETCH_CHUNK_SIZE", "2000"))
+
+    # Async API: questions in flight per process, per-question timeout (0 = none) and threads for retrieval
+    ASYNC_MAX_CONCURRENCY: int = int(os.getenv("ASYNC_MAX_CONCURRENCY", "16"))
+    ASK_TIMEOUT_SECONDS: float = float(os.getenv("ASK_TIMEOUT_SECONDS", "60"))
+    RETRIEVAL_WORKERS: int = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+    # Batch mode: questions per retrieval batch and concurrent LLM calls per batch
+    BATCH_SIZE: int = int(os.getenv("BATCH_SIZE", "64"))
+    BATCH_LLM_CONCURRENCY: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+    # Load the embedding model (and build the keyword index) in a background thread once the prompt/server is up
+    BACKGROUND_WARMUP: bool = os.getenv("BACKGROUND_WARMUP", "true").lower() in ("1", "true", "yes")
+
+    # HTTP server mode (src/main.py --serve)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8080"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "8"))
+
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
-    FAISS_INDEX_PATH: Path = STORAGE_PATH / "faiss_index.pkl"
-    METADATA_PATH: Path = STORAGE_PATH / "metadata.pkl"
+    # Versioned on-disk snapshot (FAISS index + chunk texts/metadata), memory-mapped at startup
+    INDEX_SNAPSHOT_PATH: Path = STORAGE_PATH / "index_snapshot"
+    SNAPSHOT_MMAP: bool = os.getenv("SNAPSHOT_MMAP", "true").lower() in ("1", "true", "yes")
 
     def validate(self) -> None:
         if not self.OPENAI_API_KEY:
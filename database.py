@@ -1,8 +1,16 @@
+import asyncio
 import os
+import threading
+import time
+import weakref
 import psycopg2
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
+from src.utils.tracing import span
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -13,19 +21,185 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD') or os.getenv('PGPASSWORD', 'password123')
 }
 
+POOL_CONFIG = {
+    'minconn': int(os.getenv('DB_POOL_MIN', '1')),
+    'maxconn': int(os.getenv('DB_POOL_MAX', '10')),
+    # seconds to wait for a free connection before giving up
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+    # connections idle longer than this are pinged before being handed out
+    'healthcheck_idle': float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', '30'))
+}
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool that blocks (up to a timeout) instead of failing when exhausted."""
+
+    def __init__(self, minconn, maxconn, timeout, healthcheck_idle, **config):
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **config)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        # Keyed by the connection object, not id(): entries go away with the connection and an id
+        # reused by a later connection cannot inherit a stale timestamp
+        self._last_used = weakref.WeakKeyDictionary()
+        # The minconn connections opened above age from now on, like connections returned by release()
+        for conn in getattr(self._pool, "_pool", []):
+            self._last_used[conn] = time.monotonic()
+        self.maxconn = maxconn
+        self.stats = {
+            'acquired': 0,
+            'in_use': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'acquire_seconds_total': 0.0,
+            'acquire_seconds_max': 0.0
+        }
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        # A connection the pool has just opened has not been used yet and needs no ping
+        if time.monotonic() - self._last_used.setdefault(conn, time.monotonic()) < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self):
+        start_time = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise PoolTimeoutError(f"No database connection available after {self.timeout} seconds")
+
+        try:
+            # Idle connections may all have died (e.g. after a DB restart); discard them until one
+            # passes, at the latest a freshly opened one once the pool has no idle connections left
+            conn = self._pool.getconn()
+            discarded = 0
+            while not self._is_healthy(conn):
+                with self._lock:
+                    self.stats['health_check_failures'] += 1
+                self._last_used.pop(conn, None)
+                self._pool.putconn(conn, close=True)
+                discarded += 1
+                # At most maxconn idle connections exist, so by now even a fresh one has failed
+                if discarded > self.maxconn:
+                    raise psycopg2.OperationalError(f"No healthy database connection after {discarded} attempts")
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        elapsed = time.perf_counter() - start_time
+        with self._lock:
+            self.stats['acquired'] += 1
+            self.stats['in_use'] += 1
+            self.stats['acquire_seconds_total'] += elapsed
+            self.stats['acquire_seconds_max'] = max(self.stats['acquire_seconds_max'], elapsed)
+        return conn
+
+    def release(self, conn, broken=False):
+        close = broken or bool(conn.closed)
+        try:
+            if close:
+                self._last_used.pop(conn, None)
+            else:
+                self._last_used[conn] = time.monotonic()
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._lock:
+                self.stats['in_use'] -= 1
+            self._slots.release()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['max_size'] = self.maxconn
+        stats['acquire_seconds_avg'] = stats['acquire_seconds_total'] / stats['acquired'] if stats['acquired'] else 0.0
+        return stats
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # One pool per process; a forked child (e.g. ingest workers) must not reuse the parent's sockets
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(**POOL_CONFIG, **DB_CONFIG)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def get_pool_stats():
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return _pool.get_stats()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
 @contextmanager
 def get_db_connection():
-    conn = psycopg2.connect(**DB_CONFIG)
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+    # One "db" span per round trip (pool wait, statements, commit) under the current request/ingest span
+    with span("db"):
+        pool = get_pool()
+        with span("db_acquire"):
+            conn = pool.acquire()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if conn and not conn.closed:
+                conn.rollback()
+            raise e
+        finally:
+            pool.release(conn, broken)
+
+
+@asynccontextmanager
+async def get_async_db_connection():
+    # Blocking psycopg2 calls run in worker threads; run queries on the yielded connection via asyncio.to_thread too
+    with span("db"):
+        pool = get_pool()
+        with span("db_acquire"):
+            conn = await asyncio.to_thread(pool.acquire)
+        broken = False
+        try:
+            yield conn
+            await asyncio.to_thread(conn.commit)
+        except Exception as e:
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if conn and not conn.closed:
+                await asyncio.to_thread(conn.rollback)
+            raise e
+        finally:
+            pool.release(conn, broken)
 
 def test_connection():
     try:
@@ -46,6 +220,31 @@ def insert_extracted_entity(entity_type, original_text, anonymized_text, detecti
                 VALUES (%s, %s, %s, %s);
             """, (entity_type, original_text, anonymized_text, detection_method))
 
+def insert_extracted_entities(entities, page_size=1000):
+    # entities: iterable of (entity_type, original_text, anonymized_text, detection_method), one transaction
+    rows = list(entities)
+    if not rows:
+        return 0
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO extracted_entities (entity_type, original_text, anonymized_text, detection_method)
+                VALUES %s;
+            """, rows, page_size=page_size)
+    return len(rows)
+
+def get_entity_placeholders():
+    # original value -> placeholder, first assignment wins (mirrors get_entities_for_deanonymization)
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT DISTINCT ON (original_text) original_text, anonymized_text
+                FROM extracted_entities
+                WHERE anonymized_text IS NOT NULL
+                ORDER BY original_text, id;
+            """)
+            return {row[0]: row[1] for row in cur.fetchall()}
+
 def get_entities_for_deanonymization():
     with get_db_connection() as conn:
         with conn.cursor() as cur:
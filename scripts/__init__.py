@@ -0,0 +1 @@
+"""Helper scripts for local development."""
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from pypdf import PdfReader
+
+from benchmarks.synthetic import write_profile_pdfs
+from config.settings import settings
+
+
+def create_pdfs(output_dir: Optional[Path] = None, count: int = 30, pages_per_file: int = 2, seed: int = 42) -> None:
+    # Synthetic employee profiles (names, birth dates/places, IDs, skills); no network access needed
+    output_dir = output_dir or settings.DATA_PATH
+    paths = write_profile_pdfs(output_dir, count, pages_per_file, seed)
+    print(f"Wrote {len(paths)} sample PDFs to {output_dir}")
+
+
+def read_pdfs(output_dir: Optional[Path] = None) -> None:
+    output_dir = output_dir or settings.DATA_PATH
+    for pdf in sorted(output_dir.glob("*.pdf")):
+        print(f"\n{pdf.name}")
+        for ln in PdfReader(pdf).pages[0].extract_text().splitlines()[:2]:
+            print(" ", ln.strip())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic profile PDFs offline")
+    parser.add_argument("--output", type=Path, default=None, help="Target directory (default: DATA_PATH)")
+    parser.add_argument("--count", type=int, default=30)
+    parser.add_argument("--pages", type=int, default=2, help="Pages per PDF")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    create_pdfs(args.output, args.count, args.pages, args.seed)
+    read_pdfs(args.output)
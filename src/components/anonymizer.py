@@ -0,0 +1,191 @@
+import math
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from src.utils.logger import logger
+
+# (entity_type, original_text, anonymized_text, detection_method), the extracted_entities row layout
+Entity = Tuple[str, str, str, str]
+
+PLACEHOLDER_PREFIXES = {
+    "name": "FirstName_",
+    "birthdate": "BIRTHDATE_",
+    "birthplace": "BIRTHPLACE_",
+}
+
+_WORD = r"[A-ZÄÖÜ][\wäöüß-]+"
+
+# One alternation, one scan per page. Each alternative is an outer named group, so Match.lastgroup
+# names the kind that matched; at a given position the leftmost alternative wins.
+_ENTITY_PATTERN = re.compile("|".join([
+    # Labeled name field: "Name: First Last" or "Name: First L". The "First L." form is left to
+    # name_initial so it shares the placeholder of the same name in the profile header
+    rf"(?P<name_label>\bName\s*:\s*(?!{_WORD}\s[A-ZÄÖÜ]\.(?!\w))"
+    rf"(?P<label_first>{_WORD})\s+(?P<label_last>{_WORD}|[A-ZÄÖÜ])\.?\b)",
+    # Names like "Barack O." or "Mahatma G." (Firstname capitalized + space + capital initial + dot),
+    # including the header form "First X., <something>"
+    rf"(?P<name_initial>\b(?P<initial_first>{_WORD})\s(?P<initial_letter>[A-ZÄÖÜ])\.(?!\w))",
+    # German/EN birth date variants; the label is kept, only the date is replaced
+    r"(?P<birthdate>\b(?:Geburtsdatum[:]?\s*|Birth\s*date[:]?\s*)?"
+    r"(?P<date_value>(?:[0-3]?\d[\.\-/][01]?\d[\.\-/](?:19|20)\d\d)|(?:(?:19|20)\d\d-[01]?\d-[0-3]?\d))\b)",
+    # Birth place: words after Geburtsort/Birth place
+    r"(?P<birthplace>\b(?:Geburtsort|Birth\s*place)[:]?\s*"
+    r"(?P<place_value>[A-ZÄÖÜ][\wäöüßÄÖÜ-]+(?:\s+[A-ZÄÖÜ][\wäöüßÄÖÜ-]+)*))",
+]))
+
+
+def _next_counter(value_to_placeholder: Dict[str, str], prefix: str) -> int:
+    numbers = [
+        int(placeholder[len(prefix):]) for placeholder in value_to_placeholder.values()
+        if placeholder.startswith(prefix) and placeholder[len(prefix):].isdigit()
+    ]
+    return max(numbers, default=0) + 1
+
+
+class PlaceholderAllocator:
+    """Maps original values to placeholders, one counter per placeholder prefix.
+
+    Seeded with the stored entities so repeated occurrences (also across incremental syncs) get the
+    same placeholder. New assignments are only buffered in pending; the caller writes them in one batch.
+    """
+
+    def __init__(
+        self,
+        known: Optional[Dict[str, str]] = None,
+        pending: Optional[List[Entity]] = None,
+        counters: Optional[Dict[str, int]] = None
+    ):
+        self.known: Dict[str, str] = known if known is not None else {}
+        self.pending: List[Entity] = pending if pending is not None else []
+        self.counters: Dict[str, int] = counters if counters is not None else {
+            prefix: _next_counter(self.known, prefix) for prefix in PLACEHOLDER_PREFIXES.values()
+        }
+
+    def _allocate(self, prefix: str, value: str) -> Tuple[str, bool]:
+        placeholder = f"{prefix}{self.counters[prefix]}"
+        self.counters[prefix] += 1
+        return placeholder, True
+
+    def assign(self, entity_type: str, value: str, method: str) -> str:
+        placeholder = self.known.get(value)
+        if placeholder is None:
+            placeholder, new = self._allocate(PLACEHOLDER_PREFIXES[entity_type], value)
+            self.known[value] = placeholder
+            if new:
+                self.pending.append((entity_type, value, placeholder, method))
+        return placeholder
+
+
+class SharedPlaceholderAllocator(PlaceholderAllocator):
+    """Allocator for worker processes: placeholders and counters live in a multiprocessing.Manager.
+
+    Known values are served from a local copy. For a new value the worker proposes a placeholder
+    from a block of counter values it reserved and publishes it with one setdefault round trip;
+    if another worker was first, its placeholder wins. Placeholders stay unique and consistent,
+    numbers may have gaps. The entity is reported (pending) by the worker whose placeholder won.
+    """
+
+    def __init__(self, shared, counters, lock, block_size: int = 256):
+        super().__init__(known=shared.copy(), counters={})
+        self.shared = shared
+        self.shared_counters = counters
+        self.lock = lock
+        self.block_size = block_size
+        # prefix -> (next reserved number, end of the reserved block)
+        self.blocks: Dict[str, Tuple[int, int]] = {}
+
+    def _reserve(self, prefix: str) -> int:
+        start, end = self.blocks.get(prefix, (0, 0))
+        if start >= end:
+            with self.lock:
+                start = self.shared_counters[prefix]
+                end = start + self.block_size
+                self.shared_counters[prefix] = end
+        self.blocks[prefix] = (start + 1, end)
+        return start
+
+    def _allocate(self, prefix: str, value: str) -> Tuple[str, bool]:
+        candidate = f"{prefix}{self._reserve(prefix)}"
+        placeholder = self.shared.setdefault(value, candidate)
+        return placeholder, placeholder == candidate
+
+
+class Anonymizer:
+    """Replaces names, birth dates and birth places with placeholders in a single regex pass per page."""
+
+    def __init__(self, allocator: Optional[PlaceholderAllocator] = None):
+        self.allocator = allocator if allocator is not None else PlaceholderAllocator()
+
+    def _replace(self, m: re.Match) -> str:
+        kind = m.lastgroup
+        assign = self.allocator.assign
+        if kind == "name_initial":
+            return assign("name", f"{m.group('initial_first')} {m.group('initial_letter')}.", "regex_name")
+        if kind == "name_label":
+            return "Name: " + assign("name", f"{m.group('label_first')} {m.group('label_last')}", "regex_name_label")
+        value_group = "date_value" if kind == "birthdate" else "place_value"
+        prefix = m.group(0)[:m.start(value_group) - m.start()]
+        method = "regex_date" if kind == "birthdate" else "regex_place"
+        return prefix + assign(kind, m.group(value_group), method)
+
+    def anonymize_text(self, text: str) -> str:
+        return _ENTITY_PATTERN.sub(self._replace, text)
+
+    def anonymize(self, docs: List[Document]) -> List[Document]:
+        for doc in docs:
+            text = self.anonymize_text(doc.page_content)
+            if text != doc.page_content:
+                doc.page_content = text
+        return docs
+
+    def anonymize_parallel(self, docs: List[Document], workers: int) -> List[Document]:
+        """Anonymizes docs in worker processes that share one placeholder allocator.
+
+        Only page texts travel to the workers. New entities end up in self.allocator.pending in
+        page order, known values are updated and counters continue after the highest assigned number.
+        """
+        allocator = self.allocator
+        slice_size = max(1, math.ceil(len(docs) / (workers * 4)))
+        slices = [docs[i:i + slice_size] for i in range(0, len(docs), slice_size)]
+
+        # Spawned like the parse pool: this runs on ingestion threads, where fork is unsafe
+        context = multiprocessing.get_context("spawn")
+        with context.Manager() as manager:
+            shared = manager.dict(allocator.known)
+            counters = manager.dict(allocator.counters)
+            lock = manager.Lock()
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(shared, counters, lock)
+            ) as executor:
+                results = executor.map(_anonymize_texts, [[doc.page_content for doc in part] for part in slices])
+                for part, (texts, pending) in zip(slices, results):
+                    for doc, text in zip(part, texts):
+                        if text != doc.page_content:
+                            doc.page_content = text
+                    allocator.known.update({original: placeholder for _, original, placeholder, _ in pending})
+                    allocator.pending.extend(pending)
+            # Numbers reserved by the workers but not used are free again once the pool is gone
+            for prefix in allocator.counters:
+                allocator.counters[prefix] = max(allocator.counters[prefix], _next_counter(allocator.known, prefix))
+
+        logger.info(f"Anonymized {len(docs)} pages with {workers} worker processes")
+        return docs
+
+
+# Per worker process, set up once by the pool initializer
+_worker_anonymizer: Optional[Anonymizer] = None
+
+
+def _init_worker(shared, counters, lock) -> None:
+    global _worker_anonymizer
+    _worker_anonymizer = Anonymizer(SharedPlaceholderAllocator(shared, counters, lock))
+
+
+def _anonymize_texts(texts: List[str]) -> Tuple[List[str], List[Entity]]:
+    allocator = _worker_anonymizer.allocator
+    allocator.pending = []
+    return [_worker_anonymizer.anonymize_text(text) for text in texts], allocator.pending
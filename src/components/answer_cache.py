@@ -0,0 +1,113 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.components.embedding_cache import normalize_query
+
+
+class AnswerCache:
+    """TTL + LRU cache for complete RAGChain.ask responses.
+
+    Keys include the vector store's index_version, so entries from before a rebuild or sync
+    can never be served. With a semantic_threshold > 0, an exact-key miss falls back to the
+    cached question whose (normalized) query embedding has the highest inner product with
+    the new one, if it reaches the threshold.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 3600.0, semantic_threshold: float = 0.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any], Optional[np.ndarray]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.enabled and self.semantic_threshold > 0
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.evictions += len(expired)
+
+    def get(self, question: str, index_version: str, query_vector: np.ndarray = None) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        key = (str(index_version), normalize_query(question))
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._hit(entry[1], "exact")
+
+            if self.semantic and query_vector is not None:
+                best_key, best_score = None, self.semantic_threshold
+                for candidate_key, (_, _, vector) in self._entries.items():
+                    if candidate_key[0] != key[0] or vector is None:
+                        continue
+                    score = float(np.dot(vector, query_vector))
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    return self._hit(self._entries[best_key][1], "semantic")
+
+            self.misses += 1
+            return None
+
+    @staticmethod
+    def _hit(response: Dict[str, Any], kind: str) -> Dict[str, Any]:
+        response = copy.deepcopy(response)
+        response["cache_hit"] = kind
+        return response
+
+    def put(self, question: str, index_version: str, response: Dict[str, Any], query_vector: np.ndarray = None) -> None:
+        if not self.enabled:
+            return
+
+        key = (str(index_version), normalize_query(question))
+        vector = np.asarray(query_vector, dtype=np.float32) if query_vector is not None else None
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(response), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "semantic_threshold": self.semantic_threshold,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,167 @@
+import re
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from src.utils.logger import logger
+from database import get_entities_for_deanonymization
+
+# Placeholders look like FirstName_12 / BIRTHDATE_3 / BIRTHPLACE_7: a prefix followed by a counter
+_NUMBERED_PLACEHOLDER = re.compile(r"^(.*?)(\d+)$")
+# Longest counter a streamed placeholder is held back for
+_MAX_COUNTER_DIGITS = 12
+
+
+class _CompiledMapping(NamedTuple):
+    pattern: re.Pattern
+    prefixes: Tuple[str, ...]
+    # Every leading substring of a prefix or literal placeholder, for spotting split placeholders
+    partials: FrozenSet[str]
+    max_len: int
+
+
+class Deanonymizer:
+    """Replaces anonymization placeholders in LLM answers with the original values.
+
+    The placeholder -> original mapping is loaded once and kept in memory until invalidate()
+    is called after ingestion (or refresh_seconds elapse, for replicas that do not ingest
+    themselves). Replacement is a single regex pass over the answer: numbered placeholders
+    match as <prefix><digits> not followed by another digit, so FirstName_1 never clobbers
+    the prefix of FirstName_12, and the cost does not grow with the number of known entities.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Dict[str, str]] = get_entities_for_deanonymization,
+        refresh_seconds: float = 0.0
+    ):
+        self._loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._mapping: Optional[Dict[str, str]] = None
+        self._compiled: Optional[_CompiledMapping] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._mapping = None
+
+    def refresh(self) -> None:
+        start_time = time.perf_counter()
+        mapping = self._loader() or {}
+        compiled = self._compile(mapping)
+        with self._lock:
+            self._mapping, self._compiled = mapping, compiled
+            self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(mapping)} de-anonymization entries in {time.perf_counter() - start_time:.3f} seconds")
+
+    @staticmethod
+    def _compile(mapping: Dict[str, str]) -> Optional[_CompiledMapping]:
+        if not mapping:
+            return None
+
+        prefixes = set()
+        literals = []
+        for placeholder in mapping:
+            match = _NUMBERED_PLACEHOLDER.match(placeholder)
+            if match and match.group(1):
+                prefixes.add(match.group(1))
+            else:
+                literals.append(placeholder)
+
+        alternatives = []
+        if prefixes:
+            alternatives.append(
+                "(?:" + "|".join(re.escape(p) for p in sorted(prefixes, key=len, reverse=True)) + r")\d+(?!\d)"
+            )
+        alternatives.extend(re.escape(literal) for literal in sorted(literals, key=len, reverse=True))
+
+        stems = list(prefixes) + literals
+        return _CompiledMapping(
+            pattern=re.compile("|".join(alternatives)),
+            prefixes=tuple(prefixes),
+            partials=frozenset(stem[:i] for stem in stems for i in range(1, len(stem) + 1)),
+            max_len=max(len(stem) for stem in stems) + _MAX_COUNTER_DIGITS
+        )
+
+    def _current(self):
+        with self._lock:
+            stale = self._mapping is None or (
+                self.refresh_seconds > 0 and time.monotonic() - self._loaded_at > self.refresh_seconds
+            )
+        if stale:
+            self.refresh()
+        with self._lock:
+            return self._mapping, self._compiled
+
+    @property
+    def mapping(self) -> Dict[str, str]:
+        return self._current()[0]
+
+    def deanonymize(self, text: str) -> str:
+        mapping, compiled = self._current()
+        if compiled is None or not text:
+            return text
+        return compiled.pattern.sub(lambda m: mapping.get(m.group(0), m.group(0)), text)
+
+    def stream(self) -> "StreamingDeanonymizer":
+        mapping, compiled = self._current()
+        return StreamingDeanonymizer(mapping, compiled)
+
+
+class StreamingDeanonymizer:
+    """De-anonymizes text that arrives in chunks (LLM token stream).
+
+    A chunk may end in the middle of a placeholder ("First" + "Name_1" + "2"), so the tail of the
+    buffer that could still grow into a placeholder is held back until the next chunk or flush().
+    """
+
+    def __init__(self, mapping: Dict[str, str], compiled: Optional[_CompiledMapping]):
+        self._mapping = mapping
+        self._compiled = compiled
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        if self._compiled is None:
+            return chunk
+        self._buffer += chunk
+        return self._emit(self._safe_cut())
+
+    def flush(self) -> str:
+        if self._compiled is None:
+            return ""
+        return self._emit(len(self._buffer))
+
+    def _is_open(self, tail: str) -> bool:
+        if tail in self._compiled.partials:
+            return True
+        # A complete numbered placeholder at the end may still get more digits
+        return any(
+            tail.startswith(prefix) and tail[len(prefix):].isdigit()
+            for prefix in self._compiled.prefixes
+        )
+
+    def _safe_cut(self) -> int:
+        buffer = self._buffer
+        for i in range(max(0, len(buffer) - self._compiled.max_len), len(buffer)):
+            if self._is_open(buffer[i:]):
+                return i
+        return len(buffer)
+
+    def _emit(self, cut: int) -> str:
+        buffer = self._buffer
+        parts = []
+        last = 0
+        for match in self._compiled.pattern.finditer(buffer):
+            if match.start() >= cut:
+                break
+            if match.end() > cut:
+                # Never split a match; it is emitted once the buffer is complete
+                cut = match.start()
+                break
+            parts.append(buffer[last:match.start()])
+            parts.append(self._mapping.get(match.group(0), match.group(0)))
+            last = match.end()
+        parts.append(buffer[last:cut])
+        self._buffer = buffer[cut:]
+        return "".join(parts)
@@ -1,15 +1,40 @@
-﻿from pathlib import Path
-from typing import List, Dict, Any, Tuple
-import re
+﻿from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import hashlib
+import multiprocessing
+import os
 import time
 
 from langchain.schema import Document
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from src.components.anonymizer import Anonymizer, PlaceholderAllocator
 from src.utils.logger import logger
+from src.utils.tracing import record
 from config.settings import settings
-from database import insert_extracted_entity
+from database import get_entity_placeholders, insert_extracted_entities
+
+
+def _load_pdf(pdf_file: Path) -> Tuple[Path, List[Document], float, Optional[str]]:
+    # Module level so it can be pickled into ProcessPoolExecutor workers
+    start_time = time.perf_counter()
+    try:
+        loader = PyPDFLoader(str(pdf_file))
+        documents = loader.load()
+
+        for doc in documents:
+            doc.metadata.update({
+                "source_file": pdf_file.name,
+                "file_path": str(pdf_file),
+                "total_pages": len(documents)
+            })
+
+        return pdf_file, documents, time.perf_counter() - start_time, None
+    except Exception as e:
+        return pdf_file, [], time.perf_counter() - start_time, str(e)
 
 
 class DocumentsLoader:
@@ -21,172 +46,191 @@ class DocumentsLoader:
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+        self.pending_entities: List[Tuple[str, str, str, str]] = []
 
-    def load_documents(self, data_path: Path) -> List[Document]:
+    def load_documents(self, data_path: Path, workers: Optional[int] = None) -> List[Document]:
         logger.info(f"Loading documents from {data_path}")
 
-        pdf_files = list(data_path.glob("*.pdf"))
+        # Sorted so page order (and later chunk ids) do not depend on filesystem listing order
+        pdf_files = sorted(data_path.glob("*.pdf"))
         if not pdf_files:
             raise FileNotFoundError(f"No PDF files found in {data_path}")
 
         logger.info(f"Found {len(pdf_files)} PDF files in {data_path}")
+        return self.load_files(pdf_files, workers)
 
-        all_documents = []
-        failed_files = []
-
-        for pdf_file in pdf_files:
-            try:
-                start_time = time.time()
-                logger.info(f"Processing {pdf_file.name}")
-
-                loader = PyPDFLoader(str(pdf_file))
-                documents = loader.load()
+    def iter_files(self, pdf_files: List[Path], workers: Optional[int] = None) -> Iterator[Tuple[Path, List[Document]]]:
+        """Yields (pdf_file, pages) per successfully parsed file, in input order.
 
-                for doc in documents:
-                    doc.metadata.update({
-                        "source_file": pdf_file.name,
-                        "file_path": str(pdf_file),
-                        "total_pages": len(documents)
-                    })
+        With several workers at most 2 files per worker are parsed ahead of the consumer, so a slow
+        consumer holds back parsing instead of letting parsed pages pile up in memory.
+        """
+        workers = workers if workers is not None else settings.INGEST_WORKERS
+        workers = max(1, min(workers or os.cpu_count() or 1, len(pdf_files) or 1))
 
-                all_documents.extend(documents)
-                load_time = time.time() - start_time
-                logger.info(f"Processed {pdf_file.name} ({len(documents)} pages) in {load_time:.2} seconds")
+        loaded_pages = 0
+        failed_files = []
+        start_time = time.perf_counter()
+
+        if workers > 1:
+            logger.info(f"Parsing {len(pdf_files)} PDF files with {workers} worker processes")
+            # Spawned, not forked: ingestion calls this from pipeline threads, and forking a threaded
+            # process can copy locks held by other threads into the children
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                pending = deque()
+                remaining = iter(pdf_files)
+                for pdf_file in remaining:
+                    pending.append(executor.submit(_load_pdf, pdf_file))
+                    if len(pending) >= workers * 2:
+                        break
+                while pending:
+                    # Collected in submission order, keeping the output deterministic
+                    pdf_file, documents, load_time, error = pending.popleft().result()
+                    next_file = next(remaining, None)
+                    if next_file is not None:
+                        pending.append(executor.submit(_load_pdf, next_file))
+                    if self._collect(pdf_file, documents, load_time, error, failed_files):
+                        loaded_pages += len(documents)
+                        yield pdf_file, documents
+        else:
+            for pdf_file in pdf_files:
+                logger.info(f"Processing {pdf_file.name}")
+                pdf_file, documents, load_time, error = _load_pdf(pdf_file)
+                if self._collect(pdf_file, documents, load_time, error, failed_files):
+                    loaded_pages += len(documents)
+                    yield pdf_file, documents
 
-            except Exception as e:
-                logger.error(f"Failed to process {pdf_file.name}: {str(e)}")
-                failed_files.append(pdf_file)
+        total_time = time.perf_counter() - start_time
 
         if failed_files:
             logger.warning(f"Failed to process {len(failed_files)} PDF files: {failed_files}")
 
-        logger.info(f"Success: Loaded {len(all_documents)} pages from {len(pdf_files) - len(failed_files)} files ")
+        logger.info(
+            f"Success: Loaded {loaded_pages} pages from {len(pdf_files) - len(failed_files)} files "
+            f"in {total_time:.2f} seconds ({loaded_pages / max(total_time, 1e-9):.1f} pages/sec)"
+        )
+
+    def load_files(self, pdf_files: List[Path], workers: Optional[int] = None) -> List[Document]:
+        all_documents = []
+        for _, documents in self.iter_files(pdf_files, workers):
+            all_documents.extend(documents)
         return all_documents
 
-    def chunk_docs(self, docs: List[Document]) -> List[Document]:
+    @staticmethod
+    def _collect(
+        pdf_file: Path,
+        documents: List[Document],
+        load_time: float,
+        error: Optional[str],
+        failed_files: List[Path]
+    ) -> bool:
+        # Parsing may have run in a worker process; its measured time is added to the current trace
+        record("parse", load_time, failed=error is not None)
+        if error is not None:
+            logger.error(f"Failed to process {pdf_file.name}: {error}")
+            failed_files.append(pdf_file)
+            return False
+
+        logger.info(
+            f"Processed {pdf_file.name} ({len(documents)} pages) in {load_time:.2f} seconds "
+            f"({len(documents) / max(load_time, 1e-9):.1f} pages/sec)"
+        )
+        return True
+
+    def chunk_docs(self, docs: List[Document], start_id: int = 0) -> List[Document]:
         logger.info(f"Chunking {len(docs)} documents")
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         chunks = self.text_splitter.split_documents(docs)
 
-        for i, chunk in enumerate(chunks):
+        # chunk_id doubles as doc_index/FAISS id; incremental syncs continue after the highest stored id
+        for i, chunk in enumerate(chunks, start_id):
             chunk.metadata.update({
                 "chunk_id": i,
                 "chunk_size": len(chunk.page_content)
             })
 
-        chunk_time = time.time() - start_time
-        logger.info(f"Created {len(chunks)} chunks in {chunk_time:.2} seconds")
+        chunk_time = time.perf_counter() - start_time
+        logger.info(f"Created {len(chunks)} chunks in {chunk_time:.2f} seconds")
 
-        avg_chunk_size = sum(len(chunk.page_content) for chunk in chunks) / len(chunks)
-        logger.info(f"Average chunk size is {avg_chunk_size:.2} charakters")
+        if chunks:
+            avg_chunk_size = sum(len(chunk.page_content) for chunk in chunks) / len(chunks)
+            logger.info(f"Average chunk size is {avg_chunk_size:.1f} charakters")
 
         return chunks
 
+    @staticmethod
+    def file_hash(pdf_file: Path) -> str:
+        digest = hashlib.sha256()
+        with open(pdf_file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def scan_sources(
+        self,
+        pdf_files: List[Path],
+        known: Dict[str, Tuple[str, float]] = None
+    ) -> Dict[str, Tuple[str, float]]:
+        # Only re-hash files whose mtime differs from the stored manifest entry
+        known = known or {}
+        manifest = {}
+        for pdf_file in pdf_files:
+            mtime = pdf_file.stat().st_mtime
+            entry = known.get(pdf_file.name)
+            if entry is not None and entry[1] == mtime:
+                manifest[pdf_file.name] = entry
+            else:
+                manifest[pdf_file.name] = (self.file_hash(pdf_file), mtime)
+        return manifest
+
     def load_and_chunk(self, data_path: Path) -> List[Document]:
         documents = self.load_documents(data_path)
         documents = self._anonymize_documents(documents)
         chunks = self.chunk_docs(documents)
         return chunks
 
-    def _anonymize_documents(self, docs: List[Document]) -> List[Document]:
+    def _anonymize_documents(
+        self,
+        docs: List[Document],
+        flush: bool = True,
+        allocator: Optional[PlaceholderAllocator] = None
+    ) -> List[Document]:
         logger.info(f"Anonymizing {len(docs)} documents before embedding")
-
-        # Counters per entity type to create stable placeholders
-        name_counter = 1
-        date_counter = 1
-        place_counter = 1
-
-        # Precompile regexes
-        # Names like "Barack O." or "Mahatma G." (Firstname capitalized + space + capital initial + dot)
-        name_initial_pattern = re.compile(r"\b([A-ZÄÖÜ][\wäöüß-]+)\s([A-ZÄÖÜ])\.(?!\w)")
-        # Labeled name field: "Name: First Last" or "Name: First L."
-        name_label_pattern = re.compile(r"\b(?:Name)\s*:\s*([A-ZÄÖÜ][\wäöüß-]+)\s+([A-ZÄÖÜ][\wäöüß-]+|[A-ZÄÖÜ])\.?\b")
-        # Header form: "First X., <something>" (lookahead for comma)
-        name_header_initial_pattern = re.compile(r"\b([A-ZÄÖÜ][\wäöüß-]+)\s([A-ZÄÖÜ])\.(?=\s*,)")
-        # German/EN birth date variants
-        date_pattern = re.compile(r"\b(?:Geburtsdatum[:]?\s*|Birth\s*date[:]?\s*)?((?:[0-3]?\d[\.\-/][01]?\d[\.\-/](?:19|20)\d\d)|(?:(?:19|20)\d\d-[01]?\d-[0-3]?\d))\b")
-        # Birth place: words after Geburtsort/Birth place
-        place_pattern = re.compile(r"\b(?:Geburtsort|Birth\s*place)[:]?\s*([A-ZÄÖÜ][\wäöüßÄÖÜ-]+(?:\s+[A-ZÄÖÜ][\wäöüßÄÖÜ-]+)*)")
-
-        # Mapping cache so repeated occurrences use same placeholder
-        value_to_placeholder: Dict[str, str] = {}
-
-        for doc in docs:
-            original_text = doc.page_content
-            text = original_text
-
-            # Names (Firstname + Initial.)
-            def replace_name_initial(m: re.Match) -> str:
-                nonlocal name_counter
-                full = f"{m.group(1)} {m.group(2)}."
-                if full not in value_to_placeholder:
-                    placeholder = f"FirstName_{name_counter}"
-                    value_to_placeholder[full] = placeholder
-                    insert_extracted_entity('name', full, placeholder, 'regex_name')
-                    name_counter += 1
-                return value_to_placeholder[full]
-
-            text = name_initial_pattern.sub(replace_name_initial, text)
-
-            # Labeled names (Name: First Last or First L.)
-            def replace_name_label(m: re.Match) -> str:
-                nonlocal name_counter
-                captured = f"{m.group(1)} {m.group(2)}"
-                # Normalize trailing dot in second group
-                if captured.endswith("."):
-                    captured = captured[:-1]
-                if captured not in value_to_placeholder:
-                    placeholder = f"FirstName_{name_counter}"
-                    value_to_placeholder[captured] = placeholder
-                    insert_extracted_entity('name', captured, placeholder, 'regex_name_label')
-                    name_counter += 1
-                return f"Name: {value_to_placeholder[captured]}"
-
-            text = name_label_pattern.sub(replace_name_label, text)
-
-            # Header initial form before a comma (Firstname X., ...)
-            def replace_name_header_initial(m: re.Match) -> str:
-                nonlocal name_counter
-                full = f"{m.group(1)} {m.group(2)}."
-                if full not in value_to_placeholder:
-                    placeholder = f"FirstName_{name_counter}"
-                    value_to_placeholder[full] = placeholder
-                    insert_extracted_entity('name', full, placeholder, 'regex_name_header')
-                    name_counter += 1
-                return value_to_placeholder[full]
-
-            text = name_header_initial_pattern.sub(replace_name_header_initial, text)
-
-            # Birth dates
-            def replace_date(m: re.Match) -> str:
-                nonlocal date_counter
-                date_val = m.group(1)
-                if date_val not in value_to_placeholder:
-                    placeholder = f"BIRTHDATE_{date_counter}"
-                    value_to_placeholder[date_val] = placeholder
-                    insert_extracted_entity('birthdate', date_val, placeholder, 'regex_date')
-                    date_counter += 1
-                return text[m.start():m.start()] + value_to_placeholder[date_val]
-
-            text = date_pattern.sub(lambda m: value_to_placeholder.get(m.group(1)) or (replace_date(m)), text)
-
-            # Birth places
-            def replace_place(m: re.Match) -> str:
-                nonlocal place_counter
-                place_val = m.group(1).strip()
-                if place_val not in value_to_placeholder:
-                    placeholder = f"BIRTHPLACE_{place_counter}"
-                    value_to_placeholder[place_val] = placeholder
-                    insert_extracted_entity('birthplace', place_val, placeholder, 'regex_place')
-                    place_counter += 1
-                prefix = m.group(0)[: m.group(0).find(place_val)]
-                return f"{prefix}{value_to_placeholder[place_val]}"
-
-            text = place_pattern.sub(replace_place, text)
-
-            if text != original_text:
-                doc.page_content = text
-
-        logger.info("Completed anonymization")
-        return docs
\ No newline at end of file
+        start_time = time.perf_counter()
+
+        # New entities are buffered in pending_entities and written in one transaction. Callers anonymizing
+        # file by file pass one allocator instead, so the stored entities are queried only once
+        if allocator is None:
+            known = get_entity_placeholders()
+            known.update({original: placeholder for _, original, placeholder, _ in self.pending_entities})
+            allocator = PlaceholderAllocator(known, self.pending_entities)
+        anonymizer = Anonymizer(allocator)
+
+        workers = self.anonymize_workers()
+        if workers > 1 and len(docs) >= settings.ANONYMIZE_PARALLEL_MIN_PAGES:
+            anonymizer.anonymize_parallel(docs, workers)
+        else:
+            anonymizer.anonymize(docs)
+
+        anonymize_time = time.perf_counter() - start_time
+        logger.info(
+            f"Completed anonymization in {anonymize_time:.2f} seconds "
+            f"({len(docs) / max(anonymize_time, 1e-9):.1f} pages/sec)"
+        )
+        if flush:
+            self.flush_entities()
+        return docs
+
+    @staticmethod
+    def anonymize_workers() -> int:
+        return settings.ANONYMIZE_WORKERS or os.cpu_count() or 1
+
+    def flush_entities(self) -> int:
+        if not self.pending_entities:
+            return 0
+
+        count = insert_extracted_entities(self.pending_entities)
+        logger.info(f"Stored {count} new extracted entities")
+        self.pending_entities = []
+        return count
\ No newline at end of file
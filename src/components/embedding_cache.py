@@ -0,0 +1,191 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+from psycopg2 import Binary
+
+from src.components.search_backends import EMBEDDING_DTYPE
+from src.utils.logger import logger
+from database import get_db_connection
+
+
+def normalize_query(text: str) -> str:
+    # Whitespace only: the embedding model is case-sensitive, so "SAP" and "sap" get different vectors
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache for query embeddings, keyed by (model name, normalized query).
+
+    With persist=True misses fall through to the Postgres table query_embedding_cache, and new
+    entries are written there, so warm entries survive restarts and are shared between replicas.
+    The table keeps the max_rows most recently used entries (0: unbounded); it is pruned on
+    warm-up and after every prune_every writes.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = 1024,
+        persist: bool = False,
+        max_rows: int = 100000,
+        prune_every: int = 1000
+    ):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.persist = persist
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._writes_since_prune = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        vector = self._load(key) if self.persist else None
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.persistent_hits += 1
+        self._remember(key, vector)
+        return vector
+
+    def put(self, query: str, vector: np.ndarray) -> None:
+        if not self.enabled:
+            return
+
+        key = normalize_query(query)
+        vector = np.asarray(vector, dtype=np.float32)
+        self._remember(key, vector)
+        if self.persist:
+            self._store(key, vector)
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _ensure_table(self, cur) -> None:
+        if self._table_ready:
+            return
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS query_embedding_cache (
+                model TEXT NOT NULL,
+                query TEXT NOT NULL,
+                embedding BYTEA NOT NULL,
+                last_used TIMESTAMP NOT NULL DEFAULT now(),
+                PRIMARY KEY (model, query)
+            );
+        """)
+        self._table_ready = True
+
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute(
+                        "UPDATE query_embedding_cache SET last_used = now() WHERE model = %s AND query = %s RETURNING embedding;",
+                        (self.model_name, key)
+                    )
+                    row = cur.fetchone()
+        except Exception as e:
+            logger.warning(f"Query embedding cache lookup failed: {e}")
+            return None
+        return np.frombuffer(row[0], dtype=EMBEDDING_DTYPE).astype(np.float32) if row else None
+
+    def _store(self, key: str, vector: np.ndarray) -> None:
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute(
+                        """
+                        INSERT INTO query_embedding_cache (model, query, embedding) VALUES (%s, %s, %s)
+                        ON CONFLICT (model, query) DO UPDATE SET last_used = now();
+                        """,
+                        (self.model_name, key, Binary(vector.astype(EMBEDDING_DTYPE).tobytes()))
+                    )
+                    with self._lock:
+                        self._writes_since_prune += 1
+                        prune = self._writes_since_prune >= self.prune_every
+                        if prune:
+                            self._writes_since_prune = 0
+                    if prune:
+                        self._prune(cur)
+        except Exception as e:
+            logger.warning(f"Query embedding cache write failed: {e}")
+
+    def _prune(self, cur) -> int:
+        # Bounds the whole table, so entries of models no longer in use age out as well
+        if self.max_rows <= 0:
+            return 0
+        cur.execute(
+            """
+            DELETE FROM query_embedding_cache WHERE (model, query) IN (
+                SELECT model, query FROM query_embedding_cache ORDER BY last_used DESC OFFSET %s
+            );
+            """,
+            (self.max_rows,)
+        )
+        if cur.rowcount > 0:
+            logger.info(f"Pruned {cur.rowcount} query embedding cache rows beyond the {self.max_rows} most recently used")
+        return max(cur.rowcount, 0)
+
+    def warm(self) -> int:
+        # Preload the most recently used persisted entries into memory
+        if not (self.enabled and self.persist):
+            return 0
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    self._prune(cur)
+                    cur.execute(
+                        "SELECT query, embedding FROM query_embedding_cache WHERE model = %s ORDER BY last_used DESC LIMIT %s;",
+                        (self.model_name, self.max_size)
+                    )
+                    rows = cur.fetchall()
+        except Exception as e:
+            logger.warning(f"Query embedding cache warm-up failed: {e}")
+            return 0
+        for key, blob in reversed(rows):
+            self._remember(key, np.frombuffer(blob, dtype=EMBEDDING_DTYPE).astype(np.float32))
+        logger.info(f"Warmed query embedding cache with {len(rows)} entries")
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+                "persist": self.persist
+            }
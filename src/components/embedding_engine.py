@@ -0,0 +1,151 @@
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.utils.logger import logger
+
+# Rough activation memory per token in flight: hidden size * 4 bytes * ~32 live tensors (attention, FFN, copies)
+_BYTES_PER_TOKEN_PER_DIM = 4 * 32
+# Share of currently free memory a batch may occupy
+_MEMORY_SHARE = 0.25
+
+
+def _available_memory() -> int:
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+class EmbeddingEngine:
+    """Bulk document encoder for ingestion.
+
+    Texts are sorted by length so every batch holds similarly long texts (little padding), and
+    each batch gets as many texts as fit into a token budget: short chunks go in large batches,
+    long ones in small batches. The budget is capped by free memory. With workers > 1 the
+    encoding is spread over a sentence-transformers multi-process pool; it is started per encode()
+    call, or once for all calls inside `with engine:` (e.g. every batch of a streaming rebuild).
+    """
+
+    def __init__(self, embeddings, workers: int = 1, batch_tokens: int = 8192, max_batch_size: int = 128):
+        self.embeddings = embeddings
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.last_stats: Dict[str, float] = {}
+        self._pool = None
+        self._keep_pool = False
+
+    def __enter__(self) -> "EmbeddingEngine":
+        self._keep_pool = True
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._keep_pool = False
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            self._model.stop_multi_process_pool(pool)
+            logger.info(f"Stopped embedding pool with {self.workers} workers")
+
+    def _start_pool(self, model):
+        if self._pool is None:
+            start_time = time.perf_counter()
+            self._pool = model.start_multi_process_pool(["cpu"] * self.workers)
+            logger.info(f"Started embedding pool with {self.workers} workers in {time.perf_counter() - start_time:.2f} seconds")
+        return self._pool
+
+    @property
+    def _model(self):
+        # HuggingFaceEmbeddings keeps the SentenceTransformer in _client (client in older versions)
+        return getattr(self.embeddings, "_client", None) or getattr(self.embeddings, "client", None)
+
+    def _max_seq_length(self) -> int:
+        return int(getattr(self._model, "max_seq_length", None) or 512)
+
+    def _token_budget(self) -> int:
+        budget = self.batch_tokens
+        dim_getter = getattr(self._model, "get_sentence_embedding_dimension", None)
+        dim = (dim_getter() if dim_getter else None) or 768
+        available = _available_memory()
+        if available:
+            fits = int(available * _MEMORY_SHARE / self.workers / (dim * _BYTES_PER_TOKEN_PER_DIM))
+            budget = max(self._max_seq_length(), min(budget, fits))
+        return budget
+
+    def _estimate_tokens(self, text: str) -> int:
+        # ~4 characters per word piece for German/English prose, plus [CLS]/[SEP]; truncated at max_seq_length
+        return min(len(text) // 4 + 2, self._max_seq_length())
+
+    def plan_batches(self, texts: List[str]) -> List[Tuple[List[int], int]]:
+        """Groups text positions (longest first) into runs that share one batch size."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        budget = self._token_budget()
+
+        groups: List[Tuple[List[int], int]] = []
+        for i in order:
+            batch_size = max(1, min(self.max_batch_size, budget // max(1, self._estimate_tokens(texts[i]))))
+            # Round down to a power of two so neighbouring lengths share a group (fewer encode calls)
+            batch_size = 1 << (batch_size.bit_length() - 1)
+            if groups and groups[-1][1] == batch_size:
+                groups[-1][0].append(i)
+            else:
+                groups.append(([i], batch_size))
+        return groups
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        start_time = time.perf_counter()
+        model = self._model
+        if model is None or not hasattr(model, "encode"):
+            # Not a sentence-transformers backed embeddings object; use its own batching
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            self._report(len(texts), start_time, 0)
+            return vectors
+
+        groups = self.plan_batches(texts)
+        vectors = None
+        pool = self._start_pool(model) if self.workers > 1 else None
+        try:
+            for positions, batch_size in groups:
+                group_texts = [texts[i] for i in positions]
+                if pool is not None:
+                    encoded = model.encode_multi_process(
+                        group_texts, pool, batch_size=batch_size, normalize_embeddings=True
+                    )
+                else:
+                    encoded = model.encode(
+                        group_texts, batch_size=batch_size, normalize_embeddings=True,
+                        convert_to_numpy=True, show_progress_bar=False
+                    )
+                encoded = np.asarray(encoded, dtype=np.float32)
+                if vectors is None:
+                    vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+                vectors[positions] = encoded
+                logger.info(f"Encoded {len(positions)} texts with batch size {batch_size}")
+        finally:
+            if pool is not None and not self._keep_pool:
+                self.close()
+
+        self._report(len(texts), start_time, len(groups))
+        return vectors
+
+    def _report(self, count: int, start_time: float, groups: int) -> None:
+        seconds = time.perf_counter() - start_time
+        self.last_stats = {
+            "chunks": count,
+            "seconds": round(seconds, 3),
+            "chunks_per_sec": round(count / seconds, 1) if seconds > 0 else 0.0,
+            "workers": self.workers,
+            "batch_groups": groups
+        }
+        logger.info(
+            f"Embedded {count} chunks in {seconds:.2f} seconds "
+            f"({self.last_stats['chunks_per_sec']} chunks/sec, {self.workers} workers)"
+        )
@@ -0,0 +1,161 @@
+import json
+import mmap
+import shutil
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+from src.utils.logger import logger
+
+# Bump when the file layout changes; older snapshots are ignored and rebuilt from Postgres
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "faiss.index"
+IDS_FILE = "ids.npy"
+TEXTS_FILE = "texts.bin"
+TEXT_OFFSETS_FILE = "texts.idx.npy"
+METADATA_FILE = "metadata.bin"
+METADATA_OFFSETS_FILE = "metadata.idx.npy"
+# Optional: full-precision (float32/float16) vectors in document order, for exact re-scoring
+VECTORS_FILE = "vectors.npy"
+
+
+def _map_file(path: Path):
+    # mmap cannot map empty files
+    if path.stat().st_size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MappedDocuments(Sequence):
+    """Read-only document list backed by memory-mapped snapshot files.
+
+    Chunk texts and metadata are stored as concatenated UTF-8 / JSON blobs with int64 offset
+    arrays, so a Document is only decoded when it is accessed and all worker processes share
+    the same page cache.
+    """
+
+    def __init__(self, directory: Path):
+        self._texts = _map_file(directory / TEXTS_FILE)
+        self._text_offsets = np.load(directory / TEXT_OFFSETS_FILE, mmap_mode="r")
+        self._metadata = _map_file(directory / METADATA_FILE)
+        self._metadata_offsets = np.load(directory / METADATA_OFFSETS_FILE, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._text_offsets) - 1
+
+    def text(self, pos: int) -> str:
+        return self._texts[int(self._text_offsets[pos]):int(self._text_offsets[pos + 1])].decode("utf-8")
+
+    def metadata(self, pos: int) -> Dict[str, Any]:
+        return json.loads(self._metadata[int(self._metadata_offsets[pos]):int(self._metadata_offsets[pos + 1])])
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("document index out of range")
+        return Document(page_content=self.text(pos), metadata=self.metadata(pos))
+
+
+def _write_blobs(path: Path, offsets_path: Path, blobs: Iterable[bytes]) -> None:
+    offsets = [0]
+    with open(path, "wb") as f:
+        for blob in blobs:
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+    np.save(offsets_path, np.asarray(offsets, dtype=np.int64))
+
+
+def write_snapshot(
+    directory: Path,
+    index,
+    documents: Sequence,
+    doc_ids: List[int],
+    info: Dict[str, Any],
+    vectors: Optional[np.ndarray] = None
+) -> None:
+    start_time = time.perf_counter()
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    if index is not None:
+        faiss.write_index(index, str(tmp_dir / INDEX_FILE))
+    np.save(tmp_dir / IDS_FILE, np.asarray(doc_ids, dtype=np.int64))
+    if vectors is not None:
+        np.save(tmp_dir / VECTORS_FILE, vectors)
+    _write_blobs(
+        tmp_dir / TEXTS_FILE, tmp_dir / TEXT_OFFSETS_FILE,
+        (doc.page_content.encode("utf-8") for doc in documents)
+    )
+    _write_blobs(
+        tmp_dir / METADATA_FILE, tmp_dir / METADATA_OFFSETS_FILE,
+        (json.dumps(doc.metadata, ensure_ascii=False, default=str).encode("utf-8") for doc in documents)
+    )
+
+    manifest = dict(info, format_version=FORMAT_VERSION, count=len(doc_ids), created_at=time.time())
+    (tmp_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    # Swap directories so readers never see a half-written snapshot
+    old_dir = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old_dir)
+    tmp_dir.rename(directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    logger.info(f"Wrote index snapshot with {len(doc_ids)} chunks to {directory} in {time.perf_counter() - start_time:.2f} seconds")
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads((directory / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != FORMAT_VERSION:
+        logger.info(f"Ignoring index snapshot with format version {manifest.get('format_version')}")
+        return None
+    return manifest
+
+
+def read_index(directory: Path, use_mmap: bool = True) -> Tuple[Optional[Any], bool]:
+    path = directory / INDEX_FILE
+    if not path.exists():
+        return None, False
+    if use_mmap:
+        try:
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            return faiss.read_index(str(path), flags), True
+        except RuntimeError as e:
+            logger.info(f"Index type cannot be memory-mapped ({e}); reading it into memory")
+    return faiss.read_index(str(path)), False
+
+
+def read_vectors(directory: Path) -> Optional[np.ndarray]:
+    # Memory-mapped: only the rows of re-scored candidates are paged in
+    path = directory / VECTORS_FILE
+    return np.load(path, mmap_mode="r") if path.exists() else None
+
+
+def read_snapshot(directory: Path, use_mmap: bool = True):
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+
+    index, mapped = read_index(directory, use_mmap)
+    doc_ids = np.load(directory / IDS_FILE, mmap_mode="r")
+    documents = MappedDocuments(directory)
+    if len(documents) != len(doc_ids) or len(doc_ids) != manifest["count"]:
+        logger.warning(f"Index snapshot in {directory} is inconsistent, ignoring it")
+        return None
+    return manifest, index, mapped, documents, doc_ids
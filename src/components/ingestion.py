@@ -0,0 +1,201 @@
+import contextvars
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from src.components.anonymizer import PlaceholderAllocator
+from src.components.documents_loader import DocumentsLoader
+from src.components.embedding_engine import EmbeddingEngine
+from src.components.vector_store import VectorStore
+from src.utils.logger import logger
+from src.utils.tracing import span
+from config.settings import settings
+from database import get_entity_placeholders, insert_extracted_entities
+
+_DONE = object()
+
+
+class _Failure(NamedTuple):
+    error: BaseException
+
+
+class _Stage:
+    """Runs an upstream iterator in its own thread and hands items over through a bounded queue.
+
+    A full queue blocks the producer (backpressure), so every stage holds at most maxsize items
+    ahead of its consumer. Errors are re-raised on the consuming side; when the consumer stops,
+    the producer thread stops too.
+    """
+
+    def __init__(self, name: str, items: Iterable, maxsize: int):
+        self._items = items
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+        self._stop = threading.Event()
+        # Runs in a copy of the creating context, so spans opened by the stage nest under the ingest run
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run,), name=f"ingest-{name}", daemon=True
+        )
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        try:
+            for item in self._items:
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self._put(_Failure(e))
+            return
+        self._put(_DONE)
+
+    def __iter__(self) -> Iterator:
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self._stop.set()
+
+
+class IngestBatch(NamedTuple):
+    chunks: List[Document]
+    # source_files entries of the files this batch completes
+    manifest: Dict[str, Tuple[str, float]]
+    # extracted_entities rows first seen in this batch
+    entities: List[Tuple[str, str, str, str]]
+
+
+class StreamingIngestor:
+    """Rebuilds the index with bounded memory: parse -> anonymize + chunk -> embed -> persist.
+
+    Files are processed in sorted order and batches always end on a file boundary, so chunk_ids
+    are assigned exactly as in a one-shot rebuild and an interrupted run can resume after the
+    last persisted file (see VectorStore.begin_ingest).
+    """
+
+    def __init__(self, documents_loader: DocumentsLoader, vector_store: VectorStore):
+        self.documents_loader = documents_loader
+        self.vector_store = vector_store
+        self.batch_chunks = settings.INGEST_BATCH_CHUNKS
+        self.queue_size = settings.INGEST_QUEUE_SIZE
+
+    @staticmethod
+    def _page_groups(
+        parsed: Iterable[Tuple[Path, List[Document]]],
+        min_pages: int
+    ) -> Iterator[List[Tuple[Path, List[Document]]]]:
+        # Consecutive files with at least min_pages pages together (the last group may have fewer)
+        group: List[Tuple[Path, List[Document]]] = []
+        pages_in_group = 0
+        for pdf_file, pages in parsed:
+            group.append((pdf_file, pages))
+            pages_in_group += len(pages)
+            if pages_in_group >= min_pages:
+                yield group
+                group, pages_in_group = [], 0
+        if group:
+            yield group
+
+    def _batches(
+        self,
+        parsed: Iterable[Tuple[Path, List[Document]]],
+        manifest: Dict[str, Tuple[str, float]],
+        next_id: int
+    ) -> Iterator[IngestBatch]:
+        loader = self.documents_loader
+        # Stored entities are loaded once; the allocator keeps extending them while anonymizing group by group
+        allocator = PlaceholderAllocator(get_entity_placeholders())
+        # Worker processes only pay off from ANONYMIZE_PARALLEL_MIN_PAGES pages on, more than most single
+        # files have; pages of several files are anonymized together then, one file at a time otherwise
+        min_pages = settings.ANONYMIZE_PARALLEL_MIN_PAGES if loader.anonymize_workers() > 1 else 1
+        chunks: List[Document] = []
+        completed: Dict[str, Tuple[str, float]] = {}
+
+        for group in self._page_groups(parsed, min_pages):
+            with span("anonymize", files=len(group)):
+                # In place; entities of the whole group go out with the next batch, i.e. never after their chunks
+                loader._anonymize_documents([page for _, pages in group for page in pages], flush=False, allocator=allocator)
+
+            for pdf_file, pages in group:
+                with span("chunk"):
+                    file_chunks = loader.chunk_docs(pages, start_id=next_id)
+                next_id += len(file_chunks)
+                chunks.extend(file_chunks)
+                completed[pdf_file.name] = manifest[pdf_file.name]
+
+                if len(chunks) >= self.batch_chunks:
+                    entities, allocator.pending = allocator.pending, []
+                    yield IngestBatch(chunks, completed, entities)
+                    chunks, completed = [], {}
+
+        if completed:
+            entities, allocator.pending = allocator.pending, []
+            yield IngestBatch(chunks, completed, entities)
+
+    def _embedded(
+        self,
+        batches: Iterable[IngestBatch],
+        engine: EmbeddingEngine
+    ) -> Iterator[Tuple[IngestBatch, np.ndarray]]:
+        for batch in batches:
+            texts = [chunk.page_content for chunk in batch.chunks]
+            yield batch, self.vector_store.generate_embeddings(texts, engine) if texts else None
+
+    def run(self, pdf_files: List[Path], resume: bool = True) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        with span("ingest", files=len(pdf_files)) as ingest_span:
+            manifest = self.documents_loader.scan_sources(pdf_files)
+            done, next_id = self.vector_store.begin_ingest(manifest, resume=resume)
+            todo = [pdf_file for pdf_file in pdf_files if pdf_file.name not in done]
+            logger.info(f"Ingesting {len(todo)} of {len(pdf_files)} PDF files in batches of ~{self.batch_chunks} chunks")
+
+            stats = {"files": len(done), "chunks": 0, "batches": 0, "resumed_files": len(done)}
+            # One engine for the whole run: with EMBED_WORKERS > 1 its process pool is started once, not per batch
+            with self.vector_store.embedding_engine() as engine:
+                parsed = _Stage("parse", self.documents_loader.iter_files(todo), self.queue_size)
+                batches = _Stage("chunk", self._batches(parsed, manifest, next_id), self.queue_size)
+                embedded = _Stage("embed", self._embedded(batches, engine), self.queue_size)
+
+                for batch, embeddings in embedded:
+                    with span("persist"):
+                        # Entities first: if the batch write fails, a resumed run re-derives the same placeholders from them
+                        insert_extracted_entities(batch.entities)
+                        self.vector_store.persist_batch(batch.chunks, embeddings, batch.manifest)
+                    stats["files"] += len(batch.manifest)
+                    stats["chunks"] += len(batch.chunks)
+                    stats["batches"] += 1
+                    elapsed = time.perf_counter() - start_time
+                    logger.info(
+                        f"Persisted batch {stats['batches']}: {stats['files']}/{len(pdf_files)} files, "
+                        f"{stats['chunks']} chunks ({stats['chunks'] / max(elapsed, 1e-9):.1f} chunks/sec)"
+                    )
+
+            with span("finish_ingest"):
+                self.vector_store.finish_ingest()
+
+        stats["seconds"] = round(time.perf_counter() - start_time, 2)
+        # Summed per stage; parse/anonymize/embed overlap with persist, so they can add up to more than seconds
+        stats["breakdown"] = ingest_span.summary()
+        logger.info(
+            f"Ingestion finished in {stats['seconds']} seconds: {stats['files']} files, "
+            f"{stats['chunks']} new chunks, index size {self.vector_store.index_size}"
+        )
+        logger.info(f"Ingestion breakdown: {stats['breakdown']}")
+        return stats
@@ -0,0 +1,106 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+NGRAM_SIZE = 3
+
+
+def extract_keywords(text: str) -> List[str]:
+    prime_art_ids = re.findall(r'\b\d{10,}\b', text) #lange nummern
+
+    numbers = re.findall(r'\b\d{6,}\b', text)
+
+    alphanums = re.findall(r'\b[A-Za-z]\w*\d+\w*\b|\b\d+\w*[A-Za-z]\w*\b', text)
+
+    return list(set(prime_art_ids + numbers + alphanums))
+
+
+def _ngrams(token: str) -> Set[str]:
+    return {token[i:i + NGRAM_SIZE] for i in range(len(token) - NGRAM_SIZE + 1)}
+
+
+class KeywordIndex:
+    """Inverted index over lower-cased word tokens of the indexed chunks.
+
+    Keywords from extract_keywords consist of word characters only, so a keyword occurs in a
+    chunk exactly when it is a substring of one of its tokens. A trigram index over the
+    vocabulary resolves such substring lookups (e.g. a 6-digit prefix of a 10-digit ID)
+    without touching the chunk texts at query time.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.ngrams: Dict[str, Set[str]] = defaultdict(set)
+        self.doc_lengths: List[int] = []
+        self.avg_doc_length = 0.0
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "KeywordIndex":
+        index = cls(k1=k1, b=b)
+        for text in texts:
+            index.add(text)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, text: str) -> int:
+        doc_id = len(self.doc_lengths)
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        for token, tf in Counter(tokens).items():
+            if token not in self.postings:
+                for gram in _ngrams(token):
+                    self.ngrams[gram].add(token)
+            self.postings[token][doc_id] = tf
+
+        self.doc_lengths.append(len(tokens))
+        self.avg_doc_length += (len(tokens) - self.avg_doc_length) / len(self.doc_lengths)
+        return doc_id
+
+    def _matching_tokens(self, keyword: str) -> Set[str]:
+        if len(keyword) < NGRAM_SIZE:
+            return {token for token in self.postings if keyword in token}
+
+        candidates = None
+        for gram in _ngrams(keyword):
+            tokens = self.ngrams.get(gram)
+            if not tokens:
+                return set()
+            candidates = set(tokens) if candidates is None else candidates & tokens
+            if not candidates:
+                return set()
+
+        return {token for token in candidates if keyword in token}
+
+    def _term_frequencies(self, keyword: str) -> Dict[int, int]:
+        frequencies: Dict[int, int] = defaultdict(int)
+        for token in self._matching_tokens(keyword):
+            for doc_id, tf in self.postings[token].items():
+                frequencies[doc_id] += tf
+        return frequencies
+
+    def search(self, keywords: Iterable[str], k: int, scoring: str = "count") -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = defaultdict(float)
+        n_docs = len(self.doc_lengths)
+
+        for keyword in {kw.lower() for kw in keywords}:
+            frequencies = self._term_frequencies(keyword)
+            if not frequencies:
+                continue
+
+            if scoring == "bm25":
+                idf = math.log(1.0 + (n_docs - len(frequencies) + 0.5) / (len(frequencies) + 0.5))
+                for doc_id, tf in frequencies.items():
+                    norm = 1.0 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_doc_length or 1.0)
+                    scores[doc_id] += idf * tf * (self.k1 + 1.0) / (tf + self.k1 * norm)
+            else:
+                # Number of distinct query keywords found in the chunk
+                for doc_id in frequencies:
+                    scores[doc_id] += 1.0
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k]
@@ -1,23 +1,65 @@
-﻿from typing import List, Dict, Any
+﻿from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional
+import asyncio
+import contextvars
+import functools
+import threading
 import time
 
+from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnableConfig, RunnablePassthrough, RunnableLambda
 from langchain_openai import ChatOpenAI
 from langchain.schema import Document
 
+from src.components.answer_cache import AnswerCache
+from src.components.deanonymizer import Deanonymizer
+from src.components.retrieval import RetrievalResult
 from src.components.vector_store import VectorStore
 from src.utils.logger import logger
+from src.utils.tracing import Span, activate, record, span, trace
 from config.settings import settings
-from database import get_entities_for_deanonymization
+
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_retrieval_executor_lock = threading.Lock()
+
+
+async def _run_blocking(func, *args):
+    # Shared worker pool for blocking work (retrieval, DB) from async entry points
+    global _retrieval_executor
+    if _retrieval_executor is None:
+        with _retrieval_executor_lock:
+            if _retrieval_executor is None:
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=settings.RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+                )
+    # Run inside a copy of the caller's context, so spans opened in the worker attach to the caller's span
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _retrieval_executor, functools.partial(context.run, func, *args)
+    )
 
 
 class RAGChain:
 
-    def __init__(self, vector_store: VectorStore):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        answer_cache: Optional[AnswerCache] = None,
+        deanonymizer: Optional[Deanonymizer] = None,
+        llm: Optional[BaseChatModel] = None
+    ):
         self.vector_store = vector_store
-        self.llm = ChatOpenAI(
+        self.deanonymizer = deanonymizer if deanonymizer is not None else Deanonymizer(
+            refresh_seconds=settings.DEANONYMIZATION_REFRESH_SECONDS
+        )
+        self.answer_cache = answer_cache if answer_cache is not None else AnswerCache(
+            max_size=settings.ANSWER_CACHE_SIZE,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            semantic_threshold=settings.ANSWER_CACHE_SEMANTIC_THRESHOLD
+        )
+        self.llm = llm if llm is not None else ChatOpenAI(
             openai_api_key=settings.OPENAI_API_KEY,
             model_name=settings.CHAT_MODEL,
             temperature=0.1
@@ -62,100 +104,427 @@ class RAGChain:
         #     ("human", "Job Inquiry: {question}")
         # ])
 
-        self.chain = (
-            {
-                "context": RunnableLambda(self._retrieve_and_format_docs),
-                "question": RunnablePassthrough()
-            }
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
+        self.answer_chain = self.prompt | self.llm | StrOutputParser()
+
+        # {"question", "retrieval"} -> adds context and answer; batch_ask feeds it pre-retrieved inputs
+        self.generation_chain = (
+            RunnablePassthrough.assign(context=RunnableLambda(self._format_context, afunc=self._aformat_context))
+            | RunnablePassthrough.assign(answer=RunnableLambda(self._generate, afunc=self._agenerate))
         )
+        # Retrieval runs exactly once per question; its result travels with the chain output
+        self.chain = RunnableLambda(self._retrieve, afunc=self._aretrieve) | self.generation_chain
 
         logger.info("RAG Chain started.")
 
-    def _retrieve_and_format_docs(self, question:str) -> str:
+    def _retrieve(self, question: str) -> Dict[str, Any]:
         logger.info(f"Retrieving docs for question: {question[:100]}")
 
-        start_time = time.time()
+        retrieval = self.vector_store.retrieve(question, k=settings.TOP_K_RESULTS)
+        logger.info(f"Retrieved {len(retrieval)} docs in {retrieval.timings['total']:.3f} seconds.")
 
-        results = self.vector_store.search(question, k=settings.TOP_K_RESULTS)
+        return {"question": question, "retrieval": retrieval}
 
-        if not results:
-            logger.warning("No relevant docs found")
-            return "Not relevant docs found"
+    async def _aretrieve(self, question: str) -> Dict[str, Any]:
+        # Embedding + FAISS are CPU-bound; keep them off the event loop
+        return await _run_blocking(self._retrieve, question)
 
-        context_parts = []
-        for i, (document, score) in enumerate(results, 1):
-            source = document.metadata.get("source_file", "Unknown")
-            page = document.metadata.get("page", "Unknown")
+    async def _aformat_context(self, inputs: Dict[str, Any]) -> str:
+        return self._format_context(inputs)
 
-            context_parts.append(
-                f"Document {i}: (Source: {source}, Page: ({page}), Score: {score:.3f}):\n"
-                f"{document.page_content}\n"
-            )
+    def _format_context(self, inputs: Dict[str, Any]) -> str:
+        retrieval: RetrievalResult = inputs["retrieval"]
+        start_time = time.perf_counter()
+
+        with span("context_build"):
+            if not retrieval.results:
+                logger.warning("No relevant docs found")
+                return "Not relevant docs found"
+
+            context_parts = []
+            for i, (document, score) in enumerate(retrieval.results, 1):
+                source = document.metadata.get("source_file", "Unknown")
+                page = document.metadata.get("page", "Unknown")
 
-        context = "\n" + "="*80 + "\n".join(context_parts)
+                context_parts.append(
+                    f"Document {i}: (Source: {source}, Page: ({page}), Score: {score:.3f}):\n"
+                    f"{document.page_content}\n"
+                )
 
-        retrieve_time = time.time() - start_time
-        logger.info(f"Retrieved {len(results)} docs in {retrieve_time:.2} seconds.")
+            context = "\n" + "="*80 + "\n".join(context_parts)
 
+        retrieval.timings["context_build"] = time.perf_counter() - start_time
         return context
 
+    def _generate(self, inputs: Dict[str, Any], config: RunnableConfig) -> str:
+        with span("llm"):
+            return self.answer_chain.invoke(inputs, config)
+
+    async def _agenerate(self, inputs: Dict[str, Any], config: RunnableConfig) -> str:
+        with span("llm"):
+            return await self.answer_chain.ainvoke(inputs, config)
+
+    def _cached_response(
+        self,
+        question: str,
+        start_time: float,
+        query_vector,
+        trace_span: Optional[Span] = None
+    ) -> Optional[Dict[str, Any]]:
+        with span("answer_cache"):
+            cached = self.answer_cache.get(question, self.vector_store.index_version, query_vector)
+        if cached is not None:
+            cached["question"] = question
+            cached["response_time"] = round(time.perf_counter() - start_time, 3)
+            if trace_span is not None:
+                cached["trace"] = trace_span.to_dict()
+            logger.info(f"Answered from cache ({cached['cache_hit']}) in {cached['response_time']:.3f} seconds.")
+        return cached
+
+    @staticmethod
+    def _generation_time(retrieval: RetrievalResult, chain_time: float) -> float:
+        return chain_time - retrieval.timings.get("total", 0.0) - retrieval.timings.get("context_build", 0.0)
+
+    def _build_response(
+        self,
+        question: str,
+        retrieval: RetrievalResult,
+        answer: str,
+        start_time: float,
+        generation_time: Optional[float],
+        deanon_time: float,
+        trace_span: Optional[Span] = None
+    ) -> Dict[str, Any]:
+        total_time = time.perf_counter() - start_time
+
+        timings = {f"retrieval_{stage}": round(t, 4) for stage, t in retrieval.timings.items()}
+        # None for batched questions, whose LLM calls overlap; see _batch_ask
+        if generation_time is not None:
+            timings["generation"] = round(generation_time, 4)
+        timings["deanonymization"] = round(deanon_time, 4)
+
+        response = {
+            "question": question,
+            "answer": answer,
+            "sources": retrieval.sources(),
+            "response_time": round(total_time, 3),
+            "num_sources": len(retrieval),
+            "timings": timings
+        }
+        if trace_span is not None:
+            # Nested spans of this request (cache, retrieval stages, context, LLM, de-anonymization, DB)
+            response["trace"] = trace_span.to_dict()
+
+        logger.info(f"Created response in {total_time:.3f} seconds.")
+        return response
+
+    @staticmethod
+    def _error_response(
+        question: str,
+        error: Exception,
+        start_time: float,
+        trace_span: Optional[Span] = None
+    ) -> Dict[str, Any]:
+        import traceback
+        tb = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        logger.error(f"Failed to process question: {str(error)}\n{tb}")
+        response = {
+            "question": question,
+            "answer": f"Error processing question: {str(error)}",
+            "sources": [],
+            "response_time": time.perf_counter() - start_time,
+            "num_sources": 0
+        }
+        if trace_span is not None:
+            response["trace"] = trace_span.to_dict()
+        return response
+
     def ask(self, question:str) -> Dict[str, Any]:
         logger.info(f"Processing question: {question}")
-        start_time = time.time()
+        start_time = time.perf_counter()
+
+        with trace("ask") as root:
+            try:
+                # index_version changes with every rebuild/sync, so cached answers never outlive the corpus they came from
+                index_version = self.vector_store.index_version
+                query_vector = self.vector_store.embed_query(question) if self.answer_cache.semantic else None
+                cached = self._cached_response(question, start_time, query_vector, root)
+                if cached is not None:
+                    return cached
+
+                result = self.chain.invoke(question)
+                chain_time = time.perf_counter() - start_time
+
+                # De-anonymize the final answer from placeholders back to original values
+                deanon_start = time.perf_counter()
+                with span("deanonymization"):
+                    answer = self.deanonymizer.deanonymize(result["answer"])
+
+                response = self._build_response(
+                    question, result["retrieval"], answer, start_time,
+                    self._generation_time(result["retrieval"], chain_time), time.perf_counter() - deanon_start, root
+                )
+                self.answer_cache.put(question, index_version, response, query_vector)
+                return response
+
+            except Exception as e:
+                return self._error_response(question, e, start_time, root)
+
+    async def aask(self, question: str) -> Dict[str, Any]:
+        logger.info(f"Processing question (async): {question}")
+        start_time = time.perf_counter()
+
+        # contextvars follow the task, so spans of awaited steps and _run_blocking calls nest under this one
+        with trace("ask") as root:
+            try:
+                index_version = self.vector_store.index_version
+                query_vector = None
+                if self.answer_cache.semantic:
+                    query_vector = await _run_blocking(self.vector_store.embed_query, question)
+                cached = self._cached_response(question, start_time, query_vector, root)
+                if cached is not None:
+                    return cached
+
+                result = await self.chain.ainvoke(question)
+                chain_time = time.perf_counter() - start_time
+
+                deanon_start = time.perf_counter()
+                with span("deanonymization"):
+                    # May hit Postgres when the mapping needs a reload
+                    answer = await _run_blocking(self.deanonymizer.deanonymize, result["answer"])
+
+                response = self._build_response(
+                    question, result["retrieval"], answer, start_time,
+                    self._generation_time(result["retrieval"], chain_time), time.perf_counter() - deanon_start, root
+                )
+                self.answer_cache.put(question, index_version, response, query_vector)
+                return response
+
+            except asyncio.CancelledError:
+                logger.info(f"Question cancelled: {question[:100]}")
+                raise
+            except Exception as e:
+                return self._error_response(question, e, start_time, root)
+
+    def _stream_cached(self, cached: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        yield {"type": "sources", "sources": cached["sources"], "num_sources": cached["num_sources"]}
+        yield {"type": "token", "text": cached["answer"]}
+        yield {"type": "done", "response": cached}
+
+    def _streamed_response(
+        self,
+        question: str,
+        retrieval: RetrievalResult,
+        answer: str,
+        start_time: float,
+        generation_start: float,
+        first_token_at: Optional[float],
+        deanon_time: float,
+        root: Span
+    ) -> Dict[str, Any]:
+        # Summed over the streamed chunks
+        record("deanonymization", deanon_time, parent=root)
+
+        response = self._build_response(
+            question, retrieval, answer, start_time, time.perf_counter() - generation_start, deanon_time, root
+        )
+        if first_token_at is not None:
+            # Measured from the start of the request, i.e. what the user actually waits for
+            response["timings"]["time_to_first_token"] = round(first_token_at - start_time, 4)
+        return response
+
+    @staticmethod
+    def _finish_llm_span(llm_span: Span, first_token_at: Optional[float]) -> None:
+        if first_token_at is not None:
+            llm_span.attributes["time_to_first_token"] = round(first_token_at - llm_span.start, 4)
+        llm_span.finish()
+
+    def stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        """Yields {"type": "sources"}, then {"type": "token"} per answer chunk, then {"type": "done"}
+        with the complete response ({"type": "error"} instead if the question fails)."""
+        logger.info(f"Processing question (streaming): {question}")
+        start_time = time.perf_counter()
+        # Only activated around non-yielding steps; the consumer's context must not see it between events
+        root = Span("ask", attributes={"stream": True})
 
         try:
-            answer = self.chain.invoke(question)
-            # De-anonymize the final answer from placeholders back to original values
-            mapping = get_entities_for_deanonymization()
-            if mapping:
-                for anonymized, original in mapping.items():
-                    if anonymized in answer:
-                        answer = answer.replace(anonymized, original)
-
-            relevant_docs = self.vector_store.search(question, k=settings.TOP_K_RESULTS)
-
-            total_time = time.time() - start_time
-
-            response = {
-                "question": question,
-                "answer": answer,
-                "sources": [
-                    {
-                        "source_file" : doc.metadata.get("source_file", "Unknown"),
-                        "page": doc.metadata.get("page", "Unknown"),
-                        "chunk_id": doc.metadata.get("chunk_id", "Unknown"),
-                        "relevance_score": score
-                    } for doc, score in relevant_docs
-                ],
-                "response_time": round(total_time, 3),
-                "num_sources": len(relevant_docs)
-            }
-
-            logger.info(f"Created response in {total_time:.3f} seconds.")
-            return response
+            with activate(root):
+                index_version = self.vector_store.index_version
+                query_vector = self.vector_store.embed_query(question) if self.answer_cache.semantic else None
+                cached = self._cached_response(question, start_time, query_vector, root)
+            if cached is not None:
+                yield from self._stream_cached(cached)
+                return
+
+            with activate(root):
+                inputs = self._retrieve(question)
+            retrieval: RetrievalResult = inputs["retrieval"]
+            yield {"type": "sources", "sources": retrieval.sources(), "num_sources": len(retrieval)}
+
+            with activate(root):
+                inputs["context"] = self._format_context(inputs)
+            generation_start = time.perf_counter()
+            first_token_at = None
+            deanon_time = 0.0
+            deanonymizer = self.deanonymizer.stream()
+            answer_parts = []
+
+            llm_span = Span("llm", root)
+            try:
+                for chunk in self.answer_chain.stream(inputs):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    deanon_start = time.perf_counter()
+                    text = deanonymizer.feed(chunk)
+                    deanon_time += time.perf_counter() - deanon_start
+                    if text:
+                        answer_parts.append(text)
+                        yield {"type": "token", "text": text}
+            finally:
+                # Also when the LLM call fails or the consumer stops reading (GeneratorExit at a yield)
+                self._finish_llm_span(llm_span, first_token_at)
+
+            text = deanonymizer.flush()
+            if text:
+                answer_parts.append(text)
+                yield {"type": "token", "text": text}
+
+            response = self._streamed_response(
+                question, retrieval, "".join(answer_parts), start_time, generation_start, first_token_at, deanon_time,
+                root
+            )
+            self.answer_cache.put(question, index_version, response, query_vector)
+            yield {"type": "done", "response": response}
 
         except Exception as e:
-            import traceback
-            tb = traceback.format_exc()
-            logger.error(f"Failed to process question: {str(e)}\n{tb}")
-            return {
-                "question": question,
-                "answer": f"Error processing question: {str(e)}",
-                "sources": [],
-                "response_time": time.time() - start_time,
-                "num_sources": 0
-            }
+            yield {"type": "error", "response": self._error_response(question, e, start_time, root)}
+        finally:
+            root.finish()
+
+    async def astream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        logger.info(f"Processing question (async streaming): {question}")
+        start_time = time.perf_counter()
+        root = Span("ask", attributes={"stream": True})
+
+        try:
+            with activate(root):
+                index_version = self.vector_store.index_version
+                query_vector = None
+                if self.answer_cache.semantic:
+                    query_vector = await _run_blocking(self.vector_store.embed_query, question)
+                cached = self._cached_response(question, start_time, query_vector, root)
+            if cached is not None:
+                for event in self._stream_cached(cached):
+                    yield event
+                return
+
+            with activate(root):
+                inputs = await self._aretrieve(question)
+            retrieval: RetrievalResult = inputs["retrieval"]
+            yield {"type": "sources", "sources": retrieval.sources(), "num_sources": len(retrieval)}
+
+            with activate(root):
+                inputs["context"] = self._format_context(inputs)
+                deanonymizer = await _run_blocking(self.deanonymizer.stream)
+            generation_start = time.perf_counter()
+            first_token_at = None
+            deanon_time = 0.0
+            answer_parts = []
+
+            llm_span = Span("llm", root)
+            try:
+                async for chunk in self.answer_chain.astream(inputs):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    deanon_start = time.perf_counter()
+                    text = deanonymizer.feed(chunk)
+                    deanon_time += time.perf_counter() - deanon_start
+                    if text:
+                        answer_parts.append(text)
+                        yield {"type": "token", "text": text}
+            finally:
+                # Also on LLM errors, cancellation and when the consumer closes the generator
+                self._finish_llm_span(llm_span, first_token_at)
+
+            text = deanonymizer.flush()
+            if text:
+                answer_parts.append(text)
+                yield {"type": "token", "text": text}
+
+            response = self._streamed_response(
+                question, retrieval, "".join(answer_parts), start_time, generation_start, first_token_at, deanon_time,
+                root
+            )
+            self.answer_cache.put(question, index_version, response, query_vector)
+            yield {"type": "done", "response": response}
+
+        except asyncio.CancelledError:
+            logger.info(f"Question cancelled: {question[:100]}")
+            raise
+        except Exception as e:
+            yield {"type": "error", "response": self._error_response(question, e, start_time, root)}
+        finally:
+            root.finish()
 
     def batch_ask(self, questions: List[str]) -> List[Dict[str, Any]]:
         logger.info(f"Processing {len(questions)} questions")
+        with trace("batch", questions=len(questions)) as root:
+            responses = self._batch_ask(questions)
+        logger.info(f"Batch breakdown: {root.summary()}")
+        return responses
 
-        results = []
-        for idx, question in enumerate(questions, 1):
-            logger.info(f"Processing question: {idx}/{len(questions)}") # zum beispiel Processing question 3/6
-            result = self.ask(question)
-            results.append(result)
+    def _batch_ask(self, questions: List[str]) -> List[Dict[str, Any]]:
+        start_time = time.perf_counter()
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(questions)
 
-        return results
\ No newline at end of file
+        try:
+            index_version = self.vector_store.index_version
+            query_vectors = self.vector_store.embed_queries(questions) if self.answer_cache.semantic and questions else None
+
+            pending = []
+            for i, question in enumerate(questions):
+                cached = self._cached_response(question, start_time, query_vectors[i] if query_vectors is not None else None)
+                if cached is not None:
+                    responses[i] = cached
+                else:
+                    pending.append(i)
+
+            # One embedding pass and one matrix search for every question that missed the cache
+            retrievals = self.vector_store.retrieve_many([questions[i] for i in pending], k=settings.TOP_K_RESULTS)
+        except Exception as e:
+            return [self._error_response(question, e, start_time) for question in questions]
+
+        generation_start = time.perf_counter()
+        # LLM calls are I/O bound and go out concurrently; LangChain's executor copies the context, so
+        # their spans land in this batch's trace
+        results = self.generation_chain.batch(
+            [{"question": questions[i], "retrieval": retrieval} for i, retrieval in zip(pending, retrievals)],
+            config={"max_concurrency": settings.BATCH_LLM_CONCURRENCY},
+            return_exceptions=True
+        )
+        generation_time = time.perf_counter() - generation_start
+
+        for i, retrieval, result in zip(pending, retrievals, results):
+            question = questions[i]
+            if isinstance(result, Exception):
+                responses[i] = self._error_response(question, result, start_time)
+                continue
+            try:
+                deanon_start = time.perf_counter()
+                with span("deanonymization"):
+                    answer = self.deanonymizer.deanonymize(result["answer"])
+                responses[i] = self._build_response(
+                    question, retrieval, answer, start_time, None, time.perf_counter() - deanon_start
+                )
+                # Wall time of the whole concurrent batch() call, shared by every question in it
+                responses[i]["timings"]["batch_generation"] = round(generation_time, 4)
+                self.answer_cache.put(
+                    question, index_version, responses[i], query_vectors[i] if query_vectors is not None else None
+                )
+            except Exception as e:
+                responses[i] = self._error_response(question, e, start_time)
+
+        total_time = time.perf_counter() - start_time
+        logger.info(
+            f"Answered {len(questions)} questions ({len(questions) - len(pending)} from cache) in {total_time:.3f} seconds"
+        )
+        return responses
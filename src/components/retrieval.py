@@ -0,0 +1,39 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from langchain.schema import Document
+
+
+@dataclass
+class RetrievalResult:
+    """Result of one hybrid retrieval: ranked documents, their scores and per-stage timings.
+
+    Produced once per question by VectorStore.retrieve and carried through the chain,
+    so sources, context and response metadata all come from the same search.
+    """
+    query: str
+    results: List[Tuple[Document, float]] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    keyword_matches: int = 0
+    semantic_matches: int = 0
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    @property
+    def documents(self) -> List[Document]:
+        return [doc for doc, _ in self.results]
+
+    @property
+    def scores(self) -> List[float]:
+        return [score for _, score in self.results]
+
+    def sources(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "source_file": doc.metadata.get("source_file", "Unknown"),
+                "page": doc.metadata.get("page", "Unknown"),
+                "chunk_id": doc.metadata.get("chunk_id", "Unknown"),
+                "relevance_score": score
+            } for doc, score in self.results
+        ]
@@ -0,0 +1,304 @@
+import time
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+from psycopg2.extras import execute_values
+
+from src.utils.logger import logger
+from config.settings import settings
+from database import get_db_connection
+
+# Must match the on-disk format written by VectorStore
+EMBEDDING_DTYPE = np.dtype("<f4")
+# Compact alternative for document_embeddings.embedding (EMBEDDING_STORAGE_DTYPE=float16)
+STORAGE_DTYPES = {"float32": EMBEDDING_DTYPE, "float16": np.dtype("<f2")}
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "fp16", "sq8", "pq")
+
+
+def storage_dtype(name: str) -> np.dtype:
+    try:
+        return STORAGE_DTYPES[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown EMBEDDING_STORAGE_DTYPE '{name}', expected 'float32' or 'float16'")
+
+
+class FaissBackend:
+    """Semantic top-k over an in-process FAISS index (every replica holds all vectors in RAM).
+
+    FAISS_INDEX_TYPE selects exact IndexFlatIP ("flat", default), an approximate HNSW / IVF index,
+    or a compressed one: scalar quantization to fp16 / int8 ("fp16", "sq8", 2 / 1 bytes per dimension)
+    or product quantization ("pq", FAISS_PQ_M bytes per vector).
+    """
+
+    name = "faiss"
+    loads_vectors = True
+
+    def __init__(self, index_type: str = None, **params):
+        self.index_type = (index_type or settings.FAISS_INDEX_TYPE).lower()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS_INDEX_TYPE '{self.index_type}', expected one of {', '.join(INDEX_TYPES)}")
+        self.params = {
+            "hnsw_m": settings.FAISS_HNSW_M,
+            "ef_construction": settings.FAISS_HNSW_EF_CONSTRUCTION,
+            "ef_search": settings.FAISS_HNSW_EF_SEARCH,
+            "nlist": settings.FAISS_IVF_NLIST,
+            "nprobe": settings.FAISS_IVF_NPROBE,
+            "pq_m": settings.FAISS_PQ_M,
+        }
+        self.params.update(params)
+        self.index = None
+        self.mapped = False
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.index.d if self.index is not None else None
+
+    def _new_index(self, vectors: np.ndarray):
+        dimension = vectors.shape[1]
+        if self.index_type == "hnsw":
+            hnsw = faiss.IndexHNSWFlat(dimension, int(self.params["hnsw_m"]), faiss.METRIC_INNER_PRODUCT)
+            hnsw.hnsw.efConstruction = int(self.params["ef_construction"])
+            hnsw.hnsw.efSearch = int(self.params["ef_search"])
+            # ID-mapped so single files can be removed/added during incremental sync
+            return faiss.IndexIDMap2(hnsw)
+
+        if self.index_type == "ivf":
+            nlist = self._nlist(len(vectors))
+            quantizer = faiss.IndexFlatIP(dimension)
+            ivf = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            start_time = time.perf_counter()
+            ivf.train(vectors)
+            ivf.nprobe = min(int(self.params["nprobe"]), nlist)
+            logger.info(f"Trained IVF index with nlist={nlist} in {time.perf_counter() - start_time:.2f} seconds")
+            # IVF stores external ids itself and supports remove_ids, no IDMap wrapper needed
+            return ivf
+
+        if self.index_type in ("fp16", "sq8"):
+            qtype = faiss.ScalarQuantizer.QT_fp16 if self.index_type == "fp16" else faiss.ScalarQuantizer.QT_8bit
+            sq = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+            # int8 learns per-dimension ranges; fp16 training is a no-op
+            sq.train(vectors)
+            return faiss.IndexIDMap2(sq)
+
+        if self.index_type == "pq":
+            m = self._pq_m(dimension)
+            nbits = self._pq_nbits(len(vectors))
+            pq = faiss.IndexPQ(dimension, m, nbits, faiss.METRIC_INNER_PRODUCT)
+            start_time = time.perf_counter()
+            pq.train(vectors)
+            logger.info(f"Trained PQ index with M={m}, nbits={nbits} in {time.perf_counter() - start_time:.2f} seconds")
+            return faiss.IndexIDMap2(pq)
+
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    def _pq_m(self, dimension: int) -> int:
+        # M must divide the dimension; take the largest divisor not above FAISS_PQ_M
+        m = max(1, min(int(self.params["pq_m"]), dimension))
+        while dimension % m:
+            m -= 1
+        return m
+
+    @staticmethod
+    def _pq_nbits(n_vectors: int) -> int:
+        # 256 centroids per sub-quantizer need ~39 * 256 training vectors; use fewer on small corpora
+        return int(max(1, min(8, np.log2(max(2, n_vectors // 39)))))
+
+    @property
+    def bytes_per_vector(self) -> Optional[float]:
+        if self.index is None:
+            return None
+        index = faiss.downcast_index(self.index.index) if isinstance(self.index, faiss.IndexIDMap2) else self.index
+        code_size = getattr(index, "code_size", None)
+        return float(code_size) if code_size else None
+
+    def _nlist(self, n_vectors: int) -> int:
+        nlist = int(self.params["nlist"]) or int(4 * np.sqrt(n_vectors))
+        # FAISS wants roughly 39 training points per centroid
+        return max(1, min(nlist, n_vectors // 39))
+
+    def attach_index(self, index, mapped: bool = False) -> None:
+        self.index = index
+        self.mapped = mapped
+
+    def _ensure_writable(self) -> None:
+        # Memory-mapped snapshot indexes are read-only; copy into RAM before the first modification.
+        # clone_index would keep the codes pointing into the mapping, a serialize round trip owns them
+        if self.mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self.mapped = False
+
+    def build(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        start_time = time.perf_counter()
+        self.mapped = False
+        self.index = self._new_index(vectors)
+        self.index.add_with_ids(vectors, ids)
+        logger.info(
+            f"Built FAISS {self.index_type} index with {self.index.ntotal} vectors "
+            f"in {time.perf_counter() - start_time:.2f} seconds"
+        )
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        if self.index is None:
+            self.build(vectors, ids)
+        else:
+            self._ensure_writable()
+            self.index.add_with_ids(vectors, ids)
+
+    def remove(self, ids: np.ndarray) -> None:
+        if self.index is None or not len(ids):
+            return
+        self._ensure_writable()
+        try:
+            self.index.remove_ids(ids)
+        except RuntimeError:
+            # HNSW cannot delete; rebuild from the vectors that stay
+            all_ids = faiss.vector_to_array(self.index.id_map)
+            keep = ~np.isin(all_ids, ids)
+            vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+            logger.info(f"FAISS {self.index_type} index does not support removal, rebuilding with {int(keep.sum())} vectors")
+            self.build(np.ascontiguousarray(vectors[keep]), all_ids[keep])
+
+    def sync_table(self, cur, dim: int, dtype: np.dtype = EMBEDDING_DTYPE) -> None:
+        pass
+
+    def search(self, query_vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.search(query_vectors, k)
+
+
+class PgVectorBackend:
+    """Semantic top-k pushed down to Postgres/pgvector (inner product over document_embeddings.embedding_vec).
+
+    Replicas only load chunk texts and metadata; vectors and the ANN index live in the database.
+    """
+
+    name = "pgvector"
+    loads_vectors = False
+
+    def __init__(self):
+        self._count = 0
+        self._dim: Optional[int] = None
+
+    @property
+    def index(self):
+        return None
+
+    @property
+    def ntotal(self) -> int:
+        return self._count
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    def build(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        self.attach(len(ids), vectors.shape[1])
+
+    def attach(self, count: int, dim: int) -> None:
+        self._count = count
+        self._dim = dim
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        self._count += len(ids)
+        self._dim = self._dim or vectors.shape[1]
+
+    def remove(self, ids: np.ndarray) -> None:
+        self._count -= len(ids)
+
+    def sync_table(self, cur, dim: int, dtype: np.dtype = EMBEDDING_DTYPE) -> None:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+        cur.execute("""
+            SELECT atttypmod FROM pg_attribute
+            WHERE attrelid = 'document_embeddings'::regclass AND attname = 'embedding_vec' AND NOT attisdropped;
+        """)
+        row = cur.fetchone()
+        if row is not None and row[0] != dim:
+            logger.warning(f"pgvector column has dim {row[0]}, embeddings have dim {dim}; recreating it")
+            cur.execute("ALTER TABLE document_embeddings DROP COLUMN embedding_vec;")
+            row = None
+        if row is None:
+            cur.execute(f"ALTER TABLE document_embeddings ADD COLUMN embedding_vec vector({int(dim)});")
+
+        self._backfill(cur, dtype)
+        self._ensure_ann_index(cur)
+
+    def _backfill(self, cur, dtype: np.dtype) -> None:
+        # embedding (float32/float16 BYTEA) stays the source of truth; embedding_vec is derived from it
+        start_time = time.perf_counter()
+        filled = 0
+        while True:
+            cur.execute(
+                "SELECT id, embedding FROM document_embeddings WHERE embedding_vec IS NULL ORDER BY id LIMIT %s;",
+                (settings.DB_FETCH_CHUNK_SIZE,)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            execute_values(
+                cur,
+                "UPDATE document_embeddings AS d SET embedding_vec = v.vec::vector "
+                "FROM (VALUES %s) AS v(id, vec) WHERE d.id = v.id",
+                [(row_id, _vector_literal(np.frombuffer(blob, dtype=dtype).astype(np.float32))) for row_id, blob in rows]
+            )
+            filled += len(rows)
+        if filled:
+            logger.info(f"Filled {filled} pgvector embeddings in {time.perf_counter() - start_time:.2f} seconds")
+
+    def _ensure_ann_index(self, cur) -> None:
+        if settings.PGVECTOR_INDEX == "ivfflat":
+            cur.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_document_embeddings_vec_ivfflat ON document_embeddings
+                USING ivfflat (embedding_vec vector_ip_ops) WITH (lists = {int(settings.PGVECTOR_IVF_LISTS)});
+            """)
+        else:
+            cur.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_document_embeddings_vec_hnsw ON document_embeddings
+                USING hnsw (embedding_vec vector_ip_ops)
+                WITH (m = {int(settings.PGVECTOR_HNSW_M)}, ef_construction = {int(settings.PGVECTOR_HNSW_EF_CONSTRUCTION)});
+            """)
+
+    def search(self, query_vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = np.full((len(query_vectors), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(query_vectors), k), -1, dtype=np.int64)
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                if settings.PGVECTOR_INDEX == "ivfflat":
+                    cur.execute("SET LOCAL ivfflat.probes = %s;", (int(settings.PGVECTOR_IVF_PROBES),))
+                else:
+                    cur.execute("SET LOCAL hnsw.ef_search = %s;", (int(settings.PGVECTOR_HNSW_EF_SEARCH),))
+                for row, query_vector in enumerate(query_vectors):
+                    literal = _vector_literal(query_vector)
+                    # <#> is the negative inner product, so ascending order = best match first
+                    cur.execute(
+                        """
+                        SELECT doc_index, -(embedding_vec <#> %s::vector) AS score
+                        FROM document_embeddings
+                        ORDER BY embedding_vec <#> %s::vector
+                        LIMIT %s
+                        """,
+                        (literal, literal, k)
+                    )
+                    for col, (doc_index, score) in enumerate(cur.fetchall()):
+                        ids[row, col] = doc_index
+                        scores[row, col] = score
+
+        return scores, ids
+
+
+def _vector_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.8g}" for x in vector.tolist()) + "]"
+
+
+def create_search_backend(name: str = None):
+    name = (name or settings.SEARCH_BACKEND).lower()
+    if name == "faiss":
+        return FaissBackend()
+    if name == "pgvector":
+        return PgVectorBackend()
+    raise ValueError(f"Unknown SEARCH_BACKEND '{name}', expected 'faiss' or 'pgvector'")
@@ -1,21 +1,56 @@
-﻿import pickle
+﻿import json
+import threading
 import time
-import re
 import os
+from collections import Counter
 from pathlib import Path
-from typing import Any,  Dict, List,  Tuple
+from typing import Any,  Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
-import faiss
 import numpy as np
 from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
-from psycopg2.extras import Json
+from psycopg2 import Binary
+from psycopg2.extras import Json, execute_values
 
+from src.components.embedding_cache import QueryEmbeddingCache
+from src.components.embedding_engine import EmbeddingEngine
+from src.components.index_snapshot import MappedDocuments, read_manifest, read_snapshot, read_vectors, write_snapshot
+from src.components.keyword_index import KeywordIndex, extract_keywords
+from src.components.retrieval import RetrievalResult
+from src.components.search_backends import EMBEDDING_DTYPE, create_search_backend, storage_dtype
 from src.utils.logger import logger
+from src.utils.rwlock import ReadWriteLock
+from src.utils.tracing import span
 from config.settings import settings
 from database import get_db_connection
 
+# Embedded with the ingest backend and stored with the index; re-embedding them with the query backend
+# shows whether both produce the same vectors (e.g. torch-built index queried through int8 ONNX)
+PROBE_TEXTS = [
+    "Senior Python Entwickler mit Erfahrung in Kubernetes, PostgreSQL und Azure.",
+    "Projektleiterin im SAP-Umfeld, spricht Deutsch, Englisch und Französisch.",
+    "Data Scientist: machine learning, NLP, PyTorch, retrieval-augmented generation.",
+    "Werkstudent Frontend (React, TypeScript), verfügbar ab Oktober in Hamburg.",
+]
+# Quantized file shipped by sentence-transformers/all-MiniLM-L6-v2 that runs on any AVX2 x86 CPU
+DEFAULT_INT8_ONNX_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+def embedding_model_kwargs(backend: str = None, onnx_file: str = None) -> Dict[str, Any]:
+    # Passed through HuggingFaceEmbeddings to the SentenceTransformer constructor
+    backend = (backend or settings.EMBEDDING_BACKEND).lower()
+    onnx_file = settings.EMBEDDING_ONNX_FILE if onnx_file is None else onnx_file
+    model_kwargs: Dict[str, Any] = {'device': 'cpu'}
+    if backend == "onnx-int8":
+        backend = "onnx"
+        onnx_file = onnx_file or DEFAULT_INT8_ONNX_FILE
+    if backend == "onnx":
+        model_kwargs["backend"] = "onnx"
+        if onnx_file:
+            model_kwargs["model_kwargs"] = {"file_name": onnx_file}
+    elif backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected 'torch', 'onnx' or 'onnx-int8'")
+    return model_kwargs
+
 
 class VectorStore:
 
@@ -30,54 +65,204 @@ class VectorStore:
 
     def __init__(self, settings):
         # Normalize common typo in HF model id
-        model_name = settings.EMBEDDING_MODEL.replace("sentence-transformer/", "sentence-transformers/")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            cache_folder=os.environ.get("HF_HOME", "/root/.cache/huggingface"),
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True})
-        self.index = None
+        self.model_name = settings.EMBEDDING_MODEL.replace("sentence-transformer/", "sentence-transformers/")
+        # Loaded on first use (see embeddings); importing torch + the model dominates startup
+        self._embeddings = None
+        self._embeddings_lock = threading.Lock()
+        self.embedding_backend = settings.EMBEDDING_BACKEND.lower()
+        # Probe vectors stored with the index, and how well the current backend reproduces them
+        self.stored_probe = None
+        self.embedding_compatibility = None
+        self.backend = create_search_backend(settings.SEARCH_BACKEND)
+        # Encoding of document_embeddings.embedding; an existing index keeps the dtype it was written with
+        self.storage_dtype = storage_dtype(settings.EMBEDDING_STORAGE_DTYPE)
+        # Full-precision vectors by document position, only kept for exact re-scoring of compressed-index hits
+        self.rescore_vectors = None
+        self.query_cache = QueryEmbeddingCache(
+            # ONNX/int8 vectors differ slightly from torch ones; keep their cache entries apart
+            self.model_name if self.embedding_backend == "torch" else f"{self.model_name}#{self.embedding_backend}",
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            persist=settings.QUERY_EMBEDDING_CACHE_PERSIST,
+            max_rows=settings.QUERY_EMBEDDING_CACHE_MAX_ROWS
+        )
         self.documents = []
-        self.metadata = []
+        self.doc_ids: List[int] = []
+        self._positions: Dict[int, int] = {}
+        self.keyword_index = None
+        self._keyword_index_lock = threading.Lock()
+        # Searches read backend, documents, positions and re-score vectors together; sync/rebuild swap them
+        # under the write lock, so a search never sees an index that is patched halfway
+        self._state_lock = ReadWriteLock()
+        self._schema_ready = False
+        # Changes whenever the indexed corpus changes (create/sync/load); see _db_fingerprint
+        self.index_version = None
 
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._embeddings_lock:
+                if self._embeddings is None:
+                    start_time = time.perf_counter()
+                    from langchain_huggingface import HuggingFaceEmbeddings
 
+                    model_kwargs = embedding_model_kwargs(self.embedding_backend)
+                    try:
+                        embeddings = HuggingFaceEmbeddings(
+                            model_name=self.model_name,
+                            cache_folder=os.environ.get("HF_HOME", "/root/.cache/huggingface"),
+                            model_kwargs=model_kwargs,
+                            encode_kwargs={'normalize_embeddings': True})
+                    except Exception as e:
+                        if "model_kwargs" not in model_kwargs:
+                            raise
+                        # Quantized file names differ per model repo
+                        raise ValueError(
+                            f"Could not load {model_kwargs['model_kwargs']['file_name']} from {self.model_name} ({e}). "
+                            f"Set EMBEDDING_ONNX_FILE to an ONNX file that exists in the model repo"
+                        ) from e
+                    logger.info(
+                        f"Loaded embedding model {self.model_name} ({self.embedding_backend}) "
+                        f"in {time.perf_counter() - start_time:.2f} seconds"
+                    )
+                    self._check_model_dim(embeddings)
+                    self._embeddings = embeddings
+                    self.check_compatibility()
+        return self._embeddings
 
-    def _extract_keywords(self, text: str) -> List[str]:
-        prime_art_ids = re.findall(r'\b\d{10,}\b', text) #lange nummern
+    @property
+    def model_loaded(self) -> bool:
+        return self._embeddings is not None
 
-        numbers = re.findall(r'\b\d{6,}\b', text)
+    def _check_model_dim(self, embeddings) -> None:
+        # Read from the model config, no inference needed
+        client = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None)
+        get_dim = getattr(client, "get_sentence_embedding_dimension", None)
+        model_dim = get_dim() if get_dim else None
+        if model_dim and self.backend.dim and model_dim != self.backend.dim:
+            logger.warning(
+                f"Embedding model dim {model_dim} != stored vectors dim {self.backend.dim}. "
+                f"Search will fail. Set EMBEDDING_MODEL to match stored vectors or rebuild index."
+            )
 
-        alphanums = re.findall(r'\b[A-Za-z]\w*\d+\w*\b|\b\d+\w*[A-Za-z]\w*\b', text)
+    def _embedding_probe(self) -> np.ndarray:
+        return np.asarray(self.embeddings.embed_documents(PROBE_TEXTS), dtype=np.float32)
 
-        return list(set(prime_art_ids + numbers + alphanums))
+    def check_compatibility(self) -> Optional[float]:
+        """Cosine similarity (worst probe) between the stored probe vectors and the current backend's."""
+        if self.stored_probe is None or self._embeddings is None:
+            return None
+        try:
+            current = self._embedding_probe()
+            if current.shape != self.stored_probe.shape:
+                similarity = 0.0
+            else:
+                similarity = float(np.min(np.sum(current * self.stored_probe, axis=1)))
+        except Exception as e:
+            logger.warning(f"Embedding compatibility check failed: {e}")
+            return None
 
-    def _keyword_search(self, query: str, k: int = None) -> List[Tuple[Document, float]]:
-        k = k or settings.TOP_K_RESULTS
+        self.embedding_compatibility = similarity
+        if similarity < settings.EMBEDDING_COMPAT_THRESHOLD:
+            logger.warning(
+                f"Embedding backend '{self.embedding_backend}' does not reproduce the stored index vectors "
+                f"(probe cosine {similarity:.4f} < {settings.EMBEDDING_COMPAT_THRESHOLD}). "
+                f"Rebuild the index or switch EMBEDDING_BACKEND."
+            )
+        else:
+            logger.info(f"Embedding backend '{self.embedding_backend}' matches the stored index (probe cosine {similarity:.4f})")
+        return similarity
 
-        query_keywords = self._extract_keywords(query)
-        query_words = query.lower().split()
+    def _set_stored_probe(self, probe) -> None:
+        self.stored_probe = None if probe is None else np.asarray(probe, dtype=np.float32)
+        self.embedding_compatibility = None
+        # Model may already be loaded (sync, rebuild); otherwise the check runs when it is
+        if self._embeddings is not None:
+            self.check_compatibility()
+
+    def warm_up(self) -> None:
+        # Pays the one-off costs (model load, first inference, keyword index) before the first question does
+        start_time = time.perf_counter()
+        self.embeddings.embed_query("warm-up")
+        with self._state_lock.read():
+            if self.is_ready and self.keyword_index is None:
+                with self._keyword_index_lock:
+                    if self.keyword_index is None:
+                        self._build_keyword_index()
+        self.query_cache.warm()
+        logger.info(f"Warm-up finished in {time.perf_counter() - start_time:.2f} seconds")
 
-        logger.info(f"Keyword Search for: {query_keywords + query_words}")
+    def embedding_engine(self) -> EmbeddingEngine:
+        return EmbeddingEngine(
+            self.embeddings,
+            workers=settings.EMBED_WORKERS,
+            batch_tokens=settings.EMBED_BATCH_TOKENS,
+            max_batch_size=settings.EMBED_MAX_BATCH_SIZE
+        )
 
-        matches = []
+    @property
+    def rescoring(self) -> bool:
+        return settings.FAISS_RESCORE and self.backend.loads_vectors
 
-        for i, doc in enumerate(self.documents):
-            score = 0.0
-            content_lower = doc.page_content.lower()
+    def _rescore_copy(self, vectors: np.ndarray):
+        return np.ascontiguousarray(vectors, dtype=self.storage_dtype) if self.rescoring else None
 
-            for keyword in query_keywords:
-                if keyword in content_lower:
-                    score += 1.0
+    @property
+    def index(self):
+        # In-process FAISS index; None when the semantic search runs in Postgres (pgvector backend)
+        return self.backend.index
 
-            # for word in query_words:
-            #     if word in content_lower:
-            #         score += 1.0
+    @property
+    def index_size(self) -> int:
+        return self.backend.ntotal
 
-            if score > 0:
-                matches.append((doc, score))
+    @property
+    def is_ready(self) -> bool:
+        return len(self.documents) > 0 and self.backend.ntotal > 0
 
-        matches.sort(key=lambda x: x[1], reverse=True)
-        return matches[:k]
+    @property
+    def metadata(self) -> List[Dict[str, Any]]:
+        return [doc.metadata for doc in self.documents]
+
+    def _texts(self) -> Iterable[str]:
+        if isinstance(self.documents, MappedDocuments):
+            return (self.documents.text(pos) for pos in range(len(self.documents)))
+        return (doc.page_content for doc in self.documents)
+
+    def _extract_keywords(self, text: str) -> List[str]:
+        return extract_keywords(text)
+
+    def _build_keyword_index(self) -> None:
+        self.keyword_index = self._new_keyword_index(self._texts())
+
+    @staticmethod
+    def _new_keyword_index(texts: Iterable[str]) -> KeywordIndex:
+        start_time = time.perf_counter()
+        keyword_index = KeywordIndex.from_texts(texts, k1=settings.BM25_K1, b=settings.BM25_B)
+        logger.info(
+            f"Built keyword index over {len(keyword_index)} chunks "
+            f"({len(keyword_index.postings)} tokens) in {time.perf_counter() - start_time:.3f} seconds"
+        )
+        return keyword_index
+
+    def _keyword_search(self, query: str, k: int = None) -> List[Tuple[Document, float]]:
+        return [(self.documents[pos], score) for pos, score in self._keyword_matches(query, k)]
+
+    def _keyword_matches(self, query: str, k: int = None) -> List[Tuple[int, float]]:
+        k = k or settings.TOP_K_RESULTS
+
+        query_keywords = self._extract_keywords(query)
+
+        logger.info(f"Keyword Search for: {query_keywords}")
+
+        if not query_keywords:
+            return []
+
+        if self.keyword_index is None or len(self.keyword_index) != len(self.documents):
+            with self._keyword_index_lock:
+                if self.keyword_index is None or len(self.keyword_index) != len(self.documents):
+                    self._build_keyword_index()
+
+        return self.keyword_index.search(query_keywords, k, scoring=settings.KEYWORD_SCORING)
 
     # def generate_embeddings(self, texts: List[str]) -> np.ndarray:
     #     logger.info(f"Generating embeddings for {len(texts)} texts")
@@ -108,21 +293,13 @@ class VectorStore:
     #     logger.info(f"Embedding time: {embed_time:.2} seconds")
     #     logger.info(f"Embedding shape: {embeddings_array.shape}")
     #     return embeddings_array
-    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+    def generate_embeddings(self, texts: List[str], engine: Optional[EmbeddingEngine] = None) -> np.ndarray:
         logger.info(f"Generating embeddings for {len(texts)} texts")
-        start_time = time.time()
-        batch_size = 100
-        all_embeddings: List[List[float]] = []
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            total_batches = (len(texts) + batch_size - 1) // batch_size
-            current_batch = (i // batch_size) + 1
-            logger.info(f"Processing batch {current_batch}/{total_batches}")
-            batch_embeddings = self.embeddings.embed_documents(batch_texts)
-            all_embeddings.extend(batch_embeddings)
-            time.sleep(0.05)
-        embeddings_array = np.array(all_embeddings, dtype=np.float32)
-        logger.info(f"Embedding time: {time.time() - start_time:.2f} seconds; shape={embeddings_array.shape}")
+        # Callers embedding many batches pass one engine, so its worker pool is started only once
+        engine = engine or self.embedding_engine()
+        with span("embedding", texts=len(texts)):
+            embeddings_array = engine.encode(texts)
+        logger.info(f"Embedding shape={embeddings_array.shape}")
         return embeddings_array
 
     # def create_index(self, documents: List[Document]) -> None:
@@ -139,155 +316,597 @@ class VectorStore:
     #     self.documents = documents
     #     self.metadata = metadata
     #     logger.info(f"FAISS index with {self.index.ntotal} vectors. Indexing time: {index_time:.2} seconds")
-    def create_index(self, documents: List[Document]) -> None:
+    def create_index(self, documents: List[Document], manifest: Dict[str, Tuple[str, float]] = None) -> None:
         logger.info(f"Creating index for {len(documents)} documents and persisting to Postgres")
         texts = [doc.page_content for doc in documents]
         metadata = [doc.metadata for doc in documents]
+        doc_ids = [meta.get("chunk_id", i) for i, meta in enumerate(metadata)]
         embeddings = self.generate_embeddings(texts)
-        # Keep FAISS in-memory for fast search
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dimension)
-        self.index.add(embeddings)
-        self.documents = documents
-        self.metadata = metadata
-        # Persist to Postgres (float array + jsonb)
+        probe = self._embedding_probe()
+        # All rows are rewritten, so the configured encoding applies again
+        self.storage_dtype = storage_dtype(settings.EMBEDDING_STORAGE_DTYPE)
+        # Persist to Postgres (float32/float16 bytea + jsonb)
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS document_embeddings (
-                        id SERIAL PRIMARY KEY,
-                        doc_index INTEGER NOT NULL,
-                        content TEXT NOT NULL,
-                        metadata JSONB,
-                        embedding REAL[] NOT NULL
-                    );
-                """)
+                self._ensure_schema(cur)
                 # Replace entire content for now
                 cur.execute("DELETE FROM document_embeddings;")
-                insert_sql = (
-                    "INSERT INTO document_embeddings (doc_index, content, metadata, embedding) "
-                    "VALUES (%s, %s, %s, %s)"
-                )
-                for i, (text, meta, vec) in enumerate(zip(texts, metadata, embeddings)):
-                    cur.execute(insert_sql, (i, text, Json(meta), vec.tolist()))
+                self._insert_rows(cur, doc_ids, texts, metadata, embeddings)
+                self._write_index_metadata(cur, embeddings.shape[1], probe)
+                self.backend.sync_table(cur, embeddings.shape[1], self.storage_dtype)
+                cur.execute("DELETE FROM source_files;")
+                self._upsert_manifest(cur, manifest or {}, Counter(meta.get("source_file") for meta in metadata))
+                self.index_version = self._db_fingerprint(cur)
         logger.info("Persisted embeddings and metadata to Postgres table 'document_embeddings'")
 
-    # def save_index(self, index_path: Path, metadata_path: Path) -> None:
-    #     logger.info(f"Saving FAISS index to {index_path}")
-    #     if self.index is None:
-    #         raise ValueError("No index to save. Must create an index first")
-    #     faiss.write_index(self.index, str(index_path))
-    #     with open(metadata_path, "wb") as f:
-    #         pickle.dump({'documents': self.documents, 'metadata': self.metadata}, f)
-    #     logger.info(f"Success: Saved index and metadata")
-    def save_index(self, index_path: Path, metadata_path: Path) -> None:
-        if self.index is None:
-            raise ValueError("No index to save. Must create an index first")
-        # Already persisted to Postgres in create_index; just ensure a small checkpoint for local fallback
-        logger.info("Persisting small checkpoint (optional) and confirming DB state")
+        keyword_index = self._new_keyword_index(texts)
+        with self._state_lock.write():
+            self.backend.build(embeddings, np.asarray(doc_ids, dtype=np.int64))
+            self._set_documents(documents, doc_ids, build_keyword_index=False)
+            self.keyword_index = keyword_index
+            self.rescore_vectors = self._rescore_copy(embeddings)
+        self.stored_probe, self.embedding_compatibility = probe, 1.0
+
+    @staticmethod
+    def _ingest_config() -> Dict[str, Any]:
+        # A crashed rebuild is only resumed if it would produce the same chunks and vectors
+        return {
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "embedding_backend": settings.EMBEDDING_BACKEND.lower(),
+            "chunk_size": settings.CHUNK_SIZE,
+            "chunk_overlap": settings.CHUNK_OVERLAP,
+        }
+
+    def _write_ingest_state(self, cur, status: str) -> None:
+        cur.execute(
+            "INSERT INTO index_metadata (key, value) VALUES ('ingest_state', %s) "
+            "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+            (json.dumps({"status": status, "config": self._ingest_config(), "updated_at": time.time()}),)
+        )
+
+    def begin_ingest(self, manifest: Dict[str, Tuple[str, float]], resume: bool = True) -> Tuple[Set[str], int]:
+        """Starts (or resumes) a streaming rebuild; returns the already ingested files and the next chunk_id.
+
+        Every persisted batch commits its rows together with the source_files entries of the files it
+        completes, so after a crash source_files lists exactly the files that are fully stored.
+        """
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                self._ensure_schema(cur)
+                index_metadata = self._read_index_metadata(cur)
+                previous = json.loads(index_metadata.get("ingest_state", "null"))
+
+                if (resume and previous and previous.get("status") == "running"
+                        and previous.get("config") == self._ingest_config()):
+                    cur.execute("SELECT source_file, content_hash FROM source_files;")
+                    done = {name for name, content_hash in cur.fetchall() if manifest.get(name, (None,))[0] == content_hash}
+                    # Rows of files that changed since the crashed run are redone
+                    cur.execute(
+                        "DELETE FROM document_embeddings WHERE source_file IS NULL OR NOT (source_file = ANY(%s));",
+                        (list(done),)
+                    )
+                    cur.execute("DELETE FROM source_files WHERE NOT (source_file = ANY(%s));", (list(done),))
+                    cur.execute("SELECT COALESCE(MAX(doc_index) + 1, 0) FROM document_embeddings;")
+                    next_id = cur.fetchone()[0]
+                    self.storage_dtype = np.dtype(
+                        index_metadata.get("embedding_dtype", storage_dtype(settings.EMBEDDING_STORAGE_DTYPE).str)
+                    )
+                    logger.info(f"Resuming interrupted rebuild: {len(done)} files already stored, next chunk_id {next_id}")
+                else:
+                    cur.execute("DELETE FROM document_embeddings;")
+                    cur.execute("DELETE FROM source_files;")
+                    done, next_id = set(), 0
+                    # All rows are rewritten, so the configured encoding applies again
+                    self.storage_dtype = storage_dtype(settings.EMBEDDING_STORAGE_DTYPE)
+
+                self._write_ingest_state(cur, "running")
+        return done, next_id
+
+    def persist_batch(
+        self,
+        chunks: List[Document],
+        embeddings: np.ndarray,
+        manifest: Dict[str, Tuple[str, float]]
+    ) -> None:
+        texts = [doc.page_content for doc in chunks]
+        metadata = [doc.metadata for doc in chunks]
+        doc_ids = [meta["chunk_id"] for meta in metadata]
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                self._ensure_schema(cur)
+                if chunks:
+                    self._insert_rows(cur, doc_ids, texts, metadata, embeddings)
+                    self._write_index_metadata(cur, embeddings.shape[1])
+                self._upsert_manifest(cur, manifest, Counter(meta.get("source_file") for meta in metadata))
+
+    def finish_ingest(self) -> None:
+        probe = self._embedding_probe()
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM document_embeddings;")
-                count = cur.fetchone()[0]
-        logger.info(f"Postgres has {count} embeddings in 'document_embeddings'")
+                self._ensure_schema(cur)
+                dim = self._read_index_metadata(cur).get("embedding_dim")
+                if dim is None:
+                    raise ValueError("No chunks were ingested. Check your data dir")
+                self._write_index_metadata(cur, int(dim), probe)
+                self.backend.sync_table(cur, int(dim), self.storage_dtype)
+                self._write_ingest_state(cur, "complete")
+
+        # The in-memory index is built from the stored rows in one streaming pass
+        if not self._load_from_postgres():
+            raise RuntimeError("Failed to load the ingested embeddings from Postgres")
+
+    def _set_documents(self, documents: Sequence, doc_ids: List[int], build_keyword_index: bool = True) -> None:
+        self.documents = documents
+        self.doc_ids = [int(doc_id) for doc_id in doc_ids]
+        self._positions = {doc_id: pos for pos, doc_id in enumerate(self.doc_ids)}
+        self.keyword_index = None
+        if build_keyword_index:
+            self._build_keyword_index()
+
+    def _db_fingerprint(self, cur) -> str:
+        # SERIAL ids only grow, so count + max(id) changes with every rebuild, sync insert or delete
+        cur.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM document_embeddings;")
+        count, max_id = cur.fetchone()
+        return f"{settings.EMBEDDING_MODEL}:{count}:{max_id}"
+
+    def _ensure_schema(self, cur) -> None:
+        if self._schema_ready:
+            return
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS document_embeddings (
+                id SERIAL PRIMARY KEY,
+                doc_index INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                metadata JSONB,
+                embedding BYTEA NOT NULL
+            );
+        """)
+        cur.execute("ALTER TABLE document_embeddings ADD COLUMN IF NOT EXISTS source_file TEXT;")
+        cur.execute("""
+            UPDATE document_embeddings SET source_file = metadata->>'source_file'
+            WHERE source_file IS NULL AND metadata ? 'source_file';
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_document_embeddings_source_file ON document_embeddings (source_file);")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS source_files (
+                source_file TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                mtime DOUBLE PRECISION NOT NULL,
+                num_chunks INTEGER NOT NULL DEFAULT 0,
+                synced_at TIMESTAMP NOT NULL DEFAULT now()
+            );
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS index_metadata (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self._migrate_embedding_column(cur)
+        self._schema_ready = True
+
+    def _write_index_metadata(self, cur, dim: int, probe: np.ndarray = None) -> None:
+        # Lets a later start learn model and dimension without loading the model
+        rows = [
+            ("embedding_model", settings.EMBEDDING_MODEL),
+            ("embedding_dim", str(int(dim))),
+            ("embedding_dtype", self.storage_dtype.str)
+        ]
+        if probe is not None:
+            rows.append(("embedding_backend", self.embedding_backend))
+            rows.append(("embedding_probe", json.dumps(np.round(probe, 6).tolist())))
+        execute_values(
+            cur,
+            "INSERT INTO index_metadata (key, value) VALUES %s ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+            rows
+        )
 
-    def load_index(self, index_path: Path, metadata_path: Path) -> bool:
+    def _read_index_metadata(self, cur) -> Dict[str, str]:
+        cur.execute("SELECT key, value FROM index_metadata;")
+        return dict(cur.fetchall())
+
+    def _migrate_embedding_column(self, cur) -> None:
+        # Tables created before the bytea format store embeddings as REAL[]; convert them once, in chunks
+        cur.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'document_embeddings' AND column_name = 'embedding';
+        """)
+        row = cur.fetchone()
+        if row is None or row[0] != "ARRAY":
+            return
+
+        logger.info("Migrating document_embeddings.embedding from REAL[] to float32 BYTEA")
+        start_time = time.perf_counter()
+        cur.execute("ALTER TABLE document_embeddings ADD COLUMN IF NOT EXISTS embedding_f32 BYTEA;")
+        migrated = 0
+        while True:
+            cur.execute(
+                "SELECT id, embedding FROM document_embeddings WHERE embedding_f32 IS NULL ORDER BY id LIMIT %s;",
+                (settings.DB_FETCH_CHUNK_SIZE,)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            execute_values(
+                cur,
+                "UPDATE document_embeddings AS d SET embedding_f32 = v.blob FROM (VALUES %s) AS v(id, blob) WHERE d.id = v.id",
+                [(row_id, Binary(np.asarray(vec, dtype=EMBEDDING_DTYPE).tobytes())) for row_id, vec in rows]
+            )
+            migrated += len(rows)
+        cur.execute("ALTER TABLE document_embeddings DROP COLUMN embedding;")
+        cur.execute("ALTER TABLE document_embeddings RENAME COLUMN embedding_f32 TO embedding;")
+        cur.execute("ALTER TABLE document_embeddings ALTER COLUMN embedding SET NOT NULL;")
+        logger.info(f"Migrated {migrated} embeddings in {time.perf_counter() - start_time:.2f} seconds")
+
+    def _insert_rows(
+        self,
+        cur,
+        doc_ids: List[int],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        embeddings: np.ndarray
+    ) -> None:
+        insert_sql = (
+            "INSERT INTO document_embeddings (doc_index, content, metadata, embedding, source_file) VALUES %s"
+        )
+        rows = (
+            (doc_id, text, Json(meta), Binary(vec.astype(self.storage_dtype).tobytes()), meta.get("source_file"))
+            for doc_id, text, meta, vec in zip(doc_ids, texts, metadata, embeddings)
+        )
+        start_time = time.perf_counter()
+        execute_values(cur, insert_sql, rows, page_size=settings.DB_WRITE_BATCH_SIZE)
+        write_time = time.perf_counter() - start_time
+        logger.info(f"Inserted {len(doc_ids)} rows in {write_time:.2f} seconds ({len(doc_ids) / max(write_time, 1e-9):.0f} rows/sec)")
+
+    def _upsert_manifest(self, cur, manifest: Dict[str, Tuple[str, float]], chunk_counts: Dict[str, int]) -> None:
+        for source_file, (content_hash, mtime) in manifest.items():
+            cur.execute(
+                """
+                INSERT INTO source_files (source_file, content_hash, mtime, num_chunks, synced_at)
+                VALUES (%s, %s, %s, %s, now())
+                ON CONFLICT (source_file) DO UPDATE SET
+                    content_hash = EXCLUDED.content_hash,
+                    mtime = EXCLUDED.mtime,
+                    num_chunks = CASE WHEN source_files.content_hash = EXCLUDED.content_hash
+                        THEN source_files.num_chunks ELSE EXCLUDED.num_chunks END,
+                    synced_at = now()
+                """,
+                (source_file, content_hash, mtime, chunk_counts.get(source_file, 0))
+            )
+
+    def get_source_manifest(self) -> Dict[str, Tuple[str, float]]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                self._ensure_schema(cur)
+                cur.execute("SELECT source_file, content_hash, mtime FROM source_files;")
+                return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+
+    def next_chunk_id(self) -> int:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                self._ensure_schema(cur)
+                cur.execute("SELECT COALESCE(MAX(doc_index) + 1, 0) FROM document_embeddings;")
+                return cur.fetchone()[0]
+
+    def apply_changes(
+        self,
+        chunks: List[Document],
+        stale_sources: List[str],
+        removed_sources: List[str],
+        manifest: Dict[str, Tuple[str, float]]
+    ) -> None:
+        """Incremental sync: replace rows of stale source files with the given chunks.
+
+        stale_sources are files whose rows are deleted (changed and removed files), removed_sources
+        are additionally dropped from the source_files manifest, and manifest holds the new
+        (content_hash, mtime) of every added or changed file.
+        """
+        texts = [doc.page_content for doc in chunks]
+        metadata = [doc.metadata for doc in chunks]
+        doc_ids = [meta["chunk_id"] for meta in metadata]
+        embeddings = self.generate_embeddings(texts) if chunks else None
+        # Indexes built before probes were stored get them with the first sync
+        probe = self._embedding_probe() if chunks and self.stored_probe is None else None
+
+        patched = False
         try:
-            # First, attempt to load vectors and docs directly from Postgres
-            if self._load_from_postgres():
-                logger.info("Loaded FAISS index from Postgres")
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_schema(cur)
+                    removed_ids: List[int] = []
+                    if stale_sources:
+                        cur.execute(
+                            "DELETE FROM document_embeddings WHERE source_file = ANY(%s) RETURNING doc_index;",
+                            (list(stale_sources),)
+                        )
+                        removed_ids = [row[0] for row in cur.fetchall()]
+                    if removed_sources:
+                        cur.execute("DELETE FROM source_files WHERE source_file = ANY(%s);", (list(removed_sources),))
+                    if chunks:
+                        self._insert_rows(cur, doc_ids, texts, metadata, embeddings)
+                        self._write_index_metadata(cur, embeddings.shape[1], probe)
+                        self.backend.sync_table(cur, embeddings.shape[1], self.storage_dtype)
+                    self._upsert_manifest(cur, manifest, Counter(meta.get("source_file") for meta in metadata))
+                    index_version = self._db_fingerprint(cur)
+
+                    # Patched before the commit: if patching fails the rows are rolled back as well
+                    patched = True
+                    self._patch_index(removed_ids, chunks, doc_ids, embeddings)
+        except Exception:
+            if patched:
+                # Patch or commit failed halfway; the stored rows are the source of truth
+                logger.error("Sync failed after the in-memory index was patched, reloading it from Postgres")
+                if not self._load_from_postgres():
+                    logger.error("Reloading the index from Postgres failed, searches may return stale results")
+            raise
+
+        self.index_version = index_version
+        if probe is not None:
+            self.stored_probe, self.embedding_compatibility = probe, 1.0
+
+        logger.info(
+            f"Synced index: removed {len(removed_ids)} chunks, added {len(chunks)} chunks; "
+            f"index size is now {self.backend.ntotal}"
+        )
+
+    def _patch_index(
+        self,
+        removed_ids: List[int],
+        chunks: List[Document],
+        doc_ids: List[int],
+        embeddings: Optional[np.ndarray]
+    ) -> None:
+        # Patches the in-memory index instead of reloading everything. The new document list, re-score
+        # vectors and keyword index are built aside; searches only wait for the backend update and the swap
+        removed = set(removed_ids)
+        kept = [(doc, doc_id) for doc, doc_id in zip(self.documents, self.doc_ids) if doc_id not in removed]
+        kept.extend(zip(chunks, doc_ids))
+        documents = [doc for doc, _ in kept]
+        rescore_vectors = None
+        if self.rescore_vectors is not None:
+            keep = [pos for pos, doc_id in enumerate(self.doc_ids) if doc_id not in removed]
+            parts = [np.asarray(self.rescore_vectors[keep])]
+            if chunks:
+                parts.append(embeddings)
+            rescore_vectors = self._rescore_copy(np.concatenate(parts))
+        keyword_index = self._new_keyword_index(doc.page_content for doc in documents)
+
+        with self._state_lock.write():
+            if removed_ids:
+                self.backend.remove(np.asarray(removed_ids, dtype=np.int64))
+            if chunks:
+                self.backend.add(embeddings, np.asarray(doc_ids, dtype=np.int64))
+            self.rescore_vectors = rescore_vectors
+            self._set_documents(documents, [doc_id for _, doc_id in kept], build_keyword_index=False)
+            self.keyword_index = keyword_index
+
+    def save_index(self, snapshot_path: Path) -> None:
+        if not self.is_ready:
+            raise ValueError("No index to save. Must create an index first")
+        # Postgres stays the source of truth; the snapshot lets the next start (or another replica) skip the DB load
+        with self._state_lock.read():
+            write_snapshot(
+                snapshot_path,
+                self.backend.index,
+                self.documents,
+                self.doc_ids,
+                {
+                    "fingerprint": self.index_version,
+                    "embedding_dtype": self.storage_dtype.str,
+                    "embedding_model": settings.EMBEDDING_MODEL,
+                    "dim": self.backend.dim,
+                    "search_backend": self.backend.name,
+                    "index_type": getattr(self.backend, "index_type", None),
+                    "embedding_probe": None if self.stored_probe is None else np.round(self.stored_probe, 6).tolist(),
+                },
+                vectors=self.rescore_vectors
+            )
+
+    def load_index(self, snapshot_path: Path) -> bool:
+        try:
+            with span("load_snapshot"):
+                loaded = self._load_snapshot(snapshot_path)
+            if loaded:
                 return True
 
-            if not index_path.exists() or not metadata_path.exists():
-                logger.info("Index files not found, creating index")
-                return False
+            with span("load_from_postgres"):
+                loaded = self._load_from_postgres()
+            if loaded:
+                logger.info(f"Loaded {self.backend.name} index from Postgres")
+                try:
+                    with span("save_index"):
+                        self.save_index(snapshot_path)
+                except Exception as e:
+                    logger.warning(f"Failed to write index snapshot: {e}")
+                return True
 
-            logger.info(f"Loading FAISS index from {index_path}")
+            logger.info("No stored index found, creating index")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to load index: {str(e)}")
+            return False
 
-            self.index = faiss.read_index(str(index_path))
+    def _load_snapshot(self, snapshot_path: Path) -> bool:
+        start_time = time.perf_counter()
+        manifest = read_manifest(snapshot_path)
+        if manifest is None:
+            return False
 
-            with open(metadata_path, "rb") as f:
-                data = pickle.load(f)
-                self.documents = data["documents"]
-                self.metadata = data["metadata"]
+        if manifest.get("search_backend") != self.backend.name or manifest.get("embedding_model") != settings.EMBEDDING_MODEL:
+            logger.info("Index snapshot was built with a different backend or embedding model, ignoring it")
+            return False
+        if manifest.get("index_type") != getattr(self.backend, "index_type", None):
+            logger.info("Index snapshot has a different FAISS index type, ignoring it")
+            return False
 
-            # Validate that the FAISS index dim matches the current embedding model dim
-            try:
-                expected_dim = len(self.embeddings.embed_query("dimension_check"))
-                if hasattr(self.index, 'd'):
-                    index_dim = self.index.d
-                else:
-                    index_dim = self.index.ntotal and self.index.d  # fallback
-                if index_dim != expected_dim:
-                    logger.warning(
-                        f"FAISS index dim {index_dim} != embedding model dim {expected_dim}. "
-                        f"Forcing index rebuild."
-                    )
-                    return False
-            except Exception as e:
-                logger.warning(f"Failed to validate index dimension: {e}. Forcing rebuild.")
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_schema(cur)
+                    fingerprint = self._db_fingerprint(cur)
+            if fingerprint != manifest.get("fingerprint"):
+                logger.info("Index snapshot is older than Postgres state, ignoring it")
                 return False
-
-            logger.info(f"Success: Loaded index with {self.index.ntotal} vectors")
-            return True
         except Exception as e:
-            logger.error(f"Failed to load FAISS index: {str(e)}")
+            # Snapshots copied to a replica without DB access are still usable
+            logger.warning(f"Could not verify index snapshot against Postgres ({e}); using it as is")
+
+        snapshot = read_snapshot(snapshot_path, use_mmap=settings.SNAPSHOT_MMAP)
+        if snapshot is None:
             return False
+        manifest, index, mapped, documents, doc_ids = snapshot
+
+        if self.backend.name == "faiss" and index is None:
+            return False
+        rescore_vectors = read_vectors(snapshot_path) if self.rescoring else None
+        if rescore_vectors is not None and len(rescore_vectors) != len(doc_ids):
+            rescore_vectors = None
+
+        with self._state_lock.write():
+            if self.backend.name == "faiss":
+                self.backend.attach_index(index, mapped)
+            else:
+                self.backend.attach(manifest["count"], manifest["dim"])
+            # Keyword index is built on first use so startup only maps files
+            self._set_documents(documents, doc_ids, build_keyword_index=False)
+            self.rescore_vectors = rescore_vectors
+        self.index_version = manifest.get("fingerprint")
+        self.storage_dtype = np.dtype(manifest.get("embedding_dtype", EMBEDDING_DTYPE.str))
+        self._set_stored_probe(manifest.get("embedding_probe"))
+        if self.rescoring and self.rescore_vectors is None:
+            logger.warning("FAISS_RESCORE is set but the snapshot has no vectors; re-scoring stays off until the next rebuild")
+
+        logger.info(
+            f"Loaded index snapshot with {len(documents)} chunks from {snapshot_path} "
+            f"({'memory-mapped' if mapped else 'in memory'}) in {time.perf_counter() - start_time:.3f} seconds"
+        )
+        return True
 
     def _load_from_postgres(self) -> bool:
         try:
+            start_time = time.perf_counter()
+            doc_ids: List[int] = []
+            texts: List[str] = []
+            metas: List[Dict[str, Any]] = []
+            vector_chunks: List[bytes] = []
+            # The pgvector backend searches inside Postgres, so replicas skip fetching the vectors
+            load_vectors = self.backend.loads_vectors
+
             with get_db_connection() as conn:
                 with conn.cursor() as cur:
+                    self._ensure_schema(cur)
+                    # Stored model/dim replace the old embed_query("dimension_check") probe
+                    index_metadata = self._read_index_metadata(cur)
+                    # Rows written before embedding_dtype was recorded are float32
+                    self.storage_dtype = np.dtype(index_metadata.get("embedding_dtype", EMBEDDING_DTYPE.str))
+                    cur.execute("SELECT octet_length(embedding) / %s FROM document_embeddings LIMIT 1;", (self.storage_dtype.itemsize,))
+                    row = cur.fetchone()
+                    if row is None:
+                        return False
+                    dim = row[0]
+                    stored_model = index_metadata.get("embedding_model")
+                    if stored_model and stored_model != settings.EMBEDDING_MODEL:
+                        logger.warning(
+                            f"Stored vectors were embedded with {stored_model}, EMBEDDING_MODEL is {settings.EMBEDDING_MODEL}. "
+                            f"Search will fail or be meaningless. Set EMBEDDING_MODEL to match stored vectors or rebuild index."
+                        )
+                    if "embedding_dim" in index_metadata and int(index_metadata["embedding_dim"]) != dim:
+                        logger.warning(f"index_metadata says dim {index_metadata['embedding_dim']}, stored vectors have dim {dim}")
+                    self._set_stored_probe(
+                        json.loads(index_metadata["embedding_probe"]) if "embedding_probe" in index_metadata else None
+                    )
+                    if not load_vectors:
+                        self.backend.sync_table(cur, dim, self.storage_dtype)
+                    self.index_version = self._db_fingerprint(cur)
+                # Server-side cursor: rows arrive in chunks instead of one giant fetchall()
+                with conn.cursor(name="document_embeddings_stream") as cur:
+                    cur.itersize = settings.DB_FETCH_CHUNK_SIZE
                     cur.execute(
-                        """
-                        SELECT doc_index, content, metadata, embedding
+                        f"""
+                        SELECT doc_index, content, metadata{", embedding" if load_vectors else ""}
                         FROM document_embeddings
                         ORDER BY doc_index ASC
                         """
                     )
-                    rows = cur.fetchall()
+                    while True:
+                        rows = cur.fetchmany(settings.DB_FETCH_CHUNK_SIZE)
+                        if not rows:
+                            break
+                        for row in rows:
+                            doc_ids.append(row[0])
+                            texts.append(row[1])
+                            metas.append(row[2] or {})
+                        if load_vectors:
+                            vector_chunks.append(b"".join(row[3] for row in rows))
 
-            if not rows:
+            if not doc_ids:
                 return False
 
-            texts: List[str] = []
-            metas: List[Dict[str, Any]] = []
-            vectors: List[List[float]] = []
-            for _, content, metadata, embedding in rows:
-                texts.append(content)
-                metas.append(metadata or {})
-                vectors.append(list(embedding))
+            if not load_vectors:
+                logger.info(
+                    f"Attached to pgvector index: {len(texts)} vectors, dim={dim} "
+                    f"(documents fetched in {time.perf_counter() - start_time:.2f} seconds)"
+                )
+                documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metas)]
+                with self._state_lock.write():
+                    self.backend.attach(len(doc_ids), dim)
+                    self._set_documents(documents, doc_ids, build_keyword_index=False)
+                return True
 
-            embeddings_array = np.array(vectors, dtype=np.float32)
+            # One contiguous buffer, no per-element Python objects
+            stored = np.frombuffer(b"".join(vector_chunks), dtype=self.storage_dtype).reshape(len(doc_ids), -1)
+            del vector_chunks
+            embeddings_array = stored.astype(np.float32, copy=False)
             dim = embeddings_array.shape[1]
-            logger.info(f"Rebuilding FAISS from Postgres: {len(texts)} vectors, dim={dim}")
-
-            self.index = faiss.IndexFlatIP(dim)
-            self.index.add(embeddings_array)
-            self.documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metas)]
-            self.metadata = metas
-
-            # Validate search-time embedding dimension compatibility
-            try:
-                current_dim = len(self.embeddings.embed_query("dimension_check"))
-                if current_dim != dim:
-                    logger.warning(
-                        f"Embedding model dim {current_dim} != stored vectors dim {dim}. "
-                        f"Search will fail. Set EMBEDDING_MODEL to match stored vectors or rebuild index."
-                    )
-            except Exception:
-                pass
+            logger.info(
+                f"Rebuilding FAISS from Postgres: {len(texts)} vectors, dim={dim} "
+                f"(fetched in {time.perf_counter() - start_time:.2f} seconds)"
+            )
 
+            documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metas)]
+            rescore_vectors = self._rescore_copy(stored)
+            with self._state_lock.write():
+                self.backend.build(embeddings_array, np.asarray(doc_ids, dtype=np.int64))
+                self.rescore_vectors = rescore_vectors
+                # Keyword index is built on first use or by warm_up()
+                self._set_documents(documents, doc_ids, build_keyword_index=False)
             return True
         except Exception as e:
             logger.warning(f"Failed loading index from Postgres: {e}")
             return False
 
-    def search(self, query: str, k: int = None) -> List[Tuple[Document, float]]:
-        if self.index is None:
-            raise ValueError("No index found. Load/Create an index first")
+    def embed_query(self, query: str) -> np.ndarray:
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            return cached
 
-        k = k or settings.TOP_K_RESULTS
+        query_embedding = self.embeddings.embed_query(query)
+        if not isinstance(query_embedding, (list, tuple, np.ndarray)):
+            raise TypeError(f"embed_query returned unexpected type: {type(query_embedding)}")
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        self.query_cache.put(query, query_vector)
+        return query_vector
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        vectors: List[np.ndarray] = [self.query_cache.get(query) for query in queries]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if len(misses) == 1:
+            vectors[misses[0]] = self.embed_query(queries[misses[0]])
+        elif misses:
+            # One forward pass for all uncached questions instead of one per question
+            embeddings = np.asarray(
+                self.embeddings.embed_documents([queries[i] for i in misses]), dtype=np.float32
+            )
+            for i, vector in zip(misses, embeddings):
+                self.query_cache.put(queries[i], vector)
+                vectors[i] = vector
+
+        return np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+
+    @staticmethod
+    def _sanitize_query(query: str) -> str:
         # Sanitize query to avoid tokenizer input errors
         try:
             if not isinstance(query, str):
@@ -296,75 +915,156 @@ class VectorStore:
             query = query.encode('utf-8', 'ignore').decode('utf-8')
         except Exception:
             pass
+        return query
+
+    def search(self, query: str, k: int = None) -> List[Tuple[Document, float]]:
+        return self.retrieve(query, k).results
+
+    def retrieve(self, query: str, k: int = None) -> RetrievalResult:
+        return self.retrieve_many([query], k)[0]
 
-        logger.info(f"Searching for TOP_K={k} for query: {query[:100]}")
+    def retrieve_many(self, queries: List[str], k: int = None) -> List[RetrievalResult]:
+        with span("retrieval", queries=len(queries)), self._state_lock.read():
+            return self._retrieve_many(queries, k)
 
-        start_time = time.time()
+    def _retrieve_many(self, queries: List[str], k: int = None) -> List[RetrievalResult]:
+        if not self.is_ready:
+            raise ValueError("No index found. Load/Create an index first")
+        if not queries:
+            return []
+
+        k = k or settings.TOP_K_RESULTS
+        queries = [self._sanitize_query(query) for query in queries]
+
+        if len(queries) == 1:
+            logger.info(f"Searching for TOP_K={k} for query: {queries[0][:100]}")
+        else:
+            logger.info(f"Searching for TOP_K={k} for {len(queries)} queries")
+
+        start_time = time.perf_counter()
 
-        keyword_results = self._keyword_search(query, k * 2)
+        keyword_results = []
+        keyword_times = []
+        with span("keyword_search"):
+            for query in queries:
+                stage_start = time.perf_counter()
+                keyword_results.append(self._keyword_matches(query, k * 2))
+                keyword_times.append(time.perf_counter() - stage_start)
 
+        stage_start = time.perf_counter()
         try:
-            query_embedding = self.embeddings.embed_query(query)
-            if not isinstance(query_embedding, (list, tuple, np.ndarray)):
-                raise TypeError(f"embed_query returned unexpected type: {type(query_embedding)}")
-            query_vector = np.array([query_embedding], dtype=np.float32)
-            logger.info(f"Query embedding shape: {query_vector.shape}; index size: {self.index.ntotal}")
+            with span("query_embedding"):
+                query_vectors = self.embed_queries(queries)
+            logger.info(f"Query embedding shape: {query_vectors.shape}; index size: {self.backend.ntotal}")
         except Exception as e:
             logger.error(f"Failed to compute query embedding: {e}")
             raise
+        embedding_time = time.perf_counter() - stage_start
 
+        candidates = k * 2
+        rescore_vectors = self.rescore_vectors
+        if rescore_vectors is not None:
+            # Compressed scores only pick candidates; the final order comes from exact inner products
+            candidates *= max(1, settings.FAISS_RESCORE_FACTOR)
+
+        stage_start = time.perf_counter()
         try:
-            scores, indices = self.index.search(query_vector, k * 2)
+            # Single matrix search for the whole batch
+            with span("vector_search", backend=self.backend.name, candidates=candidates):
+                scores, indices = self.backend.search(query_vectors, candidates)
         except Exception as e:
-            logger.error(f"FAISS search failed: {e}")
+            logger.error(f"{self.backend.name} search failed: {e}")
             raise
+        search_time = time.perf_counter() - stage_start
+
+        retrievals = []
+        for row, query in enumerate(queries):
+            stage_start = time.perf_counter()
+            semantic_results = []
+            for score, doc_id in zip(scores[row], indices[row]):
+                pos = self._positions.get(int(doc_id))
+                if pos is not None:
+                    semantic_results.append((pos, float(score)))
+            if rescore_vectors is not None and semantic_results:
+                with span("rescore"):
+                    semantic_results = self._rescore(rescore_vectors, query_vectors[row], semantic_results, k * 2)
 
-        semantic_results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.documents):
-                document = self.documents[idx]
-                semantic_results.append((document, float(score)))
+            with span("fusion"):
+                results = self._fuse_results(keyword_results[row], semantic_results, k)
+
+            # Batched stages are shared; each query is charged its share of them
+            timings = {
+                "keyword_search": keyword_times[row],
+                "query_embedding": embedding_time / len(queries),
+                "vector_search": search_time / len(queries),
+                "fusion": time.perf_counter() - stage_start
+            }
+            timings["total"] = sum(timings.values())
 
+            retrievals.append(RetrievalResult(
+                query=query,
+                results=results,
+                timings=timings,
+                keyword_matches=len(keyword_results[row]),
+                semantic_matches=len(semantic_results)
+            ))
+
+        total_time = time.perf_counter() - start_time
+        if len(queries) == 1:
+            logger.info(f"Hybrid search found {len(retrievals[0])} results in {total_time:.3f} seconds")
+            logger.info(f"Keyword matches: {retrievals[0].keyword_matches}, Semantic matches: {retrievals[0].semantic_matches}")
+        else:
+            logger.info(f"Hybrid search for {len(queries)} queries took {total_time:.3f} seconds")
+
+        return retrievals
+
+    @staticmethod
+    def _rescore(
+        rescore_vectors: np.ndarray,
+        query_vector: np.ndarray,
+        candidates: List[Tuple[int, float]],
+        k: int
+    ) -> List[Tuple[int, float]]:
+        positions = np.asarray([pos for pos, _ in candidates], dtype=np.int64)
+        exact = np.asarray(rescore_vectors[positions], dtype=np.float32) @ query_vector
+        order = np.argsort(-exact)[:k]
+        return [(int(positions[i]), float(exact[i])) for i in order]
+
+    def _fuse_results(
+        self,
+        keyword_results: List[Tuple[int, float]],
+        semantic_results: List[Tuple[int, float]],
+        k: int
+    ) -> List[Tuple[Document, float]]:
+        # Keyed by document position; snapshot-backed documents are decoded per access, so object ids differ
         combined_scores = {}
 
-        for doc, score in keyword_results:
-            doc_id = id(doc)
+        for pos, score in keyword_results:
             scaled_keyword_score = min(score * 0.1, 1.0)
-            combined_scores[doc_id] = {
-                'doc': doc,
+            combined_scores[pos] = {
                 'keyword_score': scaled_keyword_score,
                 'semantic_score': 0.0,
                 'has_exact_match': True
             }
 
-        for doc, score in semantic_results:
-            doc_id = id(doc)
-            if doc_id in combined_scores:
-                combined_scores[doc_id]['semantic_score'] = score
+        for pos, score in semantic_results:
+            if pos in combined_scores:
+                combined_scores[pos]['semantic_score'] = score
             else:
-                combined_scores[doc_id] = {
-                    'doc': doc,
+                combined_scores[pos] = {
                     'keyword_score': 0.0,
                     'semantic_score': score,
                     'has_exact_match': False
                 }
 
         final_results = []
-        for doc_data in combined_scores.values():
+        for pos, doc_data in combined_scores.items():
             if doc_data['has_exact_match']:
                 final_score = doc_data['semantic_score'] + 10.0
             else:
                 final_score = (doc_data['semantic_score']
                     + doc_data['keyword_score'] * 2.0 )
-            final_results.append((doc_data['doc'], final_score))
+            final_results.append((pos, final_score))
 
         final_results.sort(key=lambda x: x[1], reverse=True)
-        results = final_results[:k]
-
-        search_time = time.time() - start_time
-
-        logger.info(f"Hybrid search found {len(results)} results in {search_time:.3f} seconds")
-        logger.info(f"Keyword matches: {len(keyword_results)}, Semantic matches: {len(semantic_results)}")
-
-        return results
-
+        return [(self.documents[pos], score) for pos, score in final_results[:k]]
@@ -1,17 +1,26 @@
 ﻿import sys
 import argparse
 import json
-from typing import List
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
 
 from src.rag_pipeline import RAGPipeline
 from src.utils.logger import logger
+from config.settings import settings
 
 def print_response(response:dict) -> None:
     print("\n" + "-"*80)
     print(f"QUESTION: {response['question']}")
     print("-"*80)
     print(f"ANSWER: {response['answer']}")
+    print_response_footer(response)
+
+
+def print_response_footer(response: dict) -> None:
     print(f"\Response Time: {response['response_time']} seconds")
+    if "time_to_first_token" in response.get("timings", {}):
+        print(f"Time to first token: {response['timings']['time_to_first_token']} seconds")
     print(f"Sources used: {response['num_sources']}")
 
     if response['sources']:
@@ -22,6 +31,23 @@ def print_response(response:dict) -> None:
     print("-"*80)
 
 
+def print_streamed_response(pipeline: RAGPipeline, question: str) -> None:
+    print("\n" + "-"*80)
+    print(f"QUESTION: {question}")
+    print("-"*80)
+    print("ANSWER: ", end="", flush=True)
+
+    for event in pipeline.stream_question(question):
+        if event["type"] == "token":
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "done":
+            print()
+            print_response_footer(event["response"])
+        elif event["type"] == "error":
+            print(event["response"]["answer"])
+            print_response_footer(event["response"])
+
+
 # def run_hardcoded_questions(pipeline: RAGPipeline) -> None:
 #     print("\n Running hardcoded questions")
 #
@@ -47,13 +73,68 @@ def run_interactive_mode(pipeline: RAGPipeline) -> None:
             if not question_in:
                 continue
 
-            response = pipeline.ask_question(question_in)
-            print_response(response)
+            print_streamed_response(pipeline, question_in)
 
         except Exception as e:
             logger.error(f"Error processing question: {e}")
             print(f"Error: str{e}")
 
+def read_questions(path: Path) -> Iterator[Dict[str, Any]]:
+    # One question per line: {"id": ..., "question": "..."} or just a JSON string
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if isinstance(record, str):
+                    record = {"question": record}
+                if not isinstance(record, dict):
+                    raise TypeError(f"expected a JSON object or string, got {type(record).__name__}")
+                question = record.get("question")
+                if question is not None and not isinstance(question, str):
+                    raise TypeError(f"'question' must be a string, got {type(question).__name__}")
+            except (ValueError, TypeError) as e:
+                # One malformed line must not abort a long batch run
+                logger.warning(f"Skipping line {line_no} of {path}: {e}")
+                continue
+            if not question or not question.strip():
+                logger.warning(f"Skipping line {line_no} of {path}: no question")
+                continue
+            yield record
+
+
+def run_batch_mode(pipeline: RAGPipeline, input_path: Path, output_path: Path) -> None:
+    start_time = time.perf_counter()
+    answered = 0
+
+    def flush(records: List[Dict[str, Any]], out) -> int:
+        responses = pipeline.ask_questions([record["question"] for record in records])
+        for record, response in zip(records, responses):
+            if "id" in record:
+                response = {"id": record["id"], **response}
+            out.write(json.dumps(response, ensure_ascii=False) + "\n")
+        out.flush()
+        return len(records)
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        batch = []
+        for record in read_questions(input_path):
+            batch.append(record)
+            if len(batch) >= settings.BATCH_SIZE:
+                answered += flush(batch, out)
+                batch = []
+                logger.info(f"Answered {answered} questions so far")
+        if batch:
+            answered += flush(batch, out)
+
+    total_time = time.perf_counter() - start_time
+    throughput = answered / total_time if total_time > 0 else 0.0
+    logger.info(f"Batch finished: {answered} questions in {total_time:.2f} seconds ({throughput:.2f} questions/sec)")
+    print(f"Answered {answered} questions in {total_time:.2f} seconds ({throughput:.2f} questions/sec) -> {output_path}")
+
+
 def print_pipeline_info(pipeline: RAGPipeline) -> None:
     info = pipeline.get_info()
 
@@ -67,6 +148,13 @@ def print_pipeline_info(pipeline: RAGPipeline) -> None:
 def main():
     parser = argparse.ArgumentParser(description="RAG Pipeline Entry Point")
     parser.add_argument("--generate-sample-pdfs", action="store_true", help="Generate sample PDFs before starting the pipeline")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the whole index from DATA_PATH")
+    parser.add_argument("--sync", action="store_true", help="Only re-index added, changed and removed PDFs in DATA_PATH")
+    parser.add_argument("--serve", action="store_true", help="Start the HTTP server instead of the interactive mode")
+    parser.add_argument("--port", type=int, help="HTTP server port (default: SERVER_PORT)")
+    parser.add_argument("--workers", type=int, help="HTTP server worker threads (default: SERVER_WORKERS)")
+    parser.add_argument("--batch-input", type=Path, help="Answer the questions in this JSONL file instead of starting the interactive mode")
+    parser.add_argument("--batch-output", type=Path, help="JSONL file for batch responses (default: <batch-input>.responses.jsonl)")
     args = parser.parse_args()
 
     try:
@@ -80,11 +168,23 @@ def main():
                 logger.error(f"Failed generating sample PDFs: {e}")
 
         pipeline = RAGPipeline()
-        pipeline.initialize()
+
+        if args.serve:
+            from src.server import serve
+            serve(pipeline, port=args.port, workers=args.workers, force_rebuild=args.rebuild, sync=args.sync)
+            return
+
+        pipeline.initialize(force_rebuild=args.rebuild, sync=args.sync)
+
+        if args.batch_input:
+            output_path = args.batch_output or args.batch_input.with_suffix(".responses.jsonl")
+            run_batch_mode(pipeline, args.batch_input, output_path)
+            return
 
         # print_pipeline_info(pipeline)
         print("-"*50)
         print("Hi, ich bin der KI_Profil BOT. Wen soll ich finden?\n")
+        pipeline.warm_up()
 
         run_interactive_mode(pipeline)
 
@@ -1,47 +1,90 @@
-﻿import time
+﻿import asyncio
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional
 
-from src.components.documents_loader import DocumentsLoader
+from src.components.answer_cache import AnswerCache
+from src.components.deanonymizer import Deanonymizer
 from src.components.vector_store import VectorStore
-from src.components.rag_chain import RAGChain
 from src.utils.logger import logger
+from src.utils.tracing import span, trace
 from config.settings import settings
+from database import get_pool_stats
 
 class RAGPipeline:
 
     def __init__(self):
-        self.documents_loader = DocumentsLoader()
+        self._documents_loader = None
         self.vector_store = VectorStore(settings)
         self.rag_chain = None
+        self.answer_cache = AnswerCache(
+            max_size=settings.ANSWER_CACHE_SIZE,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            semantic_threshold=settings.ANSWER_CACHE_SEMANTIC_THRESHOLD
+        )
+        self.deanonymizer = Deanonymizer(refresh_seconds=settings.DEANONYMIZATION_REFRESH_SECONDS)
         self.is_initialized = False
+        # One semaphore per event loop; asyncio primitives must not be shared across loops
+        self._ask_semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+        self._warm_up_thread: Optional[threading.Thread] = None
 
         logger.info("RAG Pipeline initialized")
 
-    def initialize(self, force_rebuild: bool = False) -> None:
+    @property
+    def documents_loader(self):
+        # PDF parsing / text splitting libraries are only imported when something gets (re)indexed
+        if self._documents_loader is None:
+            from src.components.documents_loader import DocumentsLoader
+            self._documents_loader = DocumentsLoader()
+        return self._documents_loader
+
+    def _create_chain(self):
+        from src.components.rag_chain import RAGChain
+        return RAGChain(self.vector_store, self.answer_cache, self.deanonymizer)
+
+    def initialize(self, force_rebuild: bool = False, sync: bool = False) -> None:
         logger.info("Starting RAG pipeline initialization")
-        start_time = time.time()
 
-        settings.validate()
+        with trace("initialize") as root:
+            settings.validate()
 
-        if not force_rebuild and self._load_existing_index():
-            logger.info("Using existing index")
-        else:
-            logger.info("Building new index")
-            self._build_new_index()
+            if not force_rebuild and self._load_existing_index():
+                logger.info("Using existing index")
+                if sync:
+                    self._sync_index()
+            else:
+                logger.info("Building new index")
+                self._build_new_index()
 
-        self.rag_chain = RAGChain(self.vector_store)
-        self.is_initialized = True
+            with span("create_chain"):
+                self.rag_chain = self._create_chain()
+            self.is_initialized = True
 
-        total_time = time.time() - start_time
-        logger.info(f"RAG pipeline took {total_time:.2} seconds to initialize")
+        logger.info(f"RAG pipeline took {root.seconds:.2f} seconds to initialize")
+        logger.info(f"Initialization breakdown: {root.summary()}")
+
+    def warm_up(self, background: bool = True) -> None:
+        # Model load + first inference would otherwise land on the first question
+        if not settings.BACKGROUND_WARMUP or self._warm_up_thread is not None:
+            return
+        if not background:
+            self._warm_up()
+            return
+        self._warm_up_thread = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+        self._warm_up_thread.start()
+
+    def _warm_up(self) -> None:
+        try:
+            self.vector_store.warm_up()
+            self.deanonymizer.mapping
+        except Exception as e:
+            logger.warning(f"Warm-up failed: {e}")
 
     def _load_existing_index(self) -> bool:
         try:
-            return self.vector_store.load_index(
-                settings.FAISS_INDEX_PATH,
-                settings.METADATA_PATH
-            )
+            return self.vector_store.load_index(settings.INDEX_SNAPSHOT_PATH)
         except Exception as e:
             logger.error(f"Failed to load existing index: {e}")
             return False
@@ -49,17 +92,76 @@ class RAGPipeline:
     def _build_new_index(self) -> None:
         logger.info("Building new index")
 
-        documents = self.documents_loader.load_and_chunk(settings.DATA_PATH)
-
-        if not documents:
+        pdf_files = sorted(settings.DATA_PATH.glob("*.pdf"))
+        if not pdf_files:
             raise ValueError("No docs loaded. Check your data dir")
 
-        self.vector_store.create_index(documents)
+        # Pages stream through anonymize -> chunk -> embed -> persist in bounded batches; an interrupted
+        # rebuild continues after the last persisted file
+        from src.components.ingestion import StreamingIngestor
+        StreamingIngestor(self.documents_loader, self.vector_store).run(pdf_files, resume=settings.INGEST_RESUME)
 
-        self.vector_store.save_index(
-            settings.FAISS_INDEX_PATH,
-            settings.METADATA_PATH
+        with span("save_index"):
+            self.vector_store.save_index(settings.INDEX_SNAPSHOT_PATH)
+        # Ingestion may have added entities; reload the mapping on next use
+        self.deanonymizer.invalidate()
+
+    def _sync_index(self) -> Dict[str, List[str]]:
+        logger.info(f"Syncing index with {settings.DATA_PATH}")
+        start_time = time.perf_counter()
+
+        known = self.vector_store.get_source_manifest()
+        pdf_files = sorted(settings.DATA_PATH.glob("*.pdf"))
+        current = self.documents_loader.scan_sources(pdf_files, known)
+
+        added = [f for f in pdf_files if f.name not in known]
+        changed = [f for f in pdf_files if f.name in known and known[f.name][0] != current[f.name][0]]
+        # Also covers rows written before the source_files manifest existed
+        indexed_files = set(known) | {meta.get("source_file") for meta in self.vector_store.metadata} - {None}
+        removed = sorted(name for name in indexed_files if name not in current)
+
+        chunks = []
+        loaded_files = set()
+        if added or changed:
+            documents = self.documents_loader.load_files(added + changed)
+            loaded_files = {doc.metadata.get("source_file") for doc in documents}
+            with span("anonymize"):
+                documents = self.documents_loader._anonymize_documents(documents)
+            with span("chunk"):
+                chunks = self.documents_loader.chunk_docs(documents, start_id=self.vector_store.next_chunk_id())
+
+        # Files that failed to parse keep their old rows and manifest entry, so the next sync retries them
+        stale = [f.name for f in added + changed if f.name in loaded_files] + removed
+        manifest = {
+            name: entry for name, entry in current.items()
+            if known.get(name) != entry and (name in loaded_files or name in known and known[name][0] == entry[0])
+        }
+
+        with span("apply_changes"):
+            self.vector_store.apply_changes(chunks, stale, removed, manifest)
+        if chunks or stale:
+            with span("save_index"):
+                self.vector_store.save_index(settings.INDEX_SNAPSHOT_PATH)
+            self.answer_cache.clear()
+            self.deanonymizer.invalidate()
+
+        summary = {
+            "added": [f.name for f in added if f.name in loaded_files],
+            "changed": [f.name for f in changed if f.name in loaded_files],
+            "removed": removed
+        }
+        logger.info(
+            f"Index sync finished in {time.perf_counter() - start_time:.2f} seconds: "
+            f"{len(summary['added'])} added, {len(summary['changed'])} changed, {len(summary['removed'])} removed"
         )
+        return summary
+
+    def sync_index(self) -> Dict[str, List[str]]:
+        if not self.is_initialized:
+            raise RuntimeError("RAG pipeline is not initialized, call initialize() first")
+
+        with trace("sync"):
+            return self._sync_index()
 
     def ask_question(self, question: str) -> Dict[str, Any]:
         if not self.is_initialized:
@@ -67,12 +169,60 @@ class RAGPipeline:
 
         return self.rag_chain.ask(question)
 
+    def stream_question(self, question: str) -> Iterator[Dict[str, Any]]:
+        if not self.is_initialized:
+            raise RuntimeError("RAG pipeline is not initialized, call initialize() first")
+
+        return self.rag_chain.stream(question)
+
+    async def astream_question(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        if not self.is_initialized:
+            raise RuntimeError("RAG pipeline is not initialized, call initialize() first")
+
+        async with self._ask_semaphore():
+            async for event in self.rag_chain.astream(question):
+                yield event
+
     def ask_questions(self, questions: List[str]) -> List[Dict[str, Any]]:
         if not self.is_initialized:
             raise RuntimeError("RAG pipeline is not initialized, call initialize() first")
 
         return self.rag_chain.batch_ask(questions)
 
+    def _ask_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._ask_semaphores.get(loop)
+        if semaphore is None:
+            self._ask_semaphores = {l: s for l, s in self._ask_semaphores.items() if not l.is_closed()}
+            semaphore = self._ask_semaphores[loop] = asyncio.Semaphore(max(1, settings.ASYNC_MAX_CONCURRENCY))
+        return semaphore
+
+    async def aask(self, question: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        if not self.is_initialized:
+            raise RuntimeError("RAG pipeline is not initialized, call initialize() first")
+
+        timeout = settings.ASK_TIMEOUT_SECONDS if timeout is None else timeout
+        start_time = time.perf_counter()
+        # Time spent waiting for a slot counts against the timeout, so overload surfaces as timeouts
+        try:
+            async with asyncio.timeout(timeout or None):
+                async with self._ask_semaphore():
+                    return await self.rag_chain.aask(question)
+        except TimeoutError:
+            logger.warning(f"Question timed out after {timeout} seconds: {question[:100]}")
+            return {
+                "question": question,
+                "answer": f"Error processing question: timed out after {timeout} seconds",
+                "sources": [],
+                "response_time": time.perf_counter() - start_time,
+                "num_sources": 0
+            }
+
+    async def aask_many(self, questions: List[str], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        logger.info(f"Processing {len(questions)} questions concurrently (limit {settings.ASYNC_MAX_CONCURRENCY})")
+        # Order of results matches the input; cancelling the caller cancels every pending question
+        return await asyncio.gather(*(self.aask(question, timeout) for question in questions))
+
     def get_info(self) -> Dict[str, Any]:
         if not self.is_initialized:
             return {"status": "not_initialized"}
@@ -80,21 +230,35 @@ class RAGPipeline:
         return {
             "status": "initialized",
             "total_documents": len(self.vector_store.documents),
-            "index_size": self.vector_store.index.ntotal if self.vector_store.index else 0,
+            "index_size": self.vector_store.index_size,
+            "search_backend": self.vector_store.backend.name,
+            "index_type": getattr(self.vector_store.backend, "index_type", None),
+            "bytes_per_vector": getattr(self.vector_store.backend, "bytes_per_vector", None),
+            "embedding_storage_dtype": self.vector_store.storage_dtype.name,
+            "rescoring": self.vector_store.rescore_vectors is not None,
             "data_path": str(settings.DATA_PATH),
             "storage_path": str(settings.STORAGE_PATH),
             "embedding_model": settings.EMBEDDING_MODEL,
+            "embedding_backend": self.vector_store.embedding_backend,
+            "embedding_compatibility": self.vector_store.embedding_compatibility,
             "chat_model": settings.CHAT_MODEL,
             "chunk_size": settings.CHUNK_SIZE,
             "chunk_overlap": settings.CHUNK_OVERLAP,
-            "top_k_results:": settings.TOP_K_RESULTS
+            "top_k_results:": settings.TOP_K_RESULTS,
+            "index_version": self.vector_store.index_version,
+            "answer_cache": self.answer_cache.stats(),
+            "query_embedding_cache": self.vector_store.query_cache.stats(),
+            "db_pool": get_pool_stats()
         }
 
     def rebuild_index(self) -> None:
         logger.info("Rebuilding index")
-        self._build_new_index()
+        with trace("rebuild"):
+            self._build_new_index()
+        # Entries are already unreachable through the new index_version; drop them to free memory
+        self.answer_cache.clear()
 
         if self.rag_chain:
-            self.rag_chain = RAGChain(self.vector_store)
+            self.rag_chain = self._create_chain()
 
         logger.info("Index rebuilt successfully")
\ No newline at end of file
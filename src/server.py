@@ -0,0 +1,230 @@
+import json
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from src.utils.logger import logger
+from src.utils.tracing import metrics
+from config.settings import settings
+from database import close_pool
+
+MAX_BODY_BYTES = 1024 * 1024
+# Unknown paths are grouped, so scanners cannot blow up the label set
+KNOWN_PATHS = {"/healthz", "/readyz", "/info", "/metrics", "/ask", "/batch", "/rebuild"}
+HTTP_SECONDS = metrics.histogram(
+    "rag_http_request_duration_seconds", "HTTP request latency by endpoint and status", ("method", "path", "status")
+)
+
+
+class RAGServer(HTTPServer):
+    """HTTP front end for one shared, initialized RAGPipeline.
+
+    Requests are handled by a fixed pool of worker threads (SERVER_WORKERS), so the number of
+    questions in flight is bounded. The pipeline is passed in, which also makes it possible to
+    serve a pipeline with a fake LLM / embedding model.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, pipeline, host: str = None, port: int = None, workers: int = None):
+        # port=0 binds a free port (tests)
+        super().__init__(
+            (host or settings.SERVER_HOST, settings.SERVER_PORT if port is None else port), RAGRequestHandler
+        )
+        self.pipeline = pipeline
+        self.workers = workers or settings.SERVER_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http")
+        self._rebuild_lock = threading.Lock()
+        self.draining = False
+        self.init_error: Optional[str] = None
+        self.started_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.pipeline.is_initialized and not self.draining
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def initialize_pipeline(self, **kwargs) -> None:
+        try:
+            self.pipeline.initialize(**kwargs)
+            logger.info("Server is ready")
+            self.pipeline.warm_up()
+        except Exception as e:
+            self.init_error = str(e)
+            logger.error(f"Pipeline initialization failed: {e}")
+
+    def rebuild(self, sync: bool = False) -> Tuple[int, Dict[str, Any]]:
+        if not sync and self.pipeline.vector_store.backend.name == "pgvector":
+            # pgvector searches the live table, which a full rebuild empties and refills batch by batch;
+            # semantic search would return nothing (or rows of reused ids) until it finishes
+            return 409, {"error": "Full rebuild is not supported while serving with SEARCH_BACKEND=pgvector; "
+                                  "use {\"sync\": true} or rebuild offline with --rebuild"}
+        if not self._rebuild_lock.acquire(blocking=False):
+            return 409, {"error": "A rebuild is already running"}
+        try:
+            start_time = time.perf_counter()
+            if sync:
+                result = {"status": "synced", **self.pipeline.sync_index()}
+            else:
+                self.pipeline.rebuild_index()
+                result = {"status": "rebuilt"}
+            result["duration"] = round(time.perf_counter() - start_time, 3)
+            return 200, result
+        finally:
+            self._rebuild_lock.release()
+
+    def graceful_shutdown(self) -> None:
+        # Stop accepting, let in-flight requests finish, then release DB connections
+        logger.info("Shutting down server, waiting for in-flight requests")
+        self.draining = True
+        self.shutdown()
+        self._executor.shutdown(wait=True)
+        self.server_close()
+        close_pool()
+        logger.info("Server stopped")
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    server: RAGServer
+    server_version = "RAGServer/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def handle_one_request(self):
+        start_time = time.perf_counter()
+        self._status = None
+        super().handle_one_request()
+        if self._status is not None and self.command:
+            path = self.path.split("?", 1)[0]
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start_time, self.command, path if path in KNOWN_PATHS else "other", str(self._status)
+            )
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"Request body larger than {MAX_BODY_BYTES} bytes")
+        if not length:
+            return {}
+        payload = json.loads(self.rfile.read(length))
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        return payload
+
+    def _require_ready(self) -> bool:
+        if self.server.ready:
+            return True
+        self._send_json(503, {"error": "Pipeline is not ready"})
+        return False
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            self._send_json(200, {"status": "ok", "uptime": round(time.time() - self.server.started_at, 1)})
+        elif path == "/readyz":
+            if self.server.ready:
+                self._send_json(200, {"status": "ready"})
+            else:
+                self._send_json(503, {"status": "draining" if self.server.draining else "starting",
+                                      "error": self.server.init_error})
+        elif path == "/info":
+            self._send_json(200, self.server.pipeline.get_info())
+        elif path == "/metrics":
+            # Prometheus text exposition format
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"Unknown path {path}"})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if path == "/ask":
+            question = payload.get("question")
+            if not isinstance(question, str) or not question.strip():
+                self._send_json(400, {"error": "'question' must be a non-empty string"})
+            elif self._require_ready():
+                if payload.get("stream"):
+                    self._stream_answer(question)
+                else:
+                    self._send_json(200, self.server.pipeline.ask_question(question))
+        elif path == "/batch":
+            questions = payload.get("questions")
+            if not isinstance(questions, list) or not all(isinstance(q, str) and q.strip() for q in questions):
+                self._send_json(400, {"error": "'questions' must be a list of non-empty strings"})
+            elif self._require_ready():
+                self._send_json(200, {"responses": self.server.pipeline.ask_questions(questions)})
+        elif path == "/rebuild":
+            if self._require_ready():
+                try:
+                    self._send_json(*self.server.rebuild(sync=bool(payload.get("sync"))))
+                except Exception as e:
+                    logger.error(f"Rebuild failed: {e}")
+                    self._send_json(500, {"error": str(e)})
+        else:
+            self._send_json(404, {"error": f"Unknown path {path}"})
+
+    def _stream_answer(self, question: str) -> None:
+        # Newline-delimited JSON events; the connection is closed after the last one
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for event in self.server.pipeline.stream_question(question):
+            self.wfile.write(json.dumps(event, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def serve(pipeline, host: str = None, port: int = None, workers: int = None, **init_kwargs) -> None:
+    server = RAGServer(pipeline, host, port, workers)
+    host, port = server.server_address[:2]
+    logger.info(f"Serving on http://{host}:{port} with {server.workers} workers")
+
+    # Liveness is answered right away; readiness flips once the index is loaded
+    threading.Thread(target=server.initialize_pipeline, kwargs=init_kwargs, name="pipeline-init", daemon=True).start()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}")
+        # shutdown() blocks until serve_forever returns, so it cannot run on the serving thread
+        threading.Thread(target=server.graceful_shutdown, name="shutdown").start()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    server.serve_forever()
@@ -0,0 +1,174 @@
+"""Nested timing spans per request/ingest run plus Prometheus histograms.
+
+A span is opened with `with span("name"):` and becomes a child of the span that is current in
+the calling context (contextvars, so it follows asyncio tasks; threads need copy_context()).
+Every finished span is also observed in the rag_span_duration_seconds histogram, labelled with
+its own name and the name of its root span. Stdlib only, so database.py can use it as well.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; query stages are in the ms range, ingest stages and LLM calls in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format, one series per label combination."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            labels = ",".join(f'{name}="{self._escape(value)}"' for name, value in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, description: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, description, label_names, buckets)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+metrics = MetricsRegistry()
+SPAN_SECONDS = metrics.histogram(
+    "rag_span_duration_seconds", "Duration of traced pipeline stages", ("trace", "span")
+)
+
+
+class Span:
+    __slots__ = ("name", "parent", "root", "attributes", "children", "start", "duration")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.attributes = attributes or {}
+        self.children: List["Span"] = []
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        if parent is not None:
+            # list.append is atomic; spans of parallel LangChain steps or ingest stages share one parent
+            parent.children.append(self)
+
+    @property
+    def seconds(self) -> float:
+        return self.duration if self.duration is not None else time.perf_counter() - self.start
+
+    def finish(self, duration: Optional[float] = None) -> None:
+        self.duration = duration if duration is not None else time.perf_counter() - self.start
+        SPAN_SECONDS.observe(self.duration, self.root.name, self.name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"name": self.name, "seconds": round(self.seconds, 4)}
+        if self.attributes:
+            result["attributes"] = self.attributes
+        if self.children:
+            result["children"] = [child.to_dict() for child in list(self.children)]
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Totals per span name over the whole subtree; compact form for runs with many spans."""
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        pending = list(self.children)
+        while pending:
+            child = pending.pop()
+            totals[child.name]["count"] += 1
+            totals[child.name]["seconds"] += child.seconds
+            pending.extend(child.children)
+        return {name: {"count": int(t["count"]), "seconds": round(t["seconds"], 4)} for name, t in sorted(totals.items())}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Span]:
+    """Root span of one request or ingest run, independent of any span that is current."""
+    current = Span(name, None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+@contextmanager
+def activate(current: Span) -> Iterator[Span]:
+    """Makes an existing span current, e.g. in generators that must not keep it current across yields."""
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+
+
+def record(name: str, seconds: float, parent: Optional[Span] = None, **attributes) -> Span:
+    """Adds an already measured stage (e.g. summed over streamed chunks) as a finished child span."""
+    recorded = Span(name, parent if parent is not None else _current_span.get(), attributes)
+    recorded.start -= seconds
+    recorded.finish(seconds)
+    return recorded
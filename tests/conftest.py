@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture
+def offline_settings(tmp_path, monkeypatch):
+    from config.settings import settings
+
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "DATA_PATH", tmp_path)
+    monkeypatch.setattr(settings, "STORAGE_PATH", tmp_path / "storage")
+    monkeypatch.setattr(settings, "BACKGROUND_WARMUP", False)
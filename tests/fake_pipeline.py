@@ -0,0 +1,53 @@
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+from benchmarks.fakes import HashingEmbeddings, fake_chat_model
+from src.components.answer_cache import AnswerCache
+from src.components.deanonymizer import Deanonymizer
+from src.components.rag_chain import RAGChain
+from src.components.search_backends import FaissBackend
+from src.rag_pipeline import RAGPipeline
+
+PROFILES = [
+    ("FirstName_1, geboren BIRTHDATE_1 in BIRTHPLACE_1. Senior Python Entwickler, Kubernetes, PostgreSQL.", "a.pdf"),
+    ("FirstName_2: Projektleiterin im SAP-Umfeld, spricht Deutsch und Englisch.", "b.pdf"),
+    ("FirstName_3: Data Scientist mit NLP und PyTorch.", "c.pdf"),
+]
+ENTITIES = {"FirstName_1": "Anna M.", "BIRTHDATE_1": "01.02.1990", "BIRTHPLACE_1": "Hamburg"}
+
+
+class FakePipeline(RAGPipeline):
+    """RAGPipeline over an in-memory FAISS index with hashing embeddings and a fake chat model; no Postgres."""
+
+    def __init__(self, llm=None):
+        super().__init__()
+        self.llm = llm or fake_chat_model()
+        self.answer_cache = AnswerCache(max_size=0)
+        self.deanonymizer = Deanonymizer(loader=lambda: dict(ENTITIES))
+        self.vector_store._embeddings = HashingEmbeddings(64)
+        self.vector_store.backend = FaissBackend("flat")
+        self.init_gate = threading.Event()
+        self.rebuild_started = threading.Event()
+        self.rebuild_gate = threading.Event()
+
+    def _load_existing_index(self) -> bool:
+        # Held until the test lets initialization finish, so /readyz can be checked before
+        self.init_gate.wait(10)
+        documents = [
+            Document(page_content=text, metadata={"source_file": source, "page": 1, "chunk_id": i})
+            for i, (text, source) in enumerate(PROFILES)
+        ]
+        vectors = np.asarray(self.vector_store.embeddings.embed_documents([text for text, _ in PROFILES]), dtype=np.float32)
+        self.vector_store.backend.build(vectors, np.arange(len(documents), dtype=np.int64))
+        self.vector_store._set_documents(documents, list(range(len(documents))))
+        self.vector_store.index_version = "test"
+        return True
+
+    def _create_chain(self):
+        return RAGChain(self.vector_store, self.answer_cache, self.deanonymizer, llm=self.llm)
+
+    def rebuild_index(self) -> None:
+        self.rebuild_started.set()
+        self.rebuild_gate.wait(10)
@@ -0,0 +1,98 @@
+import re
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from benchmarks.bench_anonymizer import legacy_anonymize, pages
+from benchmarks.synthetic import profile_texts
+from src.components.anonymizer import Anonymizer, PlaceholderAllocator
+
+PLACEHOLDER = re.compile(r"(?:FirstName|BIRTHDATE|BIRTHPLACE)_\d+")
+
+
+def restore(text, known):
+    # Placeholder numbers depend on the order of assignment, the originals behind them do not
+    originals = {placeholder: original for original, placeholder in known.items()}
+    return PLACEHOLDER.sub(lambda m: f"<{originals[m.group(0)]}>", text)
+
+
+def test_each_entity_kind():
+    anonymizer = Anonymizer()
+    text = anonymizer.anonymize_text(
+        "Barack O., Consultant\n"
+        "Name: Anna Müller\n"
+        "Geburtsdatum: 01.02.1990\n"
+        "Birth date: 1985-12-31\n"
+        "Barack O. spricht Englisch.\n"
+        # The place runs to the end of the capitalized words, across line breaks
+        "Geburtsort: Frankfurt Oder"
+    )
+
+    assert text == (
+        "FirstName_1, Consultant\n"
+        "Name: FirstName_2\n"
+        "Geburtsdatum: BIRTHDATE_1\n"
+        "Birth date: BIRTHDATE_2\n"
+        "FirstName_1 spricht Englisch.\n"
+        "Geburtsort: BIRTHPLACE_1"
+    )
+    assert anonymizer.allocator.pending == [
+        ("name", "Barack O.", "FirstName_1", "regex_name"),
+        ("name", "Anna Müller", "FirstName_2", "regex_name_label"),
+        ("birthdate", "01.02.1990", "BIRTHDATE_1", "regex_date"),
+        ("birthdate", "1985-12-31", "BIRTHDATE_2", "regex_date"),
+        ("birthplace", "Frankfurt Oder", "BIRTHPLACE_1", "regex_place"),
+    ]
+
+
+def test_known_entities_keep_their_placeholder():
+    anonymizer = Anonymizer(PlaceholderAllocator({"Anna M.": "FirstName_7"}))
+
+    assert anonymizer.anonymize_text("Anna M. und Jonas K.") == "FirstName_7 und FirstName_8"
+    assert [original for _, original, _, _ in anonymizer.allocator.pending] == ["Jonas K."]
+
+
+def test_label_with_initial_is_left_to_name_initial():
+    # "Name: First L." shares the placeholder of the header "First L."; the five-pass version
+    # re-matched the replaced label and took the next line's label as a last name
+    text = "Anna M., Senior Consultant\nName: Anna M.\nGeburtsdatum: 01.02.1990\n"
+    anonymizer = Anonymizer()
+
+    assert anonymizer.anonymize_text(text) == "FirstName_1, Senior Consultant\nName: FirstName_1\nGeburtsdatum: BIRTHDATE_1\n"
+    assert legacy_anonymize([text])["FirstName_1 Geburtsdatum"] == "FirstName_2"
+
+
+def test_same_entities_as_the_five_pass_version():
+    texts = profile_texts(50) + [
+        "Name: Anna Müller\nBirth date: 1990-01-31\nBarack O., Consultant\nGeburtsort: Bad Homburg",
+        "Mahatma G. und Anna Müller, Birth place: New York",
+    ]
+    anonymizer = Anonymizer()
+    anonymizer.anonymize(pages(texts))
+
+    legacy = legacy_anonymize(texts)
+    # The only difference is the documented label/initial change above
+    assert set(anonymizer.allocator.known) == {original for original in legacy if not original.startswith("FirstName_")}
+
+
+def test_parallel_workers_share_one_placeholder_per_entity():
+    texts = profile_texts(40)
+    serial = Anonymizer(PlaceholderAllocator({"Anna B.": "FirstName_7"}))
+    expected = [restore(serial.anonymize_text(text), serial.allocator.known) for text in texts]
+
+    anonymizer = Anonymizer(PlaceholderAllocator({"Anna B.": "FirstName_7"}))
+    docs = anonymizer.anonymize_parallel(pages(texts), workers=2)
+
+    allocator = anonymizer.allocator
+    originals = [original for _, original, _, _ in allocator.pending]
+    placeholders = [placeholder for _, _, placeholder, _ in allocator.pending]
+    assert len(set(originals)) == len(originals)
+    assert len(set(placeholders)) == len(placeholders) and "FirstName_7" not in placeholders
+    assert set(originals) == {original for _, original, _, _ in serial.allocator.pending}
+    assert allocator.known["Anna B."] == "FirstName_7"
+    # Every page reads the same as in-process once the placeholders are resolved
+    assert [restore(doc.page_content, allocator.known) for doc in docs] == expected
+    # Counters continue after the highest placeholder handed out by the workers
+    highest = max(int(placeholder.split("_")[1]) for placeholder in placeholders if placeholder.startswith("FirstName_"))
+    assert allocator.counters["FirstName_"] == highest + 1
@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from database import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query):
+        self.conn.pings += 1
+
+
+class FakeConnection:
+    def __init__(self, closed: bool = False):
+        self.closed = closed
+        self.pings = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """Stands in for ThreadedConnectionPool: hands out the idle connections first, then fresh ones."""
+
+    def __init__(self, idle):
+        self.idle = list(idle)
+        self.discarded = []
+
+    def getconn(self):
+        return self.idle.pop(0) if self.idle else FakeConnection()
+
+    def putconn(self, conn, close=False):
+        if close:
+            self.discarded.append(conn)
+        else:
+            self.idle.append(conn)
+
+
+def test_acquire_discards_every_dead_idle_connection():
+    pool = ConnectionPool(minconn=0, maxconn=4, timeout=1, healthcheck_idle=30)
+    dead = [FakeConnection(closed=True) for _ in range(3)]
+    pool._pool = FakePool(dead)
+
+    conn = pool.acquire()
+
+    assert not conn.closed and conn not in dead
+    assert pool._pool.discarded == dead
+    assert pool.get_stats()["health_check_failures"] == 3
+    pool.release(conn)
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_only_connections_idle_past_the_threshold_are_pinged(monkeypatch):
+    pool = ConnectionPool(minconn=0, maxconn=2, timeout=1, healthcheck_idle=30)
+    pool._pool = FakePool([])
+    now = [1000.0]
+    monkeypatch.setattr("database.time.monotonic", lambda: now[0])
+
+    # Freshly opened: handed out without a round trip
+    conn = pool.acquire()
+    assert conn.pings == 0
+    pool.release(conn)
+
+    now[0] += 10
+    assert pool.acquire() is conn and conn.pings == 0
+    pool.release(conn)
+
+    now[0] += 31
+    assert pool.acquire() is conn and conn.pings == 1
+    pool.release(conn)
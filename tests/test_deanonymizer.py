@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from src.components.deanonymizer import Deanonymizer
+
+MAPPING = {
+    "FirstName_1": "Anna M.",
+    "FirstName_12": "Jonas K.",
+    "BIRTHDATE_3": "01.02.1990",
+    "BIRTHPLACE_7": "Hamburg",
+}
+
+
+def deanonymizer():
+    return Deanonymizer(loader=lambda: dict(MAPPING))
+
+
+def streamed(chunks):
+    stream = deanonymizer().stream()
+    return "".join(stream.feed(chunk) for chunk in chunks) + stream.flush()
+
+
+def test_numbered_placeholders_do_not_clobber_longer_ones():
+    assert deanonymizer().deanonymize("FirstName_1 und FirstName_12") == "Anna M. und Jonas K."
+    assert deanonymizer().deanonymize("FirstName_12, FirstName_1.") == "Jonas K., Anna M.."
+
+
+def test_unknown_placeholders_are_left_unchanged():
+    text = "FirstName_2 aus BIRTHPLACE_7, geboren BIRTHDATE_30"
+    assert deanonymizer().deanonymize(text) == "FirstName_2 aus Hamburg, geboren BIRTHDATE_30"
+    assert streamed(["FirstName_", "2 aus BIRTH", "PLACE_7"]) == "FirstName_2 aus Hamburg"
+
+
+def test_placeholder_split_across_streamed_chunks():
+    stream = deanonymizer().stream()
+
+    # The possible start of a placeholder is held back, not emitted half-replaced
+    assert stream.feed("Kandidat: First") == "Kandidat: "
+    assert stream.feed("Name_1") == ""
+    # "FirstName_1" may still become "FirstName_12" until a non-digit arrives
+    assert stream.feed("2 passt, FirstName_1") == "Jonas K. passt, "
+    assert stream.feed(" auch.") == "Anna M. auch."
+    assert stream.flush() == ""
+
+
+def test_streamed_output_matches_single_pass():
+    text = "FirstName_12 (BIRTHDATE_3, BIRTHPLACE_7) und FirstName_1"
+    chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+
+    assert streamed(chunks) == deanonymizer().deanonymize(text)
+    # A placeholder at the very end is only resolved by flush()
+    assert streamed(["Gefunden: FirstName_", "1"]) == "Gefunden: Anna M."
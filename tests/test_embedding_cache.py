@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("psycopg2")
+
+import src.components.embedding_cache as embedding_cache_module
+from src.components.embedding_cache import QueryEmbeddingCache, normalize_query
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=()):
+        self.statements.append(" ".join(sql.split()))
+        self.rowcount = 3 if sql.lstrip().startswith("DELETE") else 1
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    statements = []
+
+    @contextmanager
+    def connection():
+        yield FakeConnection(statements)
+
+    monkeypatch.setattr(embedding_cache_module, "get_db_connection", connection)
+    return statements
+
+
+def prunes(statements):
+    return sum(statement.startswith("DELETE FROM query_embedding_cache") for statement in statements)
+
+
+def test_keys_keep_case_and_collapse_whitespace():
+    assert normalize_query("  SAP   Berater\n") == "SAP Berater"
+
+    cache = QueryEmbeddingCache("model", max_size=4)
+    cache.put("SAP  Berater", np.ones(3))
+    assert cache.get("SAP Berater") is not None
+    assert cache.get("sap berater") is None
+
+
+def test_persistent_table_is_pruned_on_warm_up_and_while_writing(statements):
+    cache = QueryEmbeddingCache("model", max_size=4, persist=True, max_rows=10, prune_every=2)
+
+    cache.warm()
+    assert prunes(statements) == 1
+
+    cache.put("a", np.ones(3))
+    assert prunes(statements) == 1
+    cache.put("b", np.ones(3))
+    assert prunes(statements) == 2
+
+
+def test_max_rows_zero_keeps_every_row(statements):
+    cache = QueryEmbeddingCache("model", max_size=4, persist=True, max_rows=0, prune_every=1)
+
+    cache.warm()
+    cache.put("a", np.ones(3))
+
+    assert prunes(statements) == 0
@@ -0,0 +1,46 @@
+import pytest
+
+from benchmarks.bench_keyword_search import linear_scan
+from benchmarks.synthetic import profile_texts
+from src.components.keyword_index import KeywordIndex, extract_keywords
+
+TEXTS = profile_texts(30) + [
+    "Personalnummer 4000000000, Zertifikat AZ900, SAP S4HANA Migration (PRJ123456).",
+    "Ticket prj123456 im Projekt, az900 und AZ104 bestanden.",
+    "Keine Nummern, nur Text über Python und Kubernetes.",
+]
+
+
+@pytest.mark.parametrize("query", [
+    # Numeric IDs, whole and as a 6-digit prefix of the 10-digit ones
+    "Wer hat die Personalnummer 4000000000?",
+    "Personalnummer 400000 oder 4000023757",
+    # Alphanumeric tokens, matched case-insensitively
+    "Wer hat AZ900 und CKA2023?",
+    "Projekt PRJ123456 mit SAA-C03",
+    # Partial words: shorter than a trigram, and inside longer tokens
+    "Wer kann S4?",
+    "Tickets PRJ12 und Zertifikate AZ1",
+    # No keywords at all
+    "Wer kann Python?",
+])
+def test_count_scoring_matches_the_substring_scan(query):
+    index = KeywordIndex.from_texts(TEXTS)
+
+    expected = sorted(linear_scan(TEXTS, query, len(TEXTS)), key=lambda m: (-m[1], m[0]))
+    assert index.search(extract_keywords(query), len(TEXTS)) == expected
+
+
+def test_bm25_ranks_by_frequency_rarity_and_length():
+    index = KeywordIndex.from_texts([
+        "AZ900 Zertifikat Cloud Plattform",
+        "AZ900 AZ900 Zertifikat Plattform",
+        "AZ900 Zertifikat Cloud Plattform mit vielen weiteren Worten im Profil",
+        "CKA2023 Zertifikat Cloud Plattform",
+    ])
+
+    # More occurrences first, then the shorter chunk for the same count
+    assert [doc_id for doc_id, _ in index.search(["AZ900"], 3, scoring="bm25")] == [1, 0, 2]
+    # The rare keyword outweighs the common one; count scoring ties them
+    assert index.search(["AZ900", "CKA2023"], 4, scoring="bm25")[0][0] == 3
+    assert {score for _, score in index.search(["AZ900", "CKA2023"], 4)} == {1.0}
@@ -0,0 +1,19 @@
+from src.main import read_questions
+
+
+def test_read_questions_skips_malformed_lines(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text("\n".join([
+        '{"id": 1, "question": "Python Entwickler"}',
+        'not json',
+        '[1, 2]',
+        '{"id": 3, "question": 5}',
+        '',
+        '"SAP Projektleiterin"',
+        '{"id": 4}',
+    ]), encoding="utf-8")
+
+    assert list(read_questions(path)) == [
+        {"id": 1, "question": "Python Entwickler"},
+        {"question": "SAP Projektleiterin"},
+    ]
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.utils.tracing import SPAN_SECONDS
+from tests.fake_pipeline import FakePipeline
+
+
+def finished(span_name: str) -> int:
+    series = SPAN_SECONDS._series.get(("ask", span_name))
+    return series[2] if series else 0
+
+
+def chain_with(llm: FakeListChatModel):
+    pipeline = FakePipeline(llm)
+    pipeline.init_gate.set()
+    pipeline.initialize()
+    return pipeline.rag_chain
+
+
+@pytest.mark.usefixtures("offline_settings")
+def test_stream_finishes_llm_span_when_the_llm_fails():
+    chain = chain_with(FakeListChatModel(responses=["FirstName_1 passt."], error_on_chunk_number=3))
+    llm_before, ask_before = finished("llm"), finished("ask")
+
+    events = list(chain.stream("Python Kubernetes"))
+
+    assert events[-1]["type"] == "error"
+    assert finished("llm") == llm_before + 1
+    assert finished("ask") == ask_before + 1
+
+
+@pytest.mark.usefixtures("offline_settings")
+def test_stream_finishes_llm_span_when_the_consumer_stops_early():
+    chain = chain_with(FakeListChatModel(responses=["FirstName_1 passt."]))
+    llm_before, ask_before = finished("llm"), finished("ask")
+
+    events = chain.stream("Python Kubernetes")
+    assert next(events)["type"] == "sources"
+    assert next(events)["type"] == "token"
+    events.close()
+
+    assert finished("llm") == llm_before + 1
+    assert finished("ask") == ask_before + 1
+
+
+@pytest.mark.usefixtures("offline_settings")
+def test_astream_finishes_llm_span_when_the_consumer_stops_early():
+    chain = chain_with(FakeListChatModel(responses=["FirstName_1 passt."]))
+    llm_before, ask_before = finished("llm"), finished("ask")
+
+    async def read_first_token():
+        events = chain.astream("Python Kubernetes")
+        assert (await events.__anext__())["type"] == "sources"
+        assert (await events.__anext__())["type"] == "token"
+        await events.aclose()
+
+    asyncio.run(read_first_token())
+
+    assert finished("llm") == llm_before + 1
+    assert finished("ask") == ask_before + 1
@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+from langchain.schema import Document
+
+from src.components.index_snapshot import read_index, write_snapshot
+from src.components.search_backends import FaissBackend
+
+
+def _vectors(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_add_and_remove_on_snapshot_loaded_index(tmp_path, index_type):
+    vectors = _vectors(100)
+    ids = np.arange(100, dtype=np.int64)
+    backend = FaissBackend(index_type)
+    backend.build(vectors, ids)
+    documents = [Document(page_content=f"chunk {i}", metadata={"source": f"{i}.pdf"}) for i in range(100)]
+    write_snapshot(tmp_path / "snapshot", backend.index, documents, ids.tolist(), {})
+
+    index, mapped = read_index(tmp_path / "snapshot")
+    loaded = FaissBackend(index_type)
+    loaded.attach_index(index, mapped)
+
+    # Incremental sync on a replica started from the snapshot: drop one file, add a new one
+    loaded.remove(np.arange(10, dtype=np.int64))
+    loaded.add(_vectors(5, seed=1), np.arange(100, 105, dtype=np.int64))
+
+    assert not loaded.mapped
+    assert loaded.ntotal == 95
+    _, found = loaded.search(vectors[50:51], 1)
+    assert found[0][0] == 50
+    # The snapshot itself is unchanged
+    assert read_index(tmp_path / "snapshot")[0].ntotal == 100
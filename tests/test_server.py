@@ -0,0 +1,144 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.server import RAGServer
+from tests.fake_pipeline import FakePipeline
+
+
+def start_server(pipeline, initialized: bool = True):
+    server = RAGServer(pipeline, "127.0.0.1", 0, workers=4)
+    init_thread = threading.Thread(target=server.initialize_pipeline, daemon=True)
+    init_thread.start()
+    if initialized:
+        pipeline.init_gate.set()
+        init_thread.join(10)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def request(server, method: str, path: str, payload=None):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else None
+    conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, response.getheader("Content-Type"), data
+
+
+@pytest.fixture
+def server(offline_settings):
+    server = start_server(FakePipeline())
+    yield server
+    if not server.draining:
+        server.graceful_shutdown()
+
+
+def test_readyz_before_and_after_initialization(offline_settings):
+    pipeline = FakePipeline()
+    server = start_server(pipeline, initialized=False)
+    try:
+        status, _, body = request(server, "GET", "/readyz")
+        assert status == 503 and json.loads(body)["status"] == "starting"
+        status, _, _ = request(server, "POST", "/ask", {"question": "Python"})
+        assert status == 503
+        # Liveness does not depend on the index
+        assert request(server, "GET", "/healthz")[0] == 200
+
+        pipeline.init_gate.set()
+        for _ in range(100):
+            if server.ready:
+                break
+            threading.Event().wait(0.05)
+        status, _, body = request(server, "GET", "/readyz")
+        assert status == 200 and json.loads(body)["status"] == "ready"
+    finally:
+        server.graceful_shutdown()
+
+
+def test_ask_streams_ndjson_events(server):
+    status, content_type, body = request(server, "POST", "/ask", {"question": "Python Kubernetes", "stream": True})
+
+    assert status == 200
+    assert content_type.startswith("application/x-ndjson")
+    events = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert events[0]["type"] == "sources" and events[0]["num_sources"] > 0
+    assert {event["type"] for event in events[1:-1]} == {"token"}
+    assert events[-1]["type"] == "done"
+    answer = events[-1]["response"]["answer"]
+    assert "".join(event["text"] for event in events[1:-1]) == answer
+    # Placeholders split across streamed chunks are still de-anonymized
+    assert "Anna M." in answer and "FirstName_1" not in answer
+
+
+def test_batch_answers_in_order(server):
+    questions = ["Python Kubernetes", "SAP Projektleiterin", "NLP PyTorch"]
+    status, _, body = request(server, "POST", "/batch", {"questions": questions})
+
+    assert status == 200
+    responses = json.loads(body)["responses"]
+    assert [response["question"] for response in responses] == questions
+    assert all("Anna M." in response["answer"] for response in responses)
+    # The LLM calls run concurrently, so only the batch-wide generation time is reported
+    assert all("batch_generation" in r["timings"] and "generation" not in r["timings"] for r in responses)
+
+    status, _, _ = request(server, "POST", "/batch", {"questions": ["ok", ""]})
+    assert status == 400
+
+
+def test_rebuild_while_rebuilding_returns_409(server):
+    pipeline = server.pipeline
+    results = {}
+    first = threading.Thread(target=lambda: results.update(first=request(server, "POST", "/rebuild")))
+    first.start()
+    assert pipeline.rebuild_started.wait(10)
+
+    status, _, body = request(server, "POST", "/rebuild", {"sync": True})
+    assert status == 409 and "already running" in json.loads(body)["error"]
+
+    pipeline.rebuild_gate.set()
+    first.join(10)
+    status, _, body = results["first"]
+    assert status == 200 and json.loads(body)["status"] == "rebuilt"
+
+
+def test_full_rebuild_is_refused_with_pgvector(server):
+    # pgvector searches the live table, which a full rebuild empties first
+    server.pipeline.vector_store.backend.name = "pgvector"
+
+    status, _, body = request(server, "POST", "/rebuild")
+
+    assert status == 409 and "pgvector" in json.loads(body)["error"]
+    assert not server.pipeline.rebuild_started.is_set()
+
+
+def test_graceful_shutdown_finishes_in_flight_requests(offline_settings):
+    # Slow token stream, so the request is still running when the shutdown starts
+    llm = FakeListChatModel(responses=["FirstName_1 passt."], sleep=0.05)
+    server = start_server(FakePipeline(llm))
+    results = {}
+    in_flight = threading.Thread(
+        target=lambda: results.update(ask=request(server, "POST", "/ask", {"question": "Python", "stream": True}))
+    )
+    in_flight.start()
+    threading.Event().wait(0.2)
+
+    server.graceful_shutdown()
+    in_flight.join(10)
+
+    status, _, body = results["ask"]
+    events = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert status == 200 and events[-1]["type"] == "done"
+    assert events[-1]["response"]["answer"] == "Anna M. passt."
+    assert not server.ready
+    with pytest.raises(OSError):
+        request(server, "GET", "/healthz")
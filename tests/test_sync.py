@@ -0,0 +1,174 @@
+import os
+from contextlib import contextmanager
+
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+
+from langchain.schema import Document
+
+import src.components.vector_store as vector_store_module
+from config.settings import settings
+from src.components.documents_loader import DocumentsLoader
+from tests.fake_pipeline import FakePipeline
+
+
+class FakeDB:
+    """The document_embeddings/source_files rows apply_changes and _sync_index read and write."""
+
+    def __init__(self):
+        self.rows = {}  # doc_index -> source_file
+        self.manifest = {}  # source_file -> (content_hash, mtime)
+        self.next_id = 1
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield FakeCursor(self)
+
+    def execute_values(self, cur, sql, rows, page_size=None):
+        if sql.startswith("INSERT INTO document_embeddings"):
+            for doc_index, _, _, _, source_file in rows:
+                self.rows[doc_index] = source_file
+                self.next_id += 1
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=()):
+        db = self.db
+        if sql.startswith("DELETE FROM document_embeddings"):
+            sources = set(params[0])
+            self.result = [(doc_index,) for doc_index, source in db.rows.items() if source in sources]
+            db.rows = {doc_index: source for doc_index, source in db.rows.items() if source not in sources}
+        elif sql.startswith("DELETE FROM source_files"):
+            for source in params[0]:
+                db.manifest.pop(source, None)
+        elif "INSERT INTO source_files" in sql:
+            source_file, content_hash, mtime, _ = params
+            db.manifest[source_file] = (content_hash, mtime)
+        elif sql.startswith("SELECT source_file, content_hash, mtime"):
+            self.result = [(name, *entry) for name, entry in db.manifest.items()]
+        elif sql.startswith("SELECT COALESCE(MAX(doc_index) + 1, 0)"):
+            self.result = [(max(db.rows, default=-1) + 1,)]
+        elif sql.startswith("SELECT COUNT(*)"):
+            self.result = [(len(db.rows), db.next_id - 1)]
+        else:
+            raise AssertionError(f"Unexpected statement: {sql}")
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(vector_store_module, "get_db_connection", db.connection)
+    monkeypatch.setattr(vector_store_module, "execute_values", db.execute_values)
+    return db
+
+
+@pytest.fixture
+def pipeline(offline_settings, db, monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_SNAPSHOT_PATH", settings.STORAGE_PATH / "snapshot")
+    pipeline = FakePipeline()
+    pipeline.vector_store._schema_ready = True
+    loader = pipeline.documents_loader
+    # The files hold their page text; parsing and the entity table are out of scope here
+    monkeypatch.setattr(loader, "load_files", lambda files: [
+        Document(page_content=f.read_text(encoding="utf-8"), metadata={"source_file": f.name, "page": 1})
+        for f in files
+    ])
+    monkeypatch.setattr(loader, "_anonymize_documents", lambda docs: docs)
+    return pipeline
+
+
+def write(name, text, mtime=None):
+    path = settings.DATA_PATH / name
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def indexed(pipeline):
+    store = pipeline.vector_store
+    return {doc_id: doc.metadata["source_file"] for doc, doc_id in zip(store.documents, store.doc_ids)}
+
+
+def test_sync_adds_changes_and_removes_files(pipeline, db):
+    write("a.pdf", "FirstName_1: Senior Python Entwickler mit Kubernetes.")
+    write("b.pdf", "FirstName_2: Projektleiterin im SAP-Umfeld.")
+
+    assert pipeline._sync_index() == {"added": ["a.pdf", "b.pdf"], "changed": [], "removed": []}
+    assert indexed(pipeline) == {0: "a.pdf", 1: "b.pdf"} == db.rows
+
+    write("b.pdf", "FirstName_2: Projektleiterin im SAP-Umfeld, jetzt mit S4HANA.", mtime=1)
+    write("c.pdf", "FirstName_3: Data Scientist mit NLP und PyTorch.")
+    (settings.DATA_PATH / "a.pdf").unlink()
+
+    assert pipeline._sync_index() == {"added": ["c.pdf"], "changed": ["b.pdf"], "removed": ["a.pdf"]}
+    # Added files first, then changed ones; ids continue after the highest stored one instead of reusing removed ids
+    assert indexed(pipeline) == {2: "c.pdf", 3: "b.pdf"} == db.rows
+    assert set(db.manifest) == {"b.pdf", "c.pdf"}
+
+    store = pipeline.vector_store
+    assert store.backend.ntotal == 2
+    assert sorted(faiss.vector_to_array(store.backend.index.id_map)) == [2, 3]
+    assert store.retrieve("S4HANA Projektleiterin", k=1).documents[0].metadata["source_file"] == "b.pdf"
+    assert store._keyword_matches("S4HANA") == [(1, 1.0)]
+
+    # Nothing changed on disk: no rows touched
+    assert pipeline._sync_index() == {"added": [], "changed": [], "removed": []}
+    assert indexed(pipeline) == {2: "c.pdf", 3: "b.pdf"}
+
+
+def test_chunk_ids_continue_from_start_id(offline_settings):
+    docs = [Document(page_content=f"Seite {i}", metadata={"source_file": "a.pdf"}) for i in range(3)]
+
+    chunks = DocumentsLoader().chunk_docs(docs, start_id=7)
+
+    assert [chunk.metadata["chunk_id"] for chunk in chunks] == [7, 8, 9]
+
+
+def test_patch_index_removes_ids_from_snapshot_loaded_faiss_index(offline_settings, db, tmp_path):
+    pipeline = FakePipeline()
+    store = pipeline.vector_store
+    store._schema_ready = True
+    chunks = [
+        Document(page_content=text, metadata={"source_file": source, "chunk_id": i})
+        for i, (text, source) in enumerate([("Python", "a.pdf"), ("SAP", "b.pdf"), ("NLP", "b.pdf")])
+    ]
+    store.apply_changes(chunks, [], [], {})
+    store.save_index(tmp_path / "snapshot")
+    assert store.load_index(tmp_path / "snapshot") and store.backend.mapped
+
+    store.apply_changes([], ["b.pdf"], ["b.pdf"], {})
+
+    assert not store.backend.mapped
+    assert faiss.vector_to_array(store.backend.index.id_map).tolist() == [0]
+    assert store.doc_ids == [0] and [doc.page_content for doc in store.documents] == ["Python"]
+
+
+def test_scan_sources_only_hashes_files_with_a_new_mtime(offline_settings, monkeypatch):
+    same = write("same.pdf", "unverändert", mtime=1000)
+    touched = write("touched.pdf", "neu", mtime=2000)
+    loader = DocumentsLoader()
+    hashed = []
+    monkeypatch.setattr(loader, "file_hash", lambda path: hashed.append(path.name) or f"hash-{path.name}")
+
+    manifest = loader.scan_sources([same, touched], {"same.pdf": ("stored", 1000.0), "touched.pdf": ("stored", 1000.0)})
+
+    assert manifest == {"same.pdf": ("stored", 1000.0), "touched.pdf": ("hash-touched.pdf", 2000.0)}
+    assert hashed == ["touched.pdf"]
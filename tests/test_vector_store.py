@@ -0,0 +1,73 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+
+from benchmarks.fakes import HashingEmbeddings
+from config.settings import settings
+from src.components.vector_store import DEFAULT_INT8_ONNX_FILE, VectorStore, embedding_model_kwargs
+
+
+class RolledEmbeddings(HashingEmbeddings):
+    """Same dimension, different vectors: stands in for a backend that does not reproduce the index."""
+
+    def _embed(self, text):
+        return np.roll(super()._embed(text), 1).tolist()
+
+
+def test_embedding_model_kwargs_per_backend():
+    assert embedding_model_kwargs("torch", "") == {"device": "cpu"}
+    assert embedding_model_kwargs("onnx", "") == {"device": "cpu", "backend": "onnx"}
+    assert embedding_model_kwargs("onnx", "onnx/model_O3.onnx")["model_kwargs"] == {"file_name": "onnx/model_O3.onnx"}
+    assert embedding_model_kwargs("ONNX-INT8", "") == {
+        "device": "cpu", "backend": "onnx", "model_kwargs": {"file_name": DEFAULT_INT8_ONNX_FILE}
+    }
+    assert embedding_model_kwargs("onnx-int8", "onnx/model_qint8_arm64.onnx")["model_kwargs"] == {
+        "file_name": "onnx/model_qint8_arm64.onnx"
+    }
+    with pytest.raises(ValueError):
+        embedding_model_kwargs("tensorflow", "")
+
+
+def test_default_int8_file_is_shipped_by_the_default_model():
+    # Files in the sentence-transformers/all-MiniLM-L6-v2 repo
+    assert DEFAULT_INT8_ONNX_FILE in {
+        "onnx/model_quint8_avx2.onnx", "onnx/model_qint8_avx512.onnx",
+        "onnx/model_qint8_avx512_vnni.onnx", "onnx/model_qint8_arm64.onnx",
+    }
+
+
+def store_with(embeddings) -> VectorStore:
+    store = VectorStore(settings)
+    store._embeddings = embeddings
+    return store
+
+
+def test_compatibility_probe_matches_for_the_same_backend():
+    stored = store_with(HashingEmbeddings(64))._embedding_probe()
+
+    store = store_with(HashingEmbeddings(64))
+    store._set_stored_probe(np.round(stored, 6).tolist())
+
+    assert store.embedding_compatibility == pytest.approx(1.0, abs=1e-4)
+
+
+def test_compatibility_probe_detects_a_mismatching_backend():
+    stored = store_with(HashingEmbeddings(64))._embedding_probe()
+
+    store = store_with(RolledEmbeddings(64))
+    store._set_stored_probe(stored.tolist())
+    assert store.embedding_compatibility < settings.EMBEDDING_COMPAT_THRESHOLD
+
+    # Different dimension: never compatible
+    store = store_with(HashingEmbeddings(32))
+    store._set_stored_probe(stored.tolist())
+    assert store.embedding_compatibility == 0.0
+
+
+def test_compatibility_probe_waits_for_the_model():
+    store = VectorStore(settings)
+    store._set_stored_probe([[1.0, 0.0]])
+    # Checked once the model is loaded, not by loading it
+    assert store.embedding_compatibility is None and not store.model_loaded